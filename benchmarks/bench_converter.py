@@ -0,0 +1,92 @@
+"""
+对比两种内容转换方式处理 1000 条记录的 CPU 耗时
+
+    python benchmarks/bench_converter.py [记录数]
+
+markdown: markdownify -> mistletoe -> NotionPyRenderer -> 行内分词，标题另用 html2text
+html: notionify.html2block 单次遍历 HTML 生成块和标题文本
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html2text
+from markdownify import markdownify
+
+from notionify.html2block import html_to_blocks
+from notionify.md2notion import Md2NotionUploader
+
+WORDS = "今天 读书 笔记 flomo notion 想法 记录 工作 生活 学习 the quick brown fox jumps over lazy dog".split()
+
+
+def sentence(rng, words):
+    text = " ".join(rng.choice(WORDS) for _ in range(words))
+    style = rng.random()
+    if style < 0.1:
+        return f"<strong>{text}</strong>"
+    if style < 0.15:
+        return f'<a href="https://example.com/{rng.randint(1, 999)}">{text}</a>'
+    if style < 0.2:
+        return f"<code>{text}</code>"
+    return text
+
+
+def make_memo(rng):
+    """生成一条与 Flomo 记录结构相似的 HTML"""
+    parts = []
+    for _ in range(rng.randint(1, 6)):
+        kind = rng.random()
+        if kind < 0.6:
+            parts.append(f"<p>{sentence(rng, rng.randint(3, 40))} #{rng.choice(WORDS)}</p>")
+        elif kind < 0.8:
+            tag = rng.choice(["ul", "ol"])
+            items = "".join(f"<li><p>{sentence(rng, rng.randint(2, 12))}</p></li>" for _ in range(rng.randint(2, 5)))
+            parts.append(f"<{tag}>{items}</{tag}>")
+        elif kind < 0.9:
+            parts.append(f"<blockquote><p>{sentence(rng, rng.randint(5, 20))}</p></blockquote>")
+        else:
+            parts.append(f"<p>{sentence(rng, 10)}<br>{sentence(rng, 10)}</p>")
+    return "".join(parts)
+
+
+def run_markdown(memos, uploader):
+    for html in memos:
+        content_md = markdownify(html)
+        html2text.html2text(html)
+        uploader.renderContent(content_md)
+
+
+def run_html(memos):
+    for html in memos:
+        html_to_blocks(html)
+
+
+def measure(fn, *args):
+    start = time.process_time()
+    fn(*args)
+    return time.process_time() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = random.Random(42)
+    memos = [make_memo(rng) for _ in range(count)]
+    uploader = Md2NotionUploader()
+    # 预热，排除导入和首次编译正则的开销
+    run_markdown(memos[:10], uploader)
+    run_html(memos[:10])
+
+    markdown_seconds = measure(run_markdown, memos, uploader)
+    html_seconds = measure(run_html, memos)
+    print(f"记录数: {count}，平均 HTML 长度: {sum(map(len, memos)) // count} 字符")
+    print(f"markdown 转换: {markdown_seconds:.3f} 秒 CPU")
+    print(f"html 转换:     {html_seconds:.3f} 秒 CPU")
+    print(f"每 1000 条节省: {(markdown_seconds - html_seconds) / count * 1000:.3f} 秒 CPU "
+          f"（{markdown_seconds / html_seconds:.1f} 倍）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+对比行内分词器与原来基于正则的 sentence_parser 的耗时，包括会让正则回溯的病态输入
+
+    python benchmarks/bench_inline_tokenizer.py
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notionify.inline_tokenizer import tokenize_inline
+from notionify.md2notion import Md2NotionUploader
+
+STYLE_SPLIT = r'(\*\*.*?\*\*|__.*?__|\*.*?\*|_.*?_|~~.*?~~|`.*?`)'
+
+
+def legacy_sentence_parser(s):
+    """原来的实现：先按公式/链接切分，再按样式切分，每段再用 parse_annotations 去掉标记"""
+    result = []
+    for part in re.split(r'(\$.*?\$|\[.*?\]\(.*?\))', s):
+        if part.startswith('$'):
+            result.append({"type": "equation", "equation": {"expression": part.strip('$')}})
+            continue
+        for style_part in re.split(STYLE_SPLIT, part):
+            annotations, clean_text = Md2NotionUploader.parse_annotations(style_part)
+            if clean_text.startswith('[') and '](' in clean_text:
+                link_text, url = re.match(r'\[(.*?)\]\((.*?)\)', clean_text).groups()
+                result.append({"type": "text", "text": {"content": link_text, "link": {"url": url}},
+                               "annotations": annotations, "plain_text": link_text, "href": url})
+            elif clean_text:
+                result.append({"type": "text", "text": {"content": clean_text, "link": None},
+                               "annotations": annotations, "plain_text": clean_text, "href": None})
+    return result
+
+
+CASES = {
+    "普通文本": "今天读了 **一本书**，记录 *几个想法* 和 [一个链接](https://example.com/a) 以及 `code` $x^2$。" * 20,
+    "URL 中的下划线": " ".join(f"https://example.com/some_long_path_{i}/file_name_{i}.png" for i in range(200)),
+    "连续下划线": "_" * 5000,
+    "未闭合的星号": "*a " * 3000,
+    "未闭合的链接": "[" * 5000,
+    "未闭合的公式": "$x " * 3000,
+    "未闭合的 ** 后跟长文本": "**" + "x" * 20000,
+    "加粗斜体": "a ***x y*** b *z* and a_b_c " * 300,
+    "未闭合的 ***": "***a " * 3000,
+}
+
+# 输出检查：(文本, 加粗, 斜体) 片段，加粗斜体按 CommonMark 的规则拆分
+EXPECTED = {
+    "***x***": [("x", True, True)],
+    "***x** y*": [("x", True, True), (" y", False, True)],
+    "***x* y**": [("x", True, True), (" y", True, False)],
+    "a ***x y*** b *z* and a_b_c": [
+        ("a ", False, False), ("x y", True, True), (" b ", False, False), ("z", False, True), (" and a_b_c", False, False)
+    ],
+    "snake\\_case and a_b_c": [("snake_case and a_b_c", False, False)],
+    "**a *b* c**": [("a ", True, False), ("b", True, True), (" c", True, False)],
+}
+
+
+def measure(fn, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def styled_runs(items):
+    return [(item["plain_text"], item["annotations"]["bold"], item["annotations"]["italic"]) for item in items]
+
+
+def check_outputs():
+    """检查分词结果，返回不符合预期的输入数"""
+    failures = 0
+    for text, expected in EXPECTED.items():
+        actual = styled_runs(tokenize_inline(text))
+        if actual != expected:
+            failures += 1
+            print(f"✗ {text!r}: {actual}")
+    print(f"输出检查: {len(EXPECTED) - failures}/{len(EXPECTED)} 通过\n")
+    return failures
+
+
+def main():
+    failures = check_outputs()
+    print(f"{'输入':<24}{'长度':>8}{'正则(毫秒)':>14}{'分词器(毫秒)':>14}")
+    for name, text in CASES.items():
+        repeat = 5
+        legacy = measure(legacy_sentence_parser, text, repeat) * 1000
+        tokenizer = measure(tokenize_inline, text, repeat) * 1000
+        print(f"{name:<24}{len(text):>8}{legacy:>14.2f}{tokenizer:>14.2f}")
+
+    # 线性检查：输入长度翻倍，分词器耗时大致翻倍，正则在未闭合的链接上按平方增长
+    print("\n规模扩展（下划线 + 未闭合链接混合输入）:")
+    for size in (2500, 5000, 10000, 20000):
+        text = ("a_b [x " * (size // 8))[:size]
+        legacy = measure(legacy_sentence_parser, text, 1) * 1000
+        tokenizer = measure(tokenize_inline, text, 3) * 1000
+        print(f"  {size:>6} 字符: 正则 {legacy:>10.2f} 毫秒，分词器 {tokenizer:>8.2f} 毫秒")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+对比 md2block.Document 原来的预处理（多次复制整个输入）与逐行生成的预处理，在几 MB 的 Markdown 文件上的耗时和内存峰值
+
+    python benchmarks/bench_md2block.py [文件大小(MB) ...]
+
+预处理: 只运行预处理，得到 mistletoe 使用的行列表
+read_file / uploadSingleFile: 完整的解析、渲染和（写入空客户端的）上传
+内存峰值由 tracemalloc 统计，与计时分开运行
+"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notionify.Parser import md2block
+from notionify.md2notion import Md2NotionUploader
+
+WORDS = "今天 读书 笔记 flomo notion 想法 记录 工作 生活 学习 the quick brown fox jumps over lazy dog".split()
+
+
+def legacy_preprocess(lines):
+    """原来的实现：splitlines、补换行、三元组、chain、filter、join 后再 splitlines"""
+    if isinstance(lines, str):
+        lines = lines.splitlines(keepends=True)
+    lines = [line if line.endswith('\n') else '{}\n'.format(line) for line in lines]
+    new_lines = []
+    temp_line = None
+    triggered = False
+    for line in lines:
+        if not triggered and '$$\n' in line:
+            temp_line = [None, line, None]
+            triggered = True
+        elif triggered:
+            temp_line[1] += line
+            if '$$\n' in line:
+                temp_line[2] = '\n'
+                new_lines.append(temp_line)
+                temp_line = None
+                triggered = False
+        else:
+            new_lines.append([None, line, None])
+    if temp_line is not None:
+        new_lines.append(temp_line)
+    new_lines = list(itertools.chain(*new_lines))
+    new_lines = list(filter(lambda x: x is not None, new_lines))
+    new_lines = ''.join(new_lines)
+    lines = new_lines.splitlines(keepends=True)
+    return [line if line.endswith('\n') else '{}\n'.format(line) for line in lines]
+
+
+class _Children:
+    def append(self, block_id, children, after=None):
+        return {"results": [{"id": f"{block_id}-{index}"} for index in range(len(children))]}
+
+
+class _Blocks:
+    children = _Children()
+
+
+class NullNotion:
+    """丢弃写入请求的 Notion 客户端，只用于统计本地的解析和渲染开销"""
+    blocks = _Blocks()
+
+
+def generate_markdown(size, seed=0):
+    """生成约 size 字节的 Markdown：段落、列表、代码块和 $$ 公式块"""
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    while total < size:
+        kind = rng.random()
+        if kind < 0.5:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 60)))
+            part = f"{text} **{rng.choice(WORDS)}** *{rng.choice(WORDS)}*\n\n"
+        elif kind < 0.75:
+            part = "".join(f"- {rng.choice(WORDS)} {rng.choice(WORDS)}\n" for _ in range(rng.randint(2, 6))) + "\n"
+        elif kind < 0.9:
+            part = "```python\n" + "".join(f"x_{i} = {i}\n" for i in range(rng.randint(3, 10))) + "```\n\n"
+        else:
+            part = "$$\n\\sum_{i=1}^{n} x_i^2\n$$\n"
+        parts.append(part)
+        total += len(part.encode("utf-8"))
+    return "".join(parts)
+
+
+def measure(fn):
+    """返回 (耗时秒, 内存峰值字节)"""
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def compare(name, legacy, streaming):
+    legacy_time, legacy_peak = measure(legacy)
+    time_, peak = measure(streaming)
+    print(f"  {name:<20}原实现 {legacy_time:6.2f} 秒 {legacy_peak / 2 ** 20:7.1f} MB"
+          f"    逐行 {time_:6.2f} 秒 {peak / 2 ** 20:7.1f} MB")
+
+
+def main():
+    sizes = [float(arg) for arg in sys.argv[1:]] or [2, 4]
+    uploader = Md2NotionUploader()
+    streaming_preprocess = md2block.preprocess_lines
+    for size_mb in sizes:
+        content = generate_markdown(int(size_mb * 2 ** 20))
+        with tempfile.NamedTemporaryFile("w", suffix=".md", encoding="utf-8", delete=False) as f:
+            f.write(content)
+            path = f.name
+        try:
+            print(f"{size_mb:g} MB，{content.count(chr(10))} 行:")
+
+            def preprocess_file(preprocess):
+                with open(path, "r", encoding="utf-8") as md_file:
+                    return list(preprocess(md_file))
+
+            compare("预处理（字符串）",
+                    lambda: legacy_preprocess(content), lambda: list(streaming_preprocess(content)))
+            compare("预处理（文件）",
+                    lambda: preprocess_file(legacy_preprocess), lambda: preprocess_file(streaming_preprocess))
+
+            def legacy(fn):
+                """Document 按模块全局名调用预处理，临时替换为原实现"""
+                def run():
+                    md2block.preprocess_lines = legacy_preprocess
+                    try:
+                        fn()
+                    finally:
+                        md2block.preprocess_lines = streaming_preprocess
+                return run
+
+            read = lambda: md2block.read_file(path)
+            upload = lambda: uploader.uploadSingleFile(NullNotion(), path, "page")
+            compare("read_file", legacy(read), read)
+            compare("uploadSingleFile", legacy(upload), upload)
+        finally:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,83 @@ NOTION_VERSION = "2022-06-28"
 # 同步时间配置
 UPDATE_INTERVAL_HOUR = os.getenv("UPDATE_INTERVAL_HOUR")
 
+# 同步状态配置（保存增量同步的水位线等信息）
+SYNC_STATE_DIR = os.getenv("SYNC_STATE_DIR", ".sync_state")
+SYNC_STATE_FILE = os.getenv("SYNC_STATE_FILE", os.path.join(SYNC_STATE_DIR, "state.json"))
+# 本次运行的同步日志，运行中断（取消、超时）后下次运行据此恢复已提交的记录
+SYNC_JOURNAL_FILE = os.getenv("SYNC_JOURNAL_FILE", os.path.join(SYNC_STATE_DIR, "journal.jsonl"))
+# 全量扫描：忽略已保存的水位线，从头拉取所有 Flomo 记录（用于恢复）
+FULL_RESCAN = os.getenv("FULL_RESCAN", "false").lower() == "true"
+# 图片上传缓存：同一图片已上传到 Notion 时直接复用上传对象，不再下载和上传
+IMAGE_CACHE_FILE = os.getenv("IMAGE_CACHE_FILE", os.path.join(SYNC_STATE_DIR, "image_cache.json"))
+IMAGE_CACHE_MAX_ENTRIES = int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "20000"))
+# slug 索引全量核对间隔（小时），期间只增量查询最近编辑过的 Notion 页面
+SLUG_INDEX_RECONCILE_HOURS = float(os.getenv("SLUG_INDEX_RECONCILE_HOURS", "168"))
+
+# 并发处理记录的线程数，1 表示逐条处理；所有线程共享 Notion 限流
+SYNC_CONCURRENCY = max(1, int(os.getenv("SYNC_CONCURRENCY", "1")))
+# 异步同步引擎同时处理的记录数，请求总速率仍受 Notion 限流约束
+ASYNC_SYNC_CONCURRENCY = max(1, int(os.getenv("ASYNC_SYNC_CONCURRENCY", "32")))
+# 同时下载和上传的图片数，所有记录共享，1 表示逐张处理
+IMAGE_CONCURRENCY = max(1, int(os.getenv("IMAGE_CONCURRENCY", "4")))
+
+# 记录内容的转换方式：html 直接把 HTML 转换为 Notion 块，markdown 经 Markdown 中转（旧方式）
+CONTENT_CONVERTER = os.getenv("CONTENT_CONVERTER", "html").lower()
+# 内容转换缓存：相同内容不再重复解析和渲染；内存中保留的条目数，以及磁盘缓存的目录和总大小上限（字节，0 表示不使用磁盘缓存）
+RENDER_CACHE_MAX_ENTRIES = max(1, int(os.getenv("RENDER_CACHE_MAX_ENTRIES", "2000")))
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(SYNC_STATE_DIR, "render_cache"))
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+
+# Flomo 拉取配置
+# 并行回填的线程数，大于 1 时首次导入/全量扫描按时间窗口并行拉取
+FLOMO_BACKFILL_WORKERS = int(os.getenv("FLOMO_BACKFILL_WORKERS", "1"))
+# 并行回填切分的时间窗口数量，默认为线程数的 4 倍
+FLOMO_BACKFILL_WINDOWS = int(os.getenv("FLOMO_BACKFILL_WINDOWS", "0")) or FLOMO_BACKFILL_WORKERS * 4
+# 请求 Flomo 的速率上限（次/秒），小于等于 0 表示不限制
+FLOMO_RATE_LIMIT = float(os.getenv("FLOMO_RATE_LIMIT", "5"))
+
+# Notion 请求限流与重试配置（所有 Notion 请求共享）
+# 平均请求速率（次/秒），Notion 官方限制约为 3 次/秒
+NOTION_RATE_LIMIT = float(os.getenv("NOTION_RATE_LIMIT", "3"))
+# 令牌桶容量，允许的瞬时突发请求数
+NOTION_RATE_BURST = int(os.getenv("NOTION_RATE_BURST", "3"))
+# 429/5xx 的最大重试次数
+NOTION_MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+# 5xx 指数退避的初始和最大等待时间（秒）
+NOTION_RETRY_BASE_DELAY = float(os.getenv("NOTION_RETRY_BASE_DELAY", "1"))
+NOTION_RETRY_MAX_DELAY = float(os.getenv("NOTION_RETRY_MAX_DELAY", "60"))
+
+# Notion 文件上传配置
+# 超过该大小（字节）的文件使用分片上传，单次上传最大为 20MB
+NOTION_MULTIPART_THRESHOLD = int(os.getenv("NOTION_MULTIPART_THRESHOLD", str(20 * 1024 * 1024)))
+# 分片大小（字节），Notion 要求除最后一片外每片在 5MB 到 20MB 之间
+NOTION_UPLOAD_PART_SIZE = min(20 * 1024 * 1024, max(5 * 1024 * 1024, int(os.getenv("NOTION_UPLOAD_PART_SIZE", str(10 * 1024 * 1024)))))
+# 同一个文件同时上传的分片数
+NOTION_UPLOAD_PART_CONCURRENCY = max(1, int(os.getenv("NOTION_UPLOAD_PART_CONCURRENCY", "3")))
+# 分片上传失败后，只重新上传失败分片的最大轮数
+NOTION_UPLOAD_PART_RETRIES = max(0, int(os.getenv("NOTION_UPLOAD_PART_RETRIES", "2")))
+
+# HTTP连接池配置（Flomo、图片下载、Notion文件上传、Telegram 共用）
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+# 每个主机的最大连接数，默认不少于同时下载/上传的图片总数（记录并发数 × 每条记录的图片并发数）
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", str(max(10, SYNC_CONCURRENCY * IMAGE_CONCURRENCY))))
+# 按主机单独设置连接池大小，格式: "api.notion.com=20,flomoapp.com=4"；只匹配完全相同的主机名，不包括子域名
+HTTP_HOST_POOL_SIZES = os.getenv("HTTP_HOST_POOL_SIZES", "")
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+# 上传前优化图片（需要安装 Pillow）：缩小到最大边长、按格式和质量重新编码、去除元数据
+IMAGE_OPTIMIZE = os.getenv("IMAGE_OPTIMIZE", "false").lower() == "true"
+IMAGE_OPTIMIZE_MAX_DIMENSION = int(os.getenv("IMAGE_OPTIMIZE_MAX_DIMENSION", "2560"))
+# 输出格式 JPEG/PNG/WEBP，为空时保持原格式
+IMAGE_OPTIMIZE_FORMAT = os.getenv("IMAGE_OPTIMIZE_FORMAT", "WEBP").upper()
+IMAGE_OPTIMIZE_QUALITY = int(os.getenv("IMAGE_OPTIMIZE_QUALITY", "80"))
+# 优化图片的进程数，0 表示使用 CPU 核数
+IMAGE_OPTIMIZE_WORKERS = int(os.getenv("IMAGE_OPTIMIZE_WORKERS", "0"))
+# 只优化不超过该大小（字节）的图片：优化需要把整张图片读入内存，更大的图片原样流式上传
+IMAGE_OPTIMIZE_MAX_BYTES = int(os.getenv("IMAGE_OPTIMIZE_MAX_BYTES", str(10 * 1024 * 1024)))
+# 下载图片时在内存中缓存的最大字节数，超出部分写入临时文件
+IMAGE_SPOOL_MAX_MEMORY = int(os.getenv("IMAGE_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+
 # Telegram通知配置
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
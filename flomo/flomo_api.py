@@ -1,8 +1,12 @@
+import asyncio
+import queue
+import threading
 import time
-import requests
 from flomo.flomo_sign import getSign
 from config import FLOMO_DOMAIN, MEMO_LIST_URL
 from config import get_logger
+from http_client import get_session
+from utils import beijing_time_to_timestamp
 
 logger = get_logger(__name__)
 
@@ -23,45 +27,56 @@ HEADERS = {
 
 
 class FlomoApi:
-    def __int__(self):
-        pass
+    def __init__(self, rate_limiter=None):
+        self.rate_limiter = rate_limiter
 
     def get_memo_list(self, user_authorization, latest_updated_at="0"):
-        # 获取当前时间
-        current_timestamp = int(time.time())
-
-        latest_updated_at = str(int(latest_updated_at) + 1)
-        logger.debug(f'get_memo_list latest_updated_at:{latest_updated_at}')
-
-        # 构造参数
-        params = {
-            'limit': '200',
-            'latest_updated_at': latest_updated_at,
-            'tz': '8:0',
-            'timestamp': current_timestamp,
-            'api_key': 'flomo_web',
-            'app_version': '4.0',
-            'platform': 'web',
-            'webp': '1'
-        }
-
-        # 获取签名
-        params['sign'] = getSign(params)
-        HEADERS['authorization'] = f'Bearer {user_authorization}'
-
-        response = requests.get(MEMO_LIST_URL, headers=HEADERS, params=params)
-
-        if response.status_code != 200:
-            # 网络或者服务器错误
-            logger.error('get_memo_list http error:' + response.text)
-            return
-
-        response_json = response.json()
-        if response_json['code'] != 0:
-            logger.error("get_memo_list business error:" + response_json['message'])
-            return
-
-        return response_json['data']
+        headers, params = build_memo_list_request(user_authorization, latest_updated_at)
+
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        response = get_session().get(MEMO_LIST_URL, headers=headers, params=params)
+        return parse_memo_list_response(response)
+
+    def iter_memo_pages(self, user_authorization, latest_updated_at="0"):
+        """
+        按更新时间升序逐页拉取记录
+
+        Args:
+            user_authorization (str): flomo 的认证 token
+            latest_updated_at (str): 只拉取该时间戳之后更新的记录
+
+        Yields:
+            list: 每页的记录列表
+        """
+        while True:
+            logger.debug(f"请求参数: latest_updated_at(最早更新时间)={latest_updated_at}")
+            memo_list = self.get_memo_list(user_authorization, latest_updated_at)
+            if not memo_list:
+                logger.debug("📥 已获取所有记录")
+                return
+            yield memo_list
+            latest_updated_at = str(beijing_time_to_timestamp(memo_list[-1]['updated_at']))
+            logger.debug(f"请求成功，最新记录时间: {latest_updated_at}")
+
+    def iter_memos(self, user_authorization, latest_updated_at="0", prefetch=True):
+        """
+        以流的方式逐条产出记录，不在内存中保留完整列表
+
+        Args:
+            user_authorization (str): flomo 的认证 token
+            latest_updated_at (str): 只拉取该时间戳之后更新的记录
+            prefetch (bool): 是否在后台线程中预取下一页，使翻页与调用方的处理重叠
+
+        Yields:
+            dict: 单条记录
+        """
+        pages = self.iter_memo_pages(user_authorization, latest_updated_at)
+        if prefetch:
+            pages = _prefetch(pages)
+        for page in pages:
+            yield from page
 
     def get_login_wechat_qrcode(self):
         pass
@@ -70,6 +85,137 @@ class FlomoApi:
         pass
 
 
+def build_memo_list_request(user_authorization, latest_updated_at="0"):
+    """
+    构造获取记录列表的请求头和签名参数
+
+    Returns:
+        tuple: (headers, params)
+    """
+    # 获取当前时间
+    current_timestamp = int(time.time())
+
+    latest_updated_at = str(int(latest_updated_at) + 1)
+    logger.debug(f'get_memo_list latest_updated_at:{latest_updated_at}')
+
+    # 构造参数
+    params = {
+        'limit': '200',
+        'latest_updated_at': latest_updated_at,
+        'tz': '8:0',
+        'timestamp': current_timestamp,
+        'api_key': 'flomo_web',
+        'app_version': '4.0',
+        'platform': 'web',
+        'webp': '1'
+    }
+
+    # 获取签名
+    params['sign'] = getSign(params)
+    headers = dict(HEADERS, authorization=f'Bearer {user_authorization}')
+    return headers, params
+
+
+class FlomoApiError(Exception):
+    """flomo 接口返回错误；与没有更多记录区分开，调用方不能把它当作拉取结束"""
+
+
+def parse_memo_list_response(response):
+    """
+    解析记录列表响应（requests 或 httpx 的响应），HTTP 错误或业务错误时抛出 FlomoApiError
+
+    Returns:
+        list: 记录列表，为空表示没有更多记录
+    """
+    if response.status_code != 200:
+        # 网络或者服务器错误
+        raise FlomoApiError('get_memo_list http error:' + response.text)
+
+    response_json = response.json()
+    if response_json['code'] != 0:
+        raise FlomoApiError("get_memo_list business error:" + response_json['message'])
+
+    return response_json['data']
+
+
+class AsyncFlomoApi:
+    """FlomoApi 的异步版本，使用调用方传入的 httpx.AsyncClient"""
+
+    def __init__(self, http_client, rate_limiter=None):
+        self.http_client = http_client
+        self.rate_limiter = rate_limiter
+
+    async def get_memo_list(self, user_authorization, latest_updated_at="0"):
+        headers, params = build_memo_list_request(user_authorization, latest_updated_at)
+
+        if self.rate_limiter:
+            await self.rate_limiter.acquire_async()
+
+        response = await self.http_client.get(MEMO_LIST_URL, headers=headers, params=params)
+        return parse_memo_list_response(response)
+
+    async def iter_memos(self, user_authorization, latest_updated_at="0"):
+        """
+        以流的方式逐条产出记录，调用方处理当前页时已在后台请求下一页
+
+        Yields:
+            dict: 单条记录
+        """
+        next_page = asyncio.ensure_future(self.get_memo_list(user_authorization, latest_updated_at))
+        try:
+            while True:
+                memo_list = await next_page
+                if not memo_list:
+                    logger.debug("📥 已获取所有记录")
+                    return
+                latest_updated_at = str(beijing_time_to_timestamp(memo_list[-1]['updated_at']))
+                logger.debug(f"请求成功，最新记录时间: {latest_updated_at}")
+                next_page = asyncio.ensure_future(self.get_memo_list(user_authorization, latest_updated_at))
+                for memo in memo_list:
+                    yield memo
+        finally:
+            # 调用方提前退出时取消预取
+            next_page.cancel()
+
+
+def _prefetch(iterable, size=1):
+    """在后台线程中提前消费 iterable，最多缓存 size 个元素，异常会在调用方重新抛出"""
+    buffer = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+    done = object()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        # 调用方提前退出时通知后台线程停止
+        stopped.set()
+
+
 if __name__ == "__main__":
     flomo_api = FlomoApi()
     authorization = 'Bearer 7505209|Lf9wvt5JKIFBS4zfayw61X3MuoH1nS5xcPMB3fqS'
@@ -0,0 +1,100 @@
+"""
+按时间窗口并行回填 Flomo 记录，用于首次导入和全量扫描
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from config import get_logger
+from utils import beijing_time_to_timestamp
+
+logger = get_logger(__name__)
+
+
+class FlomoBackfill:
+    """
+    将账号的时间范围切分为多个窗口，并发拉取每个窗口内的记录
+
+    flomo 的列表接口只能按 latest_updated_at 游标顺序翻页，单个游标无法并行；
+    但每个窗口可以从自己的起始时间独立翻页，窗口之间互不依赖。
+    任一窗口拉取失败时整个回填中止：之后的窗口不再产出，调用方的水位线不会越过缺失的记录。
+    """
+
+    def __init__(self, flomo_api, workers=4, windows=16):
+        self.flomo_api = flomo_api
+        self.workers = max(1, workers)
+        self.windows = max(1, windows)
+
+    def _fetch_window(self, user_authorization, start, end, stopped):
+        """
+        拉取更新时间位于 [start, end) 的记录，end 为 None 表示不设上限
+
+        Args:
+            stopped (threading.Event): 回填中止时设置，窗口在下一页之前停止拉取
+
+        Returns:
+            list: 按更新时间升序排列的记录，中止时为 None
+        """
+        memos = []
+        # get_memo_list 会在游标上加一秒，因此从 start - 1 开始
+        for page in self.flomo_api.iter_memo_pages(user_authorization, str(start - 1)):
+            if stopped.is_set():
+                return None
+            for memo in page:
+                timestamp = beijing_time_to_timestamp(memo['updated_at'])
+                if end is None or timestamp < end:
+                    memos.append(memo)
+            if end is not None and beijing_time_to_timestamp(page[-1]['updated_at']) >= end:
+                break
+        logger.debug(f"📥 时间窗口 [{start}, {end}) 获取 {len(memos)} 条记录")
+        return memos
+
+    def split_windows(self, start, end):
+        """将 [start, end) 均分为若干窗口，最后一个窗口不设上限以包含拉取期间新增的记录"""
+        step = max(1, (end - start) // self.windows + 1)
+        bounds = list(range(start, end, step)) or [start]
+        return [(bound, bounds[i + 1] if i + 1 < len(bounds) else None) for i, bound in enumerate(bounds)]
+
+    def iter_memos(self, user_authorization, latest_updated_at="0"):
+        """
+        并行拉取 latest_updated_at 之后更新的全部记录，按时间顺序逐个窗口产出，并按 slug 去重
+
+        Yields:
+            dict: 单条记录，整体按更新时间升序
+        """
+        first_page = self.flomo_api.get_memo_list(user_authorization, latest_updated_at)
+        if not first_page:
+            return
+        start = beijing_time_to_timestamp(first_page[0]['updated_at'])
+        windows = self.split_windows(start, int(time.time()))
+        logger.info(f"📥 并行回填: {len(windows)} 个时间窗口, {self.workers} 个线程")
+
+        # slug -> 已产出记录的更新时间，窗口边界处或拉取期间被修改的记录只保留最新版本
+        seen = {}
+        stopped = threading.Event()
+        pending = deque(windows)
+        # 按窗口顺序产出，最多 workers 个窗口在后台拉取或等待产出，内存占用不随窗口数增长
+        futures = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            def submit():
+                window_start, window_end = pending.popleft()
+                futures.append(executor.submit(self._fetch_window, user_authorization, window_start, window_end, stopped))
+
+            try:
+                while pending and len(futures) < self.workers:
+                    submit()
+                while futures:
+                    # 窗口拉取失败时异常在这里抛出，之后的窗口不再产出
+                    memos = futures.popleft().result()
+                    if pending:
+                        submit()
+                    for memo in memos:
+                        if seen.get(memo['slug'], "") >= memo['updated_at']:
+                            continue
+                        seen[memo['slug']] = memo['updated_at']
+                        yield memo
+            finally:
+                stopped.set()
+                for future in futures:
+                    future.cancel()
@@ -2,20 +2,27 @@ import os
 import random
 import time
 import sys
-import requests
 import json
-import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from flomo.flomo_api import FlomoApi
+from flomo.flomo_backfill import FlomoBackfill
 from notionify import notion_utils
+from notionify.block_diff import BlockDiffer, block_children_of
 from notionify.md2notion import Md2NotionUploader
 from notionify.notion_cover_list import cover
 from notionify.notion_helper import NotionHelper
-from utils import truncate_string, is_within_n_hours
+from rate_limiter import RateLimiter
+from sync_state import SyncState, CommitTracker
+from sync_journal import SyncJournal
+from image_cache import ImageCache
+from image_optimizer import create_image_optimizer
+from render_cache import RenderCache
+from utils import truncate_string, is_within_n_hours, beijing_time_to_timestamp, memo_fingerprint
 from tools import (
-    split_long_text, clean_backticks, mask_sensitive_info,
-    send_telegram_notification, is_valid_url,
-    ImageProcessor, ContentProcessor, NotificationProcessor
+    clean_backticks, send_telegram_notification,
+    ImageProcessor, ContentProcessor, NotificationProcessor, memo_image_files
 )
 from config import *
 
@@ -23,14 +30,27 @@ logger = get_logger(__name__)
 
 class Flomo2Notion:
     def __init__(self):
-        self.flomo_api = FlomoApi()
+        self.flomo_api = FlomoApi(rate_limiter=RateLimiter(FLOMO_RATE_LIMIT))
         self.notion_helper = NotionHelper()
         self.uploader = Md2NotionUploader()
-        self.image_processor = ImageProcessor(self.notion_helper)
-        self.content_processor = ContentProcessor(self.notion_helper, self.uploader)
+        self.image_cache = ImageCache()
+        self.image_optimizer = create_image_optimizer()
+        self.image_processor = ImageProcessor(self.notion_helper, self.image_cache, self.image_optimizer)
+        self.render_cache = RenderCache()
+        self.content_processor = ContentProcessor(self.notion_helper, self.uploader, render_cache=self.render_cache)
+        self.sync_state = SyncState()
+        self.journal = SyncJournal()
+        # 上次中断的运行中已提交的记录：slug -> 内容指纹
+        self.resumed = {}
         self.success_count = 0
         self.error_count = 0
         self.skip_count = 0
+        self._count_lock = threading.Lock()
+
+    def _increment(self, counter):
+        """线程安全地给成功/跳过/失败计数加一"""
+        with self._count_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
 
     def process_memo(self, memo, page_id=None):
         # 检查记录是否已删除
@@ -44,22 +64,68 @@ class Flomo2Notion:
                         page_id=page_id,
                         archived=True
                     )
-                    self.success_count += 1
+                    self.sync_state.remove_memo(memo['slug'])
+                    self.image_cache.update_memo_files(memo['slug'], [])
+                    self.journal.record(memo['slug'], "archive", page_id)
+                    self._increment("success_count")
                     logger.debug(f"✅ 归档记录成功: {memo['slug']}")
                     return
                 except Exception as e:
                     logger.error(f"❌ 归档记录失败: {str(e)}", exc_info=True)
-                    self.error_count += 1
                     raise
             else:
-                self.skip_count += 1
+                self._increment("skip_count")
                 logger.info(f"🗑️ 跳过已删除的记录")
                 logger.debug(f"{memo['slug']}")
                 return
     
+        # 附件列表变化时释放不再引用的图片缓存
+        self.image_cache.update_memo_files(memo['slug'], self._memo_image_urls(memo))
         # 处理内容
         content_md, content_text, image_files = self.content_processor.process_content(memo, self.image_processor)
     
+        properties = self._build_properties(memo, content_text, page_id)
+    
+        try:
+            blocks = self.content_processor.render_blocks(content_md, image_files, self.image_processor)
+            if page_id:
+                logger.debug(f"📤 更新: 开始更新Notion页面属性，ID: {page_id}")
+                page = self.notion_helper.client.pages.update(page_id=page_id, properties=properties)
+                logger.info("✅ 更新: Notion页面属性更新成功")
+
+                # 只更新发生变化的块，而不是清空后重新写入
+                stats = BlockDiffer(self.notion_helper, self.uploader).sync(page["id"], blocks)
+                logger.info(
+                    f"✅ 更新: 页面内容已同步，保留 {stats['kept']}，更新 {stats['updated']}，"
+                    f"插入 {stats['inserted']}，删除 {stats['deleted']}"
+                )
+            else:
+                logger.info("📤 开始创建Notion页面")
+                # 内容和图片块随页面一起创建，超出单次请求限制的部分再追加
+                page = self.uploader.createPage(
+                    self.notion_helper.client, blocks, properties=properties, **self._new_page_options()
+                )
+                logger.debug(f"✅ Notion页面创建成功，ID: {page['id']}")
+
+            fingerprint = memo_fingerprint(memo)
+            self.sync_state.set_page(memo['slug'], page['id'])
+            self.sync_state.set_fingerprint(memo['slug'], fingerprint)
+            self.journal.record(memo['slug'], "update" if page_id else "create", page['id'], fingerprint)
+            self.image_cache.mark_attached([img['url'] for img in image_files])
+            self._increment("success_count")
+            logger.info("✅ 记录处理完成")
+        except Exception as e:
+            logger.error(f"❌ 记录处理失败: {str(e)}", exc_info=True)
+            # 缓存的上传对象可能已失效（如过期），下次重新上传
+            self.image_cache.discard([img['url'] for img in image_files])
+            raise
+
+    @staticmethod
+    def _memo_image_urls(memo):
+        return [clean_backticks(file['url']) for file in memo_image_files(memo)]
+
+    def _build_properties(self, memo, content_text, page_id=None):
+        """生成页面属性，新建页面时额外写入 slug、创建时间等不会变化的属性"""
         properties = {
             "标题": notion_utils.get_title(
                 truncate_string(content_text)
@@ -71,7 +137,7 @@ class Flomo2Notion:
             ),
             "是否置顶": notion_utils.get_select("否" if memo['pin'] == 0 else "是"),
         }
-    
+
         if not page_id:
             properties.update({
                 "slug": notion_utils.get_rich_text(memo['slug']),
@@ -79,42 +145,378 @@ class Flomo2Notion:
                 "来源": notion_utils.get_select(memo['source']),
                 "源链接": notion_utils.get_url(f"https://v.flomoapp.com/mine/?memo_id={memo['slug']}")
             })
-    
+        return properties
+
+    def _new_page_options(self):
+        """新建页面的父数据库、图标和随机封面"""
+        random_cover = random.choice(cover)
+        logger.info(f"🖼️ 选择封面: {random_cover}")
+        return {
+            "parent": {"database_id": self.notion_helper.page_id, "type": "database_id"},
+            "icon": notion_utils.get_icon("https://www.notion.so/icons/target_red.svg"),
+            "cover": notion_utils.get_icon(random_cover),
+        }
+
+    def _skip_reason(self, memo, page_id, full_update, check_window, interval_hour):
+        """
+        判断记录是否可以跳过
+
+        Returns:
+            str: 跳过原因，需要处理时返回 None
+        """
+        # 上次中断的运行已经提交过且之后没有变化（全量更新时也跳过）
+        if self.resumed and memo.get('deleted_at') is None and self.resumed.get(memo['slug']) == memo_fingerprint(memo):
+            return "上次运行中已提交"
+
+        if not page_id:
+            # 判断memo是否已删除
+            if memo.get('deleted_at') is not None:
+                return "已删除"
+            return None
+
+        # 检查是否需要更新：内容指纹未变化时跳过，与更新时间无关
+        if full_update or memo.get('deleted_at') is not None:
+            return None
+        fingerprint = memo_fingerprint(memo)
+        stored_fingerprint = self.sync_state.get_fingerprint(memo['slug'])
+        if stored_fingerprint == fingerprint:
+            return "内容未变化"
+        # 没有指纹记录（如首次启用或状态丢失）时按更新时间窗口判断，并记录当前指纹
+        if stored_fingerprint is None and check_window and not is_within_n_hours(memo['updated_at'], interval_hour):
+            self.sync_state.set_fingerprint(memo['slug'], fingerprint)
+            self.journal.record(memo['slug'], "seed", page_id, fingerprint)
+            return f"更新时间超过 {interval_hour} 小时"
+        return None
+
+    def _sync_memo(self, memo, progress, full_update, check_window, interval_hour):
+        """
+        同步单条记录，根据 Notion 中是否已存在决定更新、插入或跳过
+
+        Args:
+            memo (dict): flomo 记录
+            progress (str): 进度前缀，用于日志
+            full_update (bool): 是否忽略内容指纹，强制重写
+            check_window (bool): 没有指纹记录时，是否只更新 interval_hour 小时内变更的记录
+            interval_hour (int): 更新时间窗口（小时）
+
+        Returns:
+            bool: 是否处理成功（跳过也算成功）
+        """
+        # 在工作线程中查询页面ID，同一 slug 的前一次处理已经结束，新建的页面也能查到
+        page_id = self.sync_state.get_page_id(memo['slug'])
+        reason = self._skip_reason(memo, page_id, full_update, check_window, interval_hour)
+        if reason:
+            self._increment("skip_count")
+            logger.info(f"{progress} ⏭️ 跳过记录 - {reason}")
+            return True
+
+        action = "更新" if page_id else "插入"
+        logger.info(f"{progress} 🔄 更新记录" if page_id else f"{progress} 📝 新记录")
         try:
-            if page_id:
-                logger.debug(f"📤 更新: 开始更新Notion页面属性，ID: {page_id}")
-                page = self.notion_helper.client.pages.update(page_id=page_id, properties=properties)
-                logger.info("✅ 更新: Notion页面属性更新成功")
-    
-                # 先清空page的内容，再重新写入
-                logger.debug(f"🗑️ 更新: 清空页面内容，ID: {page['id']}")
-                self.notion_helper.clear_page_content(page["id"])
-                logger.info("✅ 更新: 页面内容清空成功")
-            else:
-                parent = {"database_id": self.notion_helper.page_id, "type": "database_id"}
-                random_cover = random.choice(cover)
-                logger.info(f"🖼️ 选择封面: {random_cover}")
-                logger.info("📤 开始创建Notion页面")
-                page = self.notion_helper.client.pages.create(
-                    parent=parent,
-                    icon=notion_utils.get_icon("https://www.notion.so/icons/target_red.svg"),
-                    cover=notion_utils.get_icon(random_cover),
-                    properties=properties,
-                )
-                logger.debug(f"✅ Notion页面创建成功，ID: {page['id']}")
-    
-            # 上传内容
-            self.content_processor.upload_content(content_md, page['id'])
-    
-            # 上传图片
-            self.content_processor.upload_images(image_files, page['id'], self.image_processor)
-    
-            self.success_count += 1
-            logger.info("✅ 记录处理完成")
+            self.process_memo(memo, page_id)
+            logger.info(f"{progress} ✅ {action}成功")
         except Exception as e:
-            logger.error(f"❌ 记录处理失败: {str(e)}", exc_info=True)
-            self.error_count += 1
-            raise
+            self._increment("error_count")
+            logger.error(f"{progress} ❌ {action}失败: {str(e)}")
+            return False
+        return True
+
+    @staticmethod
+    def _new_summary():
+        return {
+            "total": 0,
+            "deleted_count": 0,
+            # 在更新时间范围内的记录的最早和最新时间
+            "earliest_updated_at": None,
+            "latest_updated_at": None,
+            # 最后一条连续成功提交的记录的更新时间
+            "committed_updated_at": None,
+        }
+
+    @staticmethod
+    def _track_memo(summary, memo, interval_hour):
+        """统计记录总数、已删除数量和时间窗口内的更新时间范围"""
+        summary["total"] += 1
+        if memo.get('deleted_at') is not None:
+            summary["deleted_count"] += 1
+        if is_within_n_hours(memo['updated_at'], interval_hour):
+            if summary["earliest_updated_at"] is None or memo['updated_at'] < summary["earliest_updated_at"]:
+                summary["earliest_updated_at"] = memo['updated_at']
+            if summary["latest_updated_at"] is None or memo['updated_at'] > summary["latest_updated_at"]:
+                summary["latest_updated_at"] = memo['updated_at']
+
+    def _process_memos(self, memos, full_update, check_window, interval_hour):
+        """
+        用 SYNC_CONCURRENCY 个线程处理记录流
+
+        进度序号按拉取顺序分配；同一 slug 的记录串行处理；在途任务数有上限，内存占用不随记录数增长。
+        记录按更新时间升序返回，水位线只推进到按拉取顺序连续成功的最后一条记录。
+
+        Args:
+            memos (iterable): flomo 记录流
+            full_update (bool): 是否忽略内容指纹，强制重写
+            check_window (bool): 没有指纹记录时，是否只更新 interval_hour 小时内变更的记录
+            interval_hour (int): 更新时间窗口（小时）
+
+        Returns:
+            dict: total、deleted_count、earliest_updated_at、latest_updated_at、committed_updated_at
+        """
+        summary = self._new_summary()
+        tracker = CommitTracker()
+        max_in_flight = SYNC_CONCURRENCY * 2
+        in_flight = {}        # future -> (序号, slug, 更新时间)
+        slug_futures = {}     # slug -> 处理中的 future
+
+        def collect(futures):
+            for future in futures:
+                index, slug, updated_at = in_flight.pop(future)
+                if slug_futures.get(slug) is future:
+                    del slug_futures[slug]
+                try:
+                    ok = future.result()
+                except Exception as e:
+                    logger.error(f"[{index + 1}] ❌ 处理失败: {str(e)}")
+                    self._increment("error_count")
+                    ok = False
+                self._finish_memo(tracker, index, ok, updated_at)
+
+        with ThreadPoolExecutor(max_workers=SYNC_CONCURRENCY, thread_name_prefix="memo") as executor:
+            try:
+                for memo in memos:
+                    index = summary["total"]
+                    self._track_memo(summary, memo, interval_hour)
+                    progress = f"[{index + 1}]"
+                    logger.debug(f"{progress} 🔍 处理记录 - {memo['slug']}")
+
+                    # 同一 slug 在流中重复出现时，等前一次处理结束，避免重复创建页面
+                    previous = slug_futures.get(memo['slug'])
+                    if previous is not None:
+                        wait([previous])
+                    while len(in_flight) >= max_in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+
+                    future = executor.submit(self._sync_memo, memo, progress, full_update, check_window, interval_hour)
+                    in_flight[future] = (index, memo['slug'], memo['updated_at'])
+                    slug_futures[memo['slug']] = future
+            except Exception as e:
+                logger.error(f"❌ 获取 Flomo 数据失败: {str(e)}")
+
+            collect(wait(in_flight).done)
+        summary["committed_updated_at"] = tracker.committed_updated_at
+        return summary
+
+    def _finish_memo(self, tracker, index, ok, updated_at):
+        """记录一条处理完成的记录，水位线推进时写入同步日志"""
+        committed_updated_at = tracker.committed_updated_at
+        tracker.finish(index, ok, updated_at)
+        if tracker.committed_updated_at != committed_updated_at:
+            self.journal.record_watermark(tracker.committed_updated_at)
+
+    def _resume_from_journal(self, save=True):
+        """
+        把上次中断的运行已提交的结果合并到同步状态，本次运行跳过这些记录
+
+        Args:
+            save (bool): 是否立即保存同步状态，预演时只在内存中合并
+
+        Returns:
+            bool: 是否可以开始新的运行；保存合并后的状态失败时为 False，此时日志是上次运行结果的唯一记录，不能清空
+        """
+        entries, committed_updated_at = self.journal.recover()
+        if not entries and not committed_updated_at:
+            return True
+        for slug, entry in entries.items():
+            if entry["action"] == "archive":
+                self.sync_state.remove_memo(slug)
+                continue
+            if entry.get("page_id"):
+                self.sync_state.set_page(slug, entry["page_id"])
+            if entry.get("fingerprint"):
+                self.sync_state.set_fingerprint(slug, entry["fingerprint"])
+        self.resumed = {
+            slug: entry["fingerprint"] for slug, entry in entries.items()
+            if entry["action"] in ("create", "update") and entry.get("fingerprint")
+        }
+        logger.info(f"♻️ 上次运行未正常结束，恢复 {len(entries)} 条已提交的记录")
+        if save:
+            return self._save_state(committed_updated_at)
+        self._advance_watermark(committed_updated_at)
+        return True
+
+    def _refresh_slug_index(self, force_full=False):
+        """
+        增量刷新 slug 索引：只查询上次游标之后编辑过的页面，定期或全量扫描时全量核对
+
+        Args:
+            force_full (bool): 是否强制全量核对
+        """
+        full, query_filter = self._slug_index_filter(force_full)
+        notion_memo_list = self.notion_helper.query_all(self.notion_helper.page_id, filter=query_filter)
+        self._update_slug_index(notion_memo_list, full)
+
+    def _slug_index_filter(self, force_full=False):
+        """
+        判断本次是否需要全量核对 slug 索引
+
+        Returns:
+            tuple: (是否全量, 数据库查询的 filter，全量时为 None)
+        """
+        cursor = self.sync_state.get_index_cursor()
+        reconcile_due = time.time() - self.sync_state.get_index_reconciled_at() >= SLUG_INDEX_RECONCILE_HOURS * 3600
+        if force_full or cursor is None or reconcile_due:
+            logger.debug("🔍 全量核对 slug 索引")
+            return True, None
+        logger.debug(f"🔍 增量刷新 slug 索引，游标: {cursor}")
+        return False, {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": cursor}}
+
+    def _update_slug_index(self, notion_memo_list, full):
+        """用数据库查询结果更新本地 slug 索引"""
+        pages = []
+        for notion_memo in notion_memo_list:
+            slug_property = notion_memo.get("properties", {}).get("slug", {}).get("rich_text")
+            if not slug_property:
+                continue
+            slug = notion_utils.get_rich_text_from_result(notion_memo, "slug")
+            pages.append((slug, notion_memo.get("id"), notion_memo.get("last_edited_time")))
+        self.sync_state.update_index(pages, full=full)
+        logger.debug(f"🔍 查询到 {len(pages)} 条页面，索引中共有 {len(self.sync_state.get_slug_map())} 条记录")
+
+    def _advance_watermark(self, committed_updated_at):
+        """把水位线推进到 committed_updated_at（只前进不后退）"""
+        if committed_updated_at:
+            # 回退一秒：flomo 按 latest_updated_at + 1 查询，避免漏掉同一秒内更新的其他记录
+            watermark = beijing_time_to_timestamp(committed_updated_at) - 1
+            if watermark > int(self.sync_state.get_watermark()):
+                self.sync_state.set_watermark(watermark)
+                logger.info(f"💾 水位线已更新: {committed_updated_at}")
+
+    def _save_state(self, committed_updated_at):
+        """
+        保存水位线和内容指纹，下次运行只拉取水位线之后更新的记录
+
+        Args:
+            committed_updated_at (str): 最后一条成功提交记录的更新时间，东八区时间字符串，没有时为 None
+
+        Returns:
+            bool: 是否保存成功
+        """
+        self._advance_watermark(committed_updated_at)
+        try:
+            self.image_cache.save()
+        except Exception as e:
+            logger.error(f"❌ 保存图片缓存失败: {str(e)}")
+        try:
+            self.render_cache.save()
+        except Exception as e:
+            logger.error(f"❌ 清理转换缓存失败: {str(e)}")
+        try:
+            self.sync_state.save()
+            return True
+        except Exception as e:
+            logger.error(f"❌ 保存同步状态失败: {str(e)}")
+            return False
+
+    def _plan_memo(self, memo, full_update, check_window, interval_hour):
+        """
+        判断单条记录的处理方式并估算 Notion 请求数，不发出任何写入请求
+
+        Returns:
+            dict: 记录的计划，action 为 create / update / archive / skip
+        """
+        page_id = self.sync_state.get_page_id(memo['slug'])
+        item = {"slug": memo['slug'], "updated_at": memo['updated_at'], "page_id": page_id}
+        reason = self._skip_reason(memo, page_id, full_update, check_window, interval_hour)
+        if reason:
+            item.update(action="skip", reason=reason, requests=0)
+            return item
+        if memo.get('deleted_at') is not None:
+            item.update(action="archive", requests=1)
+            return item
+
+        # 假设图片都上传成功，按图片块渲染
+        images = [
+            (f"planned-{index}", clean_backticks(file['url']), clean_backticks(file.get('name', '图片')))
+            for index, file in enumerate(memo.get('files') or []) if file.get('url')
+        ]
+        content_md, _, image_files = self.content_processor.build_content(memo, images)
+        blocks = self.content_processor.render_blocks(content_md, image_files, self.image_processor)
+        # 未命中图片缓存的图片需要创建上传对象和发送文件两次请求
+        uploads = sum(1 for _, url, _ in images if not self.image_cache.get(url))
+        requests = 2 * uploads + self.uploader.estimateRequests(blocks, create=not page_id)
+        if page_id:
+            # 更新属性、读取已有子块（按新内容的嵌套结构估算），内容写入按全部重写估算上限
+            parents = [block for block in blocks if block_children_of(block)]
+            nested = 0
+            while parents:
+                nested += len(parents)
+                parents = [child for block in parents for child in block_children_of(block) if block_children_of(child)]
+            requests += 2 + nested
+        item.update(
+            action="update" if page_id else "create",
+            blocks=self.uploader.countBlocks(blocks),
+            images=len(images),
+            image_uploads=uploads,
+            requests=requests,
+        )
+        return item
+
+    def plan_sync(self):
+        """
+        预演一次同步：执行拉取、slug 映射和变更检测，但不写入 Notion，也不保存同步状态
+
+        Returns:
+            dict: 可机读的同步计划，包含每条记录的处理方式、预计请求数和按 NOTION_RATE_LIMIT 估算的耗时
+        """
+        logger.info("🧮 开始预演同步计划")
+        authorization = os.getenv("FLOMO_TOKEN")
+        if not authorization:
+            logger.error("❌ 未设置 FLOMO_TOKEN 环境变量")
+            return None
+
+        self._resume_from_journal(save=False)
+        full_update = os.getenv("FULL_UPDATE", "false").lower() == "true"
+        latest_updated_at = self._start_watermark(full_update)
+        self._refresh_slug_index(force_full=FULL_RESCAN or full_update)
+        interval_hour = int(UPDATE_INTERVAL_HOUR)
+        check_window = latest_updated_at == "0"
+
+        counts = {"create": 0, "update": 0, "archive": 0, "skip": 0}
+        requests = {"create": 0, "update": 0, "archive": 0}
+        blocks = 0
+        images = 0
+        image_uploads = 0
+        items = []
+        for memo in self._memo_source(authorization, latest_updated_at):
+            item = self._plan_memo(memo, full_update, check_window, interval_hour)
+            items.append(item)
+            counts[item["action"]] += 1
+            if item["action"] != "skip":
+                requests[item["action"]] += item["requests"]
+            blocks += item.get("blocks", 0)
+            images += item.get("images", 0)
+            image_uploads += item.get("image_uploads", 0)
+
+        total_requests = sum(requests.values())
+        estimated_seconds = total_requests / NOTION_RATE_LIMIT if NOTION_RATE_LIMIT > 0 else 0
+        plan = {
+            "generated_at": int(time.time()),
+            "latest_updated_at": latest_updated_at,
+            "full_update": full_update,
+            "memos": dict(counts, total=len(items)),
+            "blocks": blocks,
+            "images": images,
+            "image_uploads": image_uploads,
+            "requests": dict(requests, total=total_requests),
+            "rate_limit": NOTION_RATE_LIMIT,
+            "estimated_seconds": round(estimated_seconds, 1),
+            "items": items,
+        }
+        logger.info(
+            f"🧮 计划: 新建 {counts['create']}，更新 {counts['update']}，归档 {counts['archive']}，跳过 {counts['skip']}，"
+            f"图片 {images}（需上传 {image_uploads}），预计 {total_requests} 次 Notion 请求，约 {estimated_seconds:.0f} 秒"
+        )
+        return plan
 
     def sync_to_notion(self):
         logger.info("🚀 开始同步 Flomo 到 Notion")
@@ -130,135 +532,120 @@ class Flomo2Notion:
             logger.error("❌ 未设置 FLOMO_TOKEN 环境变量")
             return
             
-        memo_list = []
-        latest_updated_at = "0"
+        # 上次运行被取消或超时时，先恢复已提交的结果；保存失败时保留日志并停止，下次运行再恢复
+        if not self._resume_from_journal():
+            logger.error("❌ 恢复上次运行的结果失败，保留同步日志，停止本次同步")
+            return
 
-        logger.info("📥 开始获取 Flomo 数据...")
-        while True:
-            try:
-                logger.debug(f"请求参数: latest_updated_at(最早更新时间)={latest_updated_at}")
-                new_memo_list = self.flomo_api.get_memo_list(authorization, latest_updated_at)
-                if not new_memo_list:
-                    logger.debug("📥 已获取所有记录")
-                    break
-                memo_list.extend(new_memo_list)
-               
-                # 获取本地时间戳
-                local_time = time.localtime()
-                # 将本地时间转换为时间戳
-                local_timestamp = time.mktime(time.strptime(new_memo_list[-1]['updated_at'], "%Y-%m-%d %H:%M:%S"))
-                # 如果不是北京时区(UTC+8),需要进行时区转换
-                if local_time.tm_gmtoff != 8 * 3600:
-                    # 转换为北京时间戳
-                    beijing_timestamp = local_timestamp + (8 * 3600 - local_time.tm_gmtoff)
-                else:
-                    beijing_timestamp = local_timestamp
-                latest_updated_at = str(int(beijing_timestamp))
-                logger.debug(f"请求成功，最新记录时间: {latest_updated_at}")
-                logger.debug(f"📥 已获取 {len(memo_list)} 条记录")
-            except Exception as e:
-                logger.error(f"❌ 获取 Flomo 数据失败: {str(e)}")
-                return
-        
-        # 不要过滤掉已删除的记录，而是记录它们
-        deleted_memo_slugs = set()
-        for memo in memo_list:
-            if memo.get('deleted_at') is not None:
-                deleted_memo_slugs.add(memo['slug'])
-        
-        logger.info(f"📥 共有 {len(memo_list)} 条记录，其中 {len(deleted_memo_slugs)} 条已删除")
-        
-        # 2. 调用notion api获取数据库存在的记录，用slug标识唯一，如果存在则更新，不存在则写入
+        # 是否全量更新，默认否
+        full_update = os.getenv("FULL_UPDATE", "false").lower() == "true"
+        latest_updated_at = self._start_watermark(full_update)
+        incremental = latest_updated_at != "0"
+
+        # 2. 刷新本地的 slug -> Notion 页面索引，用slug标识唯一，如果存在则更新，不存在则写入
         logger.info("🔍 查询 Notion 数据库...")
         try:
-            notion_memo_list = self.notion_helper.query_all(self.notion_helper.page_id)
-            slug_map = {}
-            for notion_memo in notion_memo_list:
-                slug_map[notion_utils.get_rich_text_from_result(notion_memo, "slug")] = notion_memo.get("id")
-            logger.debug(f"🔍 Notion 数据库中已有 {len(slug_map)} 条记录")
+            self._refresh_slug_index(force_full=FULL_RESCAN or full_update)
         except Exception as e:
             logger.error(f"❌ 查询 Notion 数据库失败: {str(e)}")
             return
 
-        # 3. 轮询flomo的列表数据
-        total = len(memo_list)
-        logger.info(f"🔄 开始处理 {total} 条 Flomo 记录")
-        
         # 获取更新间隔（小时）
         interval_hour = int(UPDATE_INTERVAL_HOUR)  # 默认2小时
-        
-        # 获取在更新时间范围内的记录的最早和最新时间
-        updated_memos = [memo for memo in memo_list if is_within_n_hours(memo['updated_at'], interval_hour)]
-        if updated_memos:
-            earliest_memo = min(updated_memos, key=lambda x: x['updated_at'])
-            latest_memo = max(updated_memos, key=lambda x: x['updated_at'])
-            time_range = f"更新时间范围({interval_hour}小时内): {earliest_memo['updated_at']} 至 {latest_memo['updated_at']}"
+        # 增量拉取到的记录都是上次同步之后变更的，无需再按时间窗口过滤
+        check_window = not incremental
+
+        # 3. 以流的方式拉取flomo的列表数据并处理，首批写入与后续翻页重叠
+        logger.info("📥 开始获取并处理 Flomo 数据...")
+        memos = self._memo_source(authorization, latest_updated_at)
+
+        self.journal.start()
+        try:
+            summary = self._process_memos(memos, full_update, check_window, interval_hour)
+        finally:
+            if self.image_optimizer is not None:
+                self.image_optimizer.close()
+        if self._save_state(summary["committed_updated_at"]):
+            self.journal.finish()
+        send_telegram_notification(self._finish(summary, interval_hour, time.time() - start_time))
+
+    def _memo_source(self, authorization, latest_updated_at):
+        """按是否从头拉取选择记录流：首次导入/全量扫描可以按时间窗口并行拉取"""
+        if latest_updated_at == "0" and FLOMO_BACKFILL_WORKERS > 1:
+            backfill = FlomoBackfill(self.flomo_api, FLOMO_BACKFILL_WORKERS, FLOMO_BACKFILL_WINDOWS)
+            return backfill.iter_memos(authorization, latest_updated_at)
+        return self.flomo_api.iter_memos(authorization, latest_updated_at)
+
+    def _start_watermark(self, full_update):
+        """
+        增量同步：从上次成功提交的水位线开始拉取，全量扫描/全量更新时从头拉取
+
+        Returns:
+            str: flomo 的 latest_updated_at 参数，"0" 表示从头拉取
+        """
+        if FULL_RESCAN or full_update:
+            logger.info("📥 全量扫描模式，忽略已保存的水位线")
+            return "0"
+        latest_updated_at = self.sync_state.get_watermark()
+        if latest_updated_at != "0":
+            logger.info(f"📥 增量同步，水位线: {latest_updated_at}")
+        return latest_updated_at
+
+    def _finish(self, summary, interval_hour, duration):
+        """
+        输出同步统计
+
+        Returns:
+            str: 完成通知的消息
+        """
+        total = summary["total"]
+        logger.info(f"📥 共有 {total} 条记录，其中 {summary['deleted_count']} 条已删除")
+
+        if summary["earliest_updated_at"]:
+            time_range = (
+                f"更新时间范围({interval_hour}小时内): "
+                f"{summary['earliest_updated_at']} 至 {summary['latest_updated_at']}"
+            )
         else:
             time_range = f"没有 {interval_hour} 小时内更新的记录"
-        
-        for i, memo in enumerate(memo_list):
-            progress = f"[{i+1}/{total}]"
-            logger.debug(f"{progress} 🔍 处理记录 - {memo['slug']}")
-            
-            # 是否全量更新，默认否
-            full_update = os.getenv("FULL_UPDATE", False)
-            
-            if memo['slug'] in slug_map.keys():
-                # 检查是否需要更新
-                if not full_update and not is_within_n_hours(memo['updated_at'], interval_hour):
-                    self.skip_count += 1
-                    logger.info(f"{progress} ⏭️ 跳过记录 - 更新时间超过 {interval_hour} 小时")
-                    continue
 
-                try:
-                    page_id = slug_map[memo['slug']]
-                    logger.info(f"{progress} 🔄 更新记录")
-                    self.process_memo(memo, page_id)
-                    logger.info(f"{progress} ✅ 更新成功")
-                except Exception as e:
-                    self.error_count += 1
-                    logger.error(f"{progress} ❌ 更新失败: {str(e)}")
-            else:
-                try:
-                    # 判断memo是否已删除
-                    if memo['slug'] in deleted_memo_slugs:
-                        logger.info(f"{progress} ⏭️ 跳过记录 - 已删除")
-                        self.skip_count += 1
-                        continue
-                    logger.info(f"{progress} 📝 新记录")
-                    self.process_memo(memo)
-                    logger.info(f"{progress} ✅ 插入成功")
-                except Exception as e:
-                    self.error_count += 1
-                    logger.error(f"{progress} ❌ 插入失败: {str(e)}")
-        
-        end_time = time.time()
-        duration = end_time - start_time
-        
         logger.info("📊 同步统计:")
         logger.info(f"  - 总记录数: {total}")
         logger.info(f"  - 成功处理: {self.success_count}")
         logger.info(f"  - 跳过记录: {self.skip_count}")
         logger.info(f"  - 失败记录: {self.error_count}")
         logger.info(f"  - 耗时: {duration:.2f} 秒")
+        image_optimization = self.image_optimizer.summary() if self.image_optimizer is not None else None
+        if image_optimization:
+            logger.info(f"  - 图片优化: {image_optimization}")
         logger.info("✅ 同步完成")
         
-        # 发送完成通知
-        notification_message = NotificationProcessor.format_completion_notification(
+        # 完成通知
+        return NotificationProcessor.format_completion_notification(
             total,
             self.success_count,
             self.skip_count,
             self.error_count,
             duration,
-            time_range
+            time_range,
+            image_optimization
         )
-        send_telegram_notification(notification_message)
 
 
 if __name__ == "__main__":
-    # flomo同步到notion入口
+    # flomo同步到notion入口，--plan [文件] 只输出同步计划（JSON），不写入 Notion
     flomo2notion = Flomo2Notion()
-    flomo2notion.sync_to_notion()
+    if "--plan" in sys.argv:
+        plan = flomo2notion.plan_sync()
+        output = json.dumps(plan, ensure_ascii=False, indent=2)
+        index = sys.argv.index("--plan")
+        if index + 1 < len(sys.argv):
+            with open(sys.argv[index + 1], "w", encoding="utf-8") as f:
+                f.write(output)
+        else:
+            print(output)
+    else:
+        flomo2notion.sync_to_notion()
 
     # notionify key
     # secret_IHWKSLUTqUh3A8TIKkeXWePu3PucwHiRwDEcqNp5uT3
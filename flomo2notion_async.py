@@ -0,0 +1,232 @@
+"""
+基于 asyncio 的 Flomo 到 Notion 同步引擎
+
+与 Flomo2Notion 的同步逻辑一致（水位线、内容指纹、slug 索引、块级差异更新），
+Flomo 拉取、图片下载/上传和 Notion 请求都使用异步客户端，可以在 FastAPI 的事件循环中运行而不阻塞其他请求。
+"""
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+
+from flomo.flomo_api import AsyncFlomoApi
+from notionify.block_diff import AsyncBlockDiffer
+from notionify.md2notion import Md2NotionUploader
+from notionify.notion_helper import AsyncNotionHelper
+from rate_limiter import RateLimiter
+from sync_state import SyncState, CommitTracker
+from sync_journal import SyncJournal
+from image_cache import ImageCache
+from image_optimizer import create_image_optimizer
+from render_cache import RenderCache
+from utils import memo_fingerprint
+from tools import send_telegram_notification, AsyncImageProcessor, ContentProcessor, NotificationProcessor
+from flomo2notion import Flomo2Notion
+from config import *
+
+logger = get_logger(__name__)
+
+
+class AsyncFlomo2Notion(Flomo2Notion):
+    def __init__(self):
+        self.flomo_api = None
+        self.notion_helper = AsyncNotionHelper()
+        self.uploader = Md2NotionUploader()
+        self.image_cache = ImageCache()
+        self.image_optimizer = create_image_optimizer()
+        self.image_processor = None
+        self.render_cache = RenderCache()
+        self.content_processor = ContentProcessor(self.notion_helper, self.uploader, render_cache=self.render_cache)
+        self.sync_state = SyncState()
+        self.journal = SyncJournal()
+        self.resumed = {}
+        self.success_count = 0
+        self.error_count = 0
+        self.skip_count = 0
+        self._count_lock = threading.Lock()
+
+    async def process_memo(self, memo, page_id=None):
+        client = self.notion_helper.client
+        if memo.get('deleted_at') is not None:
+            if page_id:
+                logger.info(f"🗑️ 删除已删除的记录")
+                # 将 Notion 页面归档（相当于删除）
+                await client.pages.update(page_id=page_id, archived=True)
+                self.sync_state.remove_memo(memo['slug'])
+                self.image_cache.update_memo_files(memo['slug'], [])
+                self.journal.record(memo['slug'], "archive", page_id)
+                self._increment("success_count")
+                return
+            self._increment("skip_count")
+            logger.info(f"🗑️ 跳过已删除的记录")
+            return
+
+        self.image_cache.update_memo_files(memo['slug'], self._memo_image_urls(memo))
+        # 同一条记录的图片并发下载和上传
+        content_md, content_text, image_files = await self.content_processor.process_content_async(
+            memo, self.image_processor
+        )
+        properties = self._build_properties(memo, content_text, page_id)
+        # 渲染是 CPU 密集操作，放到线程中执行，避免阻塞事件循环
+        blocks = await asyncio.to_thread(
+            self.content_processor.render_blocks, content_md, image_files, self.image_processor
+        )
+        try:
+            if page_id:
+                page = await client.pages.update(page_id=page_id, properties=properties)
+                stats = await AsyncBlockDiffer(self.notion_helper, self.uploader).sync(page["id"], blocks)
+                logger.info(
+                    f"✅ 更新: 页面内容已同步，保留 {stats['kept']}，更新 {stats['updated']}，"
+                    f"插入 {stats['inserted']}，删除 {stats['deleted']}"
+                )
+            else:
+                page = await self.uploader.createPageAsync(
+                    client, blocks, properties=properties, **self._new_page_options()
+                )
+                logger.debug(f"✅ Notion页面创建成功，ID: {page['id']}")
+        except Exception:
+            # 缓存的上传对象可能已失效（如过期），下次重新上传
+            self.image_cache.discard([img['url'] for img in image_files])
+            raise
+
+        fingerprint = memo_fingerprint(memo)
+        self.sync_state.set_page(memo['slug'], page['id'])
+        self.sync_state.set_fingerprint(memo['slug'], fingerprint)
+        self.journal.record(memo['slug'], "update" if page_id else "create", page['id'], fingerprint)
+        self.image_cache.mark_attached([img['url'] for img in image_files])
+        self._increment("success_count")
+
+    async def _sync_memo(self, memo, progress, full_update, check_window, interval_hour):
+        """同步单条记录，返回是否处理成功（跳过也算成功）"""
+        page_id = self.sync_state.get_page_id(memo['slug'])
+        reason = self._skip_reason(memo, page_id, full_update, check_window, interval_hour)
+        if reason:
+            self._increment("skip_count")
+            logger.info(f"{progress} ⏭️ 跳过记录 - {reason}")
+            return True
+
+        action = "更新" if page_id else "插入"
+        logger.info(f"{progress} 🔄 更新记录" if page_id else f"{progress} 📝 新记录")
+        try:
+            await self.process_memo(memo, page_id)
+            logger.info(f"{progress} ✅ {action}成功")
+        except Exception as e:
+            self._increment("error_count")
+            logger.error(f"{progress} ❌ {action}失败: {str(e)}", exc_info=True)
+            return False
+        return True
+
+    async def _process_memos(self, memos, full_update, check_window, interval_hour):
+        """
+        最多同时处理 ASYNC_SYNC_CONCURRENCY 条记录，进度序号、同一 slug 串行和水位线规则与线程池版本一致
+
+        Args:
+            memos (async iterable): flomo 记录流
+        """
+        summary = self._new_summary()
+        tracker = CommitTracker()
+        in_flight = {}        # task -> (序号, slug, 更新时间)
+        slug_tasks = {}       # slug -> 处理中的 task
+
+        def collect(tasks):
+            for task in tasks:
+                index, slug, updated_at = in_flight.pop(task)
+                if slug_tasks.get(slug) is task:
+                    del slug_tasks[slug]
+                self._finish_memo(tracker, index, task.result(), updated_at)
+
+        try:
+            async for memo in memos:
+                index = summary["total"]
+                self._track_memo(summary, memo, interval_hour)
+                progress = f"[{index + 1}]"
+                logger.debug(f"{progress} 🔍 处理记录 - {memo['slug']}")
+
+                # 同一 slug 在流中重复出现时，等前一次处理结束，避免重复创建页面
+                previous = slug_tasks.get(memo['slug'])
+                if previous is not None:
+                    await asyncio.wait([previous])
+                while len(in_flight) >= ASYNC_SYNC_CONCURRENCY:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+
+                task = asyncio.create_task(self._sync_memo(memo, progress, full_update, check_window, interval_hour))
+                in_flight[task] = (index, memo['slug'], memo['updated_at'])
+                slug_tasks[memo['slug']] = task
+        except Exception as e:
+            logger.error(f"❌ 获取 Flomo 数据失败: {str(e)}")
+
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            collect(done)
+        summary["committed_updated_at"] = tracker.committed_updated_at
+        return summary
+
+    async def _refresh_slug_index(self, force_full=False):
+        full, query_filter = self._slug_index_filter(force_full)
+        notion_memo_list = await self.notion_helper.query_all(self.notion_helper.page_id, filter=query_filter)
+        self._update_slug_index(notion_memo_list, full)
+
+    async def sync_to_notion(self):
+        logger.info("🚀 开始同步 Flomo 到 Notion（异步）")
+        start_time = time.time()
+
+        # Telegram 通知使用同步请求，放到线程中发送
+        await asyncio.to_thread(send_telegram_notification, NotificationProcessor.format_start_notification())
+
+        authorization = os.getenv("FLOMO_TOKEN")
+        if not authorization:
+            logger.error("❌ 未设置 FLOMO_TOKEN 环境变量")
+            return
+
+        # 上次运行被取消或超时时，先恢复已提交的结果（读日志、写状态文件，放到线程中执行）；
+        # 保存失败时保留日志并停止，下次运行再恢复
+        if not await asyncio.to_thread(self._resume_from_journal):
+            logger.error("❌ 恢复上次运行的结果失败，保留同步日志，停止本次同步")
+            return
+
+        full_update = os.getenv("FULL_UPDATE", "false").lower() == "true"
+        latest_updated_at = self._start_watermark(full_update)
+        incremental = latest_updated_at != "0"
+
+        timeout = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        limits = httpx.Limits(max_connections=HTTP_POOL_MAXSIZE * HTTP_POOL_CONNECTIONS, max_keepalive_connections=HTTP_POOL_MAXSIZE)
+        try:
+            # Flomo 拉取和图片下载共用一个异步客户端
+            async with httpx.AsyncClient(timeout=timeout, limits=limits) as http_client:
+                self.flomo_api = AsyncFlomoApi(http_client, rate_limiter=RateLimiter(FLOMO_RATE_LIMIT))
+                self.image_processor = AsyncImageProcessor(
+                    self.notion_helper, http_client, self.image_cache, self.image_optimizer
+                )
+
+                logger.info("🔍 查询 Notion 数据库...")
+                try:
+                    await self._refresh_slug_index(force_full=FULL_RESCAN or full_update)
+                except Exception as e:
+                    logger.error(f"❌ 查询 Notion 数据库失败: {str(e)}")
+                    return
+
+                interval_hour = int(UPDATE_INTERVAL_HOUR)
+                # 增量拉取到的记录都是上次同步之后变更的，无需再按时间窗口过滤
+                check_window = not incremental
+
+                logger.info("📥 开始获取并处理 Flomo 数据...")
+                memos = self.flomo_api.iter_memos(authorization, latest_updated_at)
+                self.journal.start()
+                summary = await self._process_memos(memos, full_update, check_window, interval_hour)
+        finally:
+            await self.notion_helper.aclose()
+            if self.image_optimizer is not None:
+                # 关闭进程池会等待子进程退出
+                await asyncio.to_thread(self.image_optimizer.close)
+
+        if await asyncio.to_thread(self._save_state, summary["committed_updated_at"]):
+            await asyncio.to_thread(self.journal.finish)
+        message = self._finish(summary, interval_hour, time.time() - start_time)
+        await asyncio.to_thread(send_telegram_notification, message)
+
+
+if __name__ == "__main__":
+    asyncio.run(AsyncFlomo2Notion().sync_to_notion())
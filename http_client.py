@@ -0,0 +1,182 @@
+"""
+共享的 HTTP 会话，复用连接（keep-alive）并统一设置超时
+"""
+import io
+import threading
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    get_logger, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_HOST_POOL_SIZES,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+
+logger = get_logger(__name__)
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TimeoutSession(requests.Session):
+    """未显式传入 timeout 时使用默认的连接/读取超时"""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+class FileSlice:
+    """
+    文件中 [offset, offset + length) 区间的只读视图，用于分片上传
+
+    多个分片共享同一个文件对象，每次读取都在锁内定位并读取，可以在多个线程中同时发送
+    """
+
+    def __init__(self, fileobj, offset, length, lock):
+        self._file = fileobj
+        self._offset = offset
+        self._length = length
+        self._lock = lock
+        self._pos = 0
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self._length
+        self._pos = min(max(0, offset), self._length)
+        return self._pos
+
+    def read(self, size=-1):
+        remaining = self._length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        with self._lock:
+            self._file.seek(self._offset + self._pos)
+            chunk = self._file.read(size)
+        self._pos += len(chunk)
+        return chunk
+
+
+class MultipartFile:
+    """
+    单个文件的 multipart/form-data 请求体，发送时按块读取文件，不在内存中拼接整个文件
+
+    长度已知，requests 会设置 Content-Length 并以流的方式发送；支持 seek(0) 以便重试时重新发送
+    """
+
+    def __init__(self, field, filename, fileobj, content_type, fields=None):
+        """
+        Args:
+            field (str): 文件字段名
+            filename (str): 文件名
+            fileobj: 可 seek 的文件对象
+            content_type (str): 文件的内容类型
+            fields (dict): 放在文件之前的普通表单字段，如分片上传的 part_number
+        """
+        self.boundary = uuid.uuid4().hex
+        filename = filename.replace('"', '%22')
+        head = "".join(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f'{value}\r\n'
+            for name, value in (fields or {}).items()
+        ).encode("utf-8") + (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        ).encode("utf-8")
+        tail = f'\r\n--{self.boundary}--\r\n'.encode("utf-8")
+        fileobj.seek(0, io.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        self._parts = [io.BytesIO(head), fileobj, io.BytesIO(tail)]
+        self._index = 0
+        self.len = len(head) + size + len(tail)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.len
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if offset != 0 or whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("MultipartFile 只支持回到开头")
+        for part in self._parts:
+            part.seek(0)
+        self._index = 0
+
+    def read(self, size=-1):
+        chunks = []
+        while self._index < len(self._parts) and size != 0:
+            chunk = self._parts[self._index].read(size)
+            if not chunk:
+                self._index += 1
+                continue
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+
+def parse_host_pool_sizes(value):
+    """
+    解析按主机设置的连接池大小
+
+    Args:
+        value (str): 形如 "api.notion.com=20,flomoapp.com=4" 的配置
+
+    Returns:
+        dict: 主机名到连接池大小的映射
+    """
+    sizes = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        host, _, size = item.partition("=")
+        try:
+            sizes[host.strip()] = int(size)
+        except ValueError:
+            logger.warning(f"⚠️ 忽略无效的连接池配置: {item}")
+    return sizes
+
+
+def create_session():
+    session = TimeoutSession()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    for host, size in parse_host_pool_sizes(HTTP_HOST_POOL_SIZES).items():
+        host_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+        # 以 / 结尾，避免前缀匹配到 flomoapp.com.example 这样的其他主机；子域名需要单独配置
+        session.mount(f"https://{host}/", host_adapter)
+        session.mount(f"http://{host}/", host_adapter)
+    return session
+
+
+def get_session():
+    """获取进程内共享的 HTTP 会话"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session()
+    return _session
@@ -0,0 +1,203 @@
+"""
+图片上传缓存，在多次运行之间复用已上传到 Notion 的文件
+
+以去掉查询参数的图片 URL 为键，保存 Notion 的 file_upload ID。尚未附加到页面的上传对象会在
+expiry_time 过期，过期后不再使用；附加到页面后可以在其他块中重复引用。
+
+同时按图片内容的摘要（SHA-256）保存上传对象，不同 URL 的相同图片只上传一次。
+"""
+import json
+import os
+import threading
+import time
+
+from config import get_logger, IMAGE_CACHE_FILE, IMAGE_CACHE_MAX_ENTRIES
+from utils import strip_url_query
+
+logger = get_logger(__name__)
+
+# 距离过期不足该秒数的未附加上传对象视为已过期，留出创建页面的时间
+EXPIRY_MARGIN = 300
+
+
+class ImageCache:
+    """基于本地 JSON 文件的图片上传缓存，读写加锁，可在多个工作线程间共享"""
+
+    def __init__(self, path=IMAGE_CACHE_FILE, max_entries=IMAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self.data = self._load()
+        self.hits = 0
+        self.misses = 0
+        self.digest_hits = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {"images": {}, "digests": {}, "memos": {}}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data.setdefault("images", {})
+            data.setdefault("digests", {})
+            data.setdefault("memos", {})
+            return data
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ 读取图片缓存失败，将使用空缓存: {str(e)}")
+            return {"images": {}, "digests": {}, "memos": {}}
+
+    def save(self):
+        """原子写入缓存文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        logger.debug(
+            f"💾 图片缓存已保存: {self.path}，命中 {self.hits}，未命中 {self.misses}，相同内容复用 {self.digest_hits}"
+        )
+
+    @staticmethod
+    def _is_expired(entry):
+        """未附加到页面的上传对象即将过期时不再使用"""
+        expiry_time = entry.get("expiry_time")
+        return not entry.get("attached") and expiry_time and expiry_time - EXPIRY_MARGIN <= time.time()
+
+    def get(self, url):
+        """
+        获取图片可复用的上传对象
+
+        Args:
+            url (str): 图片 URL
+
+        Returns:
+            str: file_upload ID，没有或已过期时返回 None
+        """
+        key = strip_url_query(url)
+        with self._lock:
+            entry = self.data["images"].get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if self._is_expired(entry):
+                logger.debug(f"🗑️ 图片上传对象已过期: {key}")
+                del self.data["images"][key]
+                self.misses += 1
+                return None
+            entry["used_at"] = int(time.time())
+            self.hits += 1
+            return entry["file_upload_id"]
+
+    def get_by_digest(self, digest):
+        """
+        按图片内容的摘要获取可复用的上传对象
+
+        Args:
+            digest (str): 图片内容的 SHA-256 摘要
+
+        Returns:
+            dict: {"id": file_upload ID, "expiry_time": 过期时间戳}，没有或已过期时返回 None
+        """
+        with self._lock:
+            entry = self.data["digests"].get(digest)
+            if entry is None:
+                return None
+            if self._is_expired(entry):
+                del self.data["digests"][digest]
+                return None
+            entry["used_at"] = int(time.time())
+            self.digest_hits += 1
+            return {"id": entry["file_upload_id"], "expiry_time": entry.get("expiry_time")}
+
+    def put(self, url, file_upload_id, expiry_time=None, digest=None):
+        """
+        记录新上传（或按内容复用）的图片
+
+        Args:
+            url (str): 图片 URL
+            file_upload_id (str): Notion 的 file_upload ID
+            expiry_time (int): 未附加时的过期时间戳
+            digest (str): 图片内容的摘要，同时记录到摘要表
+        """
+        now = int(time.time())
+        with self._lock:
+            self.data["images"][strip_url_query(url)] = {
+                "file_upload_id": file_upload_id,
+                "expiry_time": expiry_time,
+                "attached": False,
+                "used_at": now,
+                "digest": digest,
+            }
+            if digest:
+                entry = self.data["digests"].get(digest)
+                if entry is None or entry["file_upload_id"] != file_upload_id:
+                    self.data["digests"][digest] = {
+                        "file_upload_id": file_upload_id,
+                        "expiry_time": expiry_time,
+                        "attached": False,
+                        "used_at": now,
+                    }
+            self._evict_overflow()
+
+    def _evict_overflow(self):
+        for table in (self.data["images"], self.data["digests"]):
+            if len(table) <= self.max_entries:
+                continue
+            # 淘汰最久未使用的条目
+            for key in sorted(table, key=lambda key: table[key].get("used_at", 0))[:len(table) - self.max_entries]:
+                del table[key]
+
+    def _drop_unreferenced_digests(self, digests):
+        """移除不再被任何图片 URL 引用的摘要"""
+        digests = set(digests) - {None}
+        if not digests:
+            return
+        digests -= {entry.get("digest") for entry in self.data["images"].values()}
+        for digest in digests:
+            self.data["digests"].pop(digest, None)
+
+    def discard(self, urls):
+        """移除缓存条目（如引用被 Notion 拒绝时），相同内容的摘要条目一并移除"""
+        with self._lock:
+            for url in urls:
+                entry = self.data["images"].pop(strip_url_query(url), None)
+                if entry and entry.get("digest"):
+                    self.data["digests"].pop(entry["digest"], None)
+
+    def update_memo_files(self, slug, urls):
+        """
+        记录的附件列表变化时，移除不再被任何记录引用的图片
+
+        Args:
+            slug (str): 记录的 slug
+            urls (list): 记录当前的图片 URL 列表
+        """
+        keys = [strip_url_query(url) for url in urls]
+        with self._lock:
+            previous = self.data["memos"].get(slug, [])
+            if previous == keys:
+                return
+            if keys:
+                self.data["memos"][slug] = keys
+            else:
+                self.data["memos"].pop(slug, None)
+            removed = set(previous) - set(keys)
+            if removed:
+                referenced = {key for memo_keys in self.data["memos"].values() for key in memo_keys}
+                dropped = [self.data["images"].pop(key, None) for key in removed - referenced]
+                self._drop_unreferenced_digests(entry.get("digest") for entry in dropped if entry)
+
+    def mark_attached(self, urls):
+        """记录的页面已写入 Notion，这些上传对象不会再过期"""
+        with self._lock:
+            for url in urls:
+                entry = self.data["images"].get(strip_url_query(url))
+                if entry is None:
+                    continue
+                digest_entry = self.data["digests"].get(entry.get("digest"))
+                for item in (entry, digest_entry):
+                    if item is not None and item["file_upload_id"] == entry["file_upload_id"]:
+                        item["attached"] = True
+                        item["expiry_time"] = None
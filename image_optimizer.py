@@ -0,0 +1,198 @@
+"""
+上传前的图片优化：缩小尺寸、按配置的格式和质量重新编码，并去除 EXIF 等元数据
+
+依赖可选的 Pillow，未安装时不启用。图片处理是 CPU 密集型操作，在进程池中执行，不阻塞下载和上传的线程。
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from config import (
+    get_logger, IMAGE_OPTIMIZE, IMAGE_OPTIMIZE_MAX_DIMENSION, IMAGE_OPTIMIZE_FORMAT,
+    IMAGE_OPTIMIZE_QUALITY, IMAGE_OPTIMIZE_WORKERS, IMAGE_OPTIMIZE_MAX_BYTES
+)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+logger = get_logger(__name__)
+
+# 重新编码后的文件扩展名
+FORMAT_EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+# 可以处理的图片内容类型，其余（如 SVG）原样上传
+SUPPORTED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/webp", "image/bmp", "image/tiff", "image/gif"}
+
+
+def optimize_image_bytes(data, max_dimension, image_format, quality):
+    """
+    在子进程中优化一张图片
+
+    Args:
+        data (bytes): 原始图片内容
+        max_dimension (int): 长边的最大像素数，0 表示不缩放
+        image_format (str): 输出格式（JPEG/PNG/WEBP），为空时保持原格式
+        quality (int): JPEG/WEBP 的编码质量
+
+    Returns:
+        tuple: (优化后的内容, 内容类型, 输出格式)，没有变小或不适合处理（如动图）时返回 None
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        if getattr(source, "is_animated", False):
+            # 重新编码动图会丢失帧
+            return None
+        target_format = (image_format or source.format or "PNG").upper()
+        if target_format == "JPG":
+            target_format = "JPEG"
+        # 按 EXIF 方向旋转后再丢弃 EXIF，避免图片方向出错
+        image = ImageOps.exif_transpose(source)
+        if max_dimension and max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if target_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode == "CMYK":
+            image = image.convert("RGB")
+
+        options = {"optimize": True} if target_format in ("JPEG", "PNG") else {}
+        if target_format in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        # PNG 等编码器会从 info 中取 icc_profile、exif 等元数据写入新文件，只保留属于像素数据的透明色
+        image.info = {key: value for key, value in image.info.items() if key == "transparency"}
+        output = io.BytesIO()
+        image.save(output, format=target_format, **options)
+
+    result = output.getvalue()
+    if len(result) >= len(data):
+        return None
+    return result, Image.MIME.get(target_format, "image/png"), target_format
+
+
+class ImageOptimizer:
+    """在进程池中优化图片，并统计节省的字节数和耗时，可在多个工作线程间共享"""
+
+    def __init__(self, max_dimension=IMAGE_OPTIMIZE_MAX_DIMENSION, image_format=IMAGE_OPTIMIZE_FORMAT,
+                 quality=IMAGE_OPTIMIZE_QUALITY, workers=IMAGE_OPTIMIZE_WORKERS, max_bytes=IMAGE_OPTIMIZE_MAX_BYTES):
+        self.max_dimension = max_dimension
+        self.image_format = image_format
+        self.quality = quality
+        self.workers = workers or None
+        self.max_bytes = max_bytes
+        self._executor = None
+        self._lock = threading.Lock()
+        self.count = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.seconds = 0.0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 工作线程运行时 fork 子进程可能继承被占用的锁，使用 spawn 启动子进程
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def _read(self, fileobj, content_type):
+        """读取需要优化的图片内容，不支持的类型或超过大小上限时返回 None"""
+        if content_type not in SUPPORTED_CONTENT_TYPES:
+            return None
+        size = fileobj.seek(0, os.SEEK_END)
+        fileobj.seek(0)
+        if size > self.max_bytes:
+            # 整张读入内存会抵消流式下载/上传的内存优势，大图原样上传
+            logger.debug(f"🗜️ 图片 {size} 字节超过优化上限 {self.max_bytes}，上传原图")
+            return None
+        data = fileobj.read()
+        fileobj.seek(0)
+        return data
+
+    def _apply(self, fileobj, content_type, filename, data, result, started):
+        """记录统计并返回上传使用的 (文件对象, 内容类型, 文件名)"""
+        elapsed = time.time() - started
+        after = len(result[0]) if result else len(data)
+        with self._lock:
+            self.count += 1
+            self.bytes_before += len(data)
+            self.bytes_after += after
+            self.seconds += elapsed
+        if result is None:
+            return fileobj, content_type, filename
+        optimized, optimized_type, image_format = result
+        logger.debug(f"🗜️ 图片优化: {len(data)} -> {after} 字节，耗时 {elapsed:.2f} 秒")
+        filename = os.path.splitext(filename)[0] + FORMAT_EXTENSIONS.get(image_format, "")
+        return io.BytesIO(optimized), optimized_type, filename
+
+    def optimize(self, fileobj, content_type, filename):
+        """
+        优化一张图片，失败或没有变小时返回原文件
+
+        Args:
+            fileobj: 可 seek 的图片文件对象
+            content_type (str): 内容类型
+            filename (str): 文件名
+
+        Returns:
+            tuple: (文件对象, 内容类型, 文件名)
+        """
+        data = self._read(fileobj, content_type)
+        if data is None:
+            return fileobj, content_type, filename
+        started = time.time()
+        try:
+            result = self._get_executor().submit(
+                optimize_image_bytes, data, self.max_dimension, self.image_format, self.quality
+            ).result()
+        except Exception as e:
+            logger.warning(f"⚠️ 图片优化失败，上传原图: {str(e)}")
+            result = None
+        return self._apply(fileobj, content_type, filename, data, result, started)
+
+    async def optimize_async(self, fileobj, content_type, filename):
+        """optimize 的异步版本，等待进程池时不阻塞事件循环"""
+        data = self._read(fileobj, content_type)
+        if data is None:
+            return fileobj, content_type, filename
+        started = time.time()
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), optimize_image_bytes,
+                data, self.max_dimension, self.image_format, self.quality
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ 图片优化失败，上传原图: {str(e)}")
+            result = None
+        return self._apply(fileobj, content_type, filename, data, result, started)
+
+    def summary(self):
+        """优化统计的文字说明"""
+        saved = self.bytes_before - self.bytes_after
+        ratio = saved / self.bytes_before * 100 if self.bytes_before else 0
+        return f"优化 {self.count} 张图片，节省 {saved} 字节（{ratio:.1f}%），耗时 {self.seconds:.2f} 秒"
+
+    def close(self):
+        """关闭进程池"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+def create_image_optimizer():
+    """
+    按配置创建图片优化器
+
+    Returns:
+        ImageOptimizer: 未启用或未安装 Pillow 时返回 None
+    """
+    if not IMAGE_OPTIMIZE:
+        return None
+    if Image is None:
+        logger.warning("⚠️ 已启用图片优化，但未安装 Pillow，上传原图")
+        return None
+    return ImageOptimizer()
@@ -1,5 +1,8 @@
+import asyncio
+
 from fastapi import FastAPI, BackgroundTasks
 from flomo2notion import Flomo2Notion
+from flomo2notion_async import AsyncFlomo2Notion
 from notion2flomo import Notion2Flomo
 import logging
 import os
@@ -27,6 +30,15 @@ async def sync_flomo2notion(background_tasks: BackgroundTasks):
     return {"message": "同步任务已启动"}
 
 
+@app.get("/sync/flomo2notion/async")
+async def sync_flomo2notion_async(background_tasks: BackgroundTasks):
+    """将flomo笔记同步到Notion（异步引擎，在事件循环中运行，不占用工作线程）"""
+    # 构造时读取同步状态、图片缓存等文件，放到线程中执行，避免阻塞事件循环
+    engine = await asyncio.to_thread(AsyncFlomo2Notion)
+    background_tasks.add_task(engine.sync_to_notion)
+    return {"message": "同步任务已启动"}
+
+
 @app.get("/sync/notion2flomo")
 async def sync_notion2flomo(background_tasks: BackgroundTasks):
     """将Notion笔记同步到flomo"""
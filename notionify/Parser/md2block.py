@@ -1,60 +1,76 @@
+import re
+import threading
 from mistletoe.block_token import BlockToken, tokenize
-import itertools
 from mistletoe import span_token
 from md2notion.NotionPyRenderer import NotionPyRenderer
 
+# mistletoe 的渲染器在进入/退出时修改全局的 token 列表，Document 也依赖全局的 _root_node，
+# 多线程同时解析会互相覆盖，因此解析和渲染需要串行
+_render_lock = threading.Lock()
+
+
+# 与 str.splitlines 相同的行边界，逐行匹配而不是一次生成整个列表
+_LINE_PATTERN = re.compile(r'[^\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029]*(?:\r\n|[\n\r\x0b\x0c\x1c-\x1e\x85\u2028\u2029])?')
+
+
+def _with_newline(line):
+    return line if line.endswith('\n') else line + '\n'
+
+
+def iter_lines(source):
+    """
+    逐行读取 Markdown，行按 str.splitlines 的规则切分；文件对象等可迭代对象按原样逐行读取
+
+    Args:
+        source (str|Iterable[str]): Markdown 文本、文件对象或行的可迭代对象
+    """
+    if isinstance(source, str):
+        for match in _LINE_PATTERN.finditer(source):
+            line = match.group()
+            if line:
+                yield line
+    else:
+        yield from source
+
+
+def preprocess_lines(source):
+    """
+    单遍预处理 Markdown 行，每行都以 \n 结尾，在每个闭合的 $$ 公式块之后插入一个空行，使公式块与后面的内容分开
+
+    按行生成，不复制整个输入；结果与原来先拼接再重新 splitlines 的处理完全一致
+
+    Args:
+        source (str|Iterable[str]): Markdown 文本、文件对象或行的可迭代对象
+    """
+    in_equation = False
+    for line in iter_lines(source):
+        line = _with_newline(line)
+        # 文件中的行可能还包含 \f、\u2028 等行边界，与原来的处理一样再切分一次
+        for part in line.splitlines(keepends=True):
+            yield _with_newline(part)
+        if '$$\n' in line:
+            if in_equation:
+                yield '\n'
+            in_equation = not in_equation
+
 
 class Document(BlockToken):
     """
     Document token.
     """
     def __init__(self, lines):
-        if isinstance(lines, str):lines = lines.splitlines(keepends=True)
-        lines = [line if line.endswith('\n') else '{}\n'.format(line) for line in lines]
-
-        # add new line above and below '$$\n'
-        new_lines = []
-        temp_line = None
-        triggered = False
-        for line in lines:
-            #if line.strip().replace('\n',"") =='':continue
-            if not triggered and '$$\n' in line:
-                temp_line = [None, line, None]
-                triggered = True
-            elif triggered:
-                temp_line[1] += line
-                if '$$\n' in line:
-                    temp_line[2] = '\n'
-                    new_lines.append(temp_line)
-                    temp_line = None
-                    triggered = False
-                    
-            else:
-                new_lines.append([None, line, None])
-
-        if temp_line is not None:
-            new_lines.append(temp_line)
-        
-        
-        new_lines = list(itertools.chain(*new_lines))
-        new_lines = list(filter(lambda x: x is not None, new_lines))
-        new_lines = ''.join(new_lines)
-        lines = new_lines.splitlines(keepends=True)
-        lines = [line if line.endswith('\n') else '{}\n'.format(line) for line in lines]
-        #lines = [[t[1]] for  t in new_lines]
-        
-        
         self.footnotes = {}
         global _root_node
         _root_node = self
         span_token._root_node = self
-        self.children = tokenize(lines)
+        # mistletoe 需要回溯，会把行保存为一个列表，这是解析前唯一的一份完整副本
+        self.children = tokenize(preprocess_lines(lines))
         span_token._root_node = None
         _root_node = None
 
 
 def read_file(file_path):
-    with open(file_path, "r", encoding="utf-8") as mdFile:
+    with open(file_path, "r", encoding="utf-8") as mdFile, _render_lock:
         with NotionPyRenderer() as renderer:
             a  = Document(mdFile)
             out= renderer.render(a)
@@ -62,7 +78,7 @@ def read_file(file_path):
 
 
 def read_file_content(content):
-    with NotionPyRenderer() as renderer:
+    with _render_lock, NotionPyRenderer() as renderer:
         a  = Document(content)
         out= renderer.render(a)
     return out
@@ -0,0 +1,325 @@
+"""
+块级差异更新：比较页面已有的子块和新渲染的块列表，只发出收敛所需的最少更新、插入和删除请求
+"""
+import asyncio
+import difflib
+
+from config import get_logger
+
+logger = get_logger(__name__)
+
+# 可以原地更新内容的块类型
+UPDATABLE_TYPES = {
+    "paragraph", "heading_1", "heading_2", "heading_3", "bulleted_list_item",
+    "numbered_list_item", "quote", "to_do", "toggle", "callout", "code", "equation",
+}
+
+ANNOTATION_DEFAULTS = (
+    ("bold", False), ("italic", False), ("strikethrough", False),
+    ("underline", False), ("code", False), ("color", "default"),
+)
+
+
+def block_type_of(block):
+    """获取块类型，兼容接口返回的块（带 type 字段）和请求格式的块（{type: {...}}）"""
+    block_type = block.get("type")
+    if block_type and block_type in block:
+        return block_type
+    return next(key for key in block if key not in ("object", "type"))
+
+
+def block_children_of(block):
+    """请求格式的块把子块放在类型对象的 children 中"""
+    return block[block_type_of(block)].get("children") or []
+
+
+def rich_text_key(rich_text):
+    """
+    把 rich_text 转换为可比较的元组，忽略 plain_text/href 等只读字段，
+    并合并样式相同的相邻文本（Notion 保存时会做同样的合并）
+    """
+    runs = []
+    for item in rich_text or []:
+        kind = item.get("type", "text")
+        if kind == "equation":
+            content = item["equation"]["expression"]
+            link = None
+        else:
+            text = item.get(kind) or {}
+            content = text.get("content", "")
+            link = (text.get("link") or {}).get("url")
+        if not content:
+            continue
+        annotations = item.get("annotations") or {}
+        style = (kind, link) + tuple(annotations.get(name, default) for name, default in ANNOTATION_DEFAULTS)
+        if runs and kind == "text" and runs[-1][0] == style:
+            runs[-1][1] += content
+        else:
+            runs.append([style, content])
+    return tuple((style, content) for style, content in runs)
+
+
+def block_content_key(block):
+    """
+    块自身内容（不含子块）的比较键，无法比较的块（如已上传的文件）返回一个唯一值，使其永远不相等
+    """
+    block_type = block_type_of(block)
+    body = block.get(block_type) or {}
+    key = [block_type, rich_text_key(body.get("rich_text"))]
+    if block_type == "code":
+        key.append(body.get("language"))
+    elif block_type == "equation":
+        key.append(body.get("expression"))
+    elif block_type == "image":
+        if "external" not in body:
+            # 上传到 Notion 的图片返回的是带签名的临时链接，无法与新的上传对象对应
+            return ("unmatchable", object())
+        key.append(body["external"].get("url"))
+    elif block_type == "table":
+        key.extend([body.get("table_width"), body.get("has_column_header"), body.get("has_row_header")])
+    elif block_type == "table_row":
+        key.append(tuple(rich_text_key(cell) for cell in body.get("cells", [])))
+    return tuple(key)
+
+
+class BlockDiffer:
+    """把页面（或块）的子块更新为新的块列表"""
+
+    def __init__(self, notion_helper, uploader):
+        self.notion_helper = notion_helper
+        self.uploader = uploader
+        self._children_cache = {}
+
+    def _get_children(self, block_id):
+        if block_id not in self._children_cache:
+            self._children_cache[block_id] = self.notion_helper.get_all_block_children(block_id)
+        return self._children_cache[block_id]
+
+    def _existing_key(self, block):
+        children = ()
+        if block.get("has_children"):
+            children = tuple(self._existing_key(child) for child in self._get_children(block["id"]))
+        return block_content_key(block) + (children,)
+
+    def _new_key(self, block):
+        children = tuple(self._new_key(child) for child in block_children_of(block))
+        return block_content_key(block) + (children,)
+
+    def _plan(self, old_blocks, old_keys, new_blocks, new_keys):
+        """
+        生成按最终顺序排列的操作列表，每个操作为
+        ("keep", old) / ("update", old, new) / ("delete", old) / ("insert", new)
+        """
+        plan = []
+        matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                plan.extend(("keep", old) for old in old_blocks[i1:i2])
+                continue
+            olds = old_blocks[i1:i2]
+            news = new_blocks[j1:j2]
+            for k in range(max(len(olds), len(news))):
+                old = olds[k] if k < len(olds) else None
+                new = news[k] if k < len(news) else None
+                if old is not None and new is not None:
+                    old_type = block_type_of(old)
+                    if old_type == block_type_of(new) and old_type in UPDATABLE_TYPES:
+                        plan.append(("update", old, new))
+                        continue
+                if old is not None:
+                    plan.append(("delete", old))
+                if new is not None:
+                    plan.append(("insert", new))
+        return plan
+
+    @staticmethod
+    def _needs_head_insert(plan):
+        """
+        接口只支持在某个块之后插入，如果需要在所有保留块之前插入新块，就无法定位插入点
+        """
+        has_anchor = False
+        pending_insert = False
+        for step in plan:
+            if step[0] in ("keep", "update"):
+                if pending_insert:
+                    return True
+                has_anchor = True
+            elif step[0] == "insert" and not has_anchor:
+                pending_insert = True
+        return False
+
+    def _build_plan(self, old_blocks, new_blocks):
+        """
+        生成把 old_blocks 更新为 new_blocks 的操作列表，无法定位插入点时返回 None（需要重写全部子块）
+        """
+        old_keys = [self._existing_key(block) for block in old_blocks]
+        new_keys = [self._new_key(block) for block in new_blocks]
+        plan = self._plan(old_blocks, old_keys, new_blocks, new_keys)
+
+        if self._needs_head_insert(plan) and old_blocks and new_blocks:
+            # 把第一个旧块原地改写为第一个新块，后续的块就都有了插入点
+            old_type = block_type_of(old_blocks[0])
+            if old_type == block_type_of(new_blocks[0]) and old_type in UPDATABLE_TYPES:
+                plan = [("update", old_blocks[0], new_blocks[0])] + self._plan(
+                    old_blocks[1:], old_keys[1:], new_blocks[1:], new_keys[1:]
+                )
+
+        if self._needs_head_insert(plan):
+            return None
+        return plan
+
+    def sync(self, parent_id, new_blocks):
+        """
+        将 parent_id 的子块更新为 new_blocks
+
+        Args:
+            parent_id (str): 页面或块的ID
+            new_blocks (list): 新渲染的块列表（请求格式，子块内联在 children 中）
+
+        Returns:
+            dict: 各类操作的数量
+        """
+        stats = {"kept": 0, "updated": 0, "inserted": 0, "deleted": 0}
+        old_blocks = self._get_children(parent_id)
+        plan = self._build_plan(old_blocks, new_blocks)
+
+        if plan is None:
+            logger.debug(f"🔁 需要在开头插入新块，重写全部子块: {parent_id}")
+            for block in old_blocks:
+                self.notion_helper.delete_block(block["id"])
+            self.uploader.uploadBlocks(self.notion_helper.client, parent_id, new_blocks)
+            stats["deleted"] += len(old_blocks)
+            stats["inserted"] += len(new_blocks)
+            return stats
+
+        anchor = None
+        pending = []
+
+        def flush():
+            nonlocal anchor
+            if pending:
+                block_ids = self.uploader.uploadBlocks(self.notion_helper.client, parent_id, pending, after=anchor)
+                anchor = block_ids[-1]
+                stats["inserted"] += len(pending)
+                pending.clear()
+
+        for step in plan:
+            action = step[0]
+            if action == "keep":
+                flush()
+                anchor = step[1]["id"]
+                stats["kept"] += 1
+            elif action == "update":
+                flush()
+                old, new = step[1], step[2]
+                self._update(old, new, stats)
+                anchor = old["id"]
+            elif action == "delete":
+                self.notion_helper.delete_block(step[1]["id"])
+                stats["deleted"] += 1
+            else:
+                pending.append(step[1])
+        flush()
+        return stats
+
+    def _update(self, old, new, stats):
+        """原地更新同类型块的内容，子块递归比较"""
+        block_type = block_type_of(new)
+        if block_content_key(old) != block_content_key(new):
+            body = {key: value for key, value in new[block_type].items() if key != "children"}
+            self.notion_helper.update_block(old["id"], block_type, body)
+            stats["updated"] += 1
+        else:
+            stats["kept"] += 1
+
+        if not old.get("has_children"):
+            self._children_cache[old["id"]] = []
+        old_children = tuple(self._existing_key(child) for child in self._get_children(old["id"]))
+        new_children = tuple(self._new_key(child) for child in block_children_of(new))
+        if old_children != new_children:
+            child_stats = self.sync(old["id"], block_children_of(new))
+            for key, value in child_stats.items():
+                stats[key] += value
+
+
+class AsyncBlockDiffer(BlockDiffer):
+    """
+    BlockDiffer 的异步版本，notion_helper 为 AsyncNotionHelper；
+    比较前并发加载整棵子块树，比较本身复用同步版本的逻辑
+    """
+
+    async def _load_children(self, block_id):
+        if block_id in self._children_cache:
+            return
+        children = await self.notion_helper.get_all_block_children(block_id)
+        self._children_cache[block_id] = children
+        await asyncio.gather(*(
+            self._load_children(child["id"]) for child in children if child.get("has_children")
+        ))
+
+    async def sync(self, parent_id, new_blocks):
+        """将 parent_id 的子块更新为 new_blocks，返回各类操作的数量"""
+        stats = {"kept": 0, "updated": 0, "inserted": 0, "deleted": 0}
+        await self._load_children(parent_id)
+        old_blocks = self._get_children(parent_id)
+        # difflib 比较是 CPU 密集操作，放到线程中执行，避免阻塞事件循环
+        plan = await asyncio.to_thread(self._build_plan, old_blocks, new_blocks)
+
+        if plan is None:
+            logger.debug(f"🔁 需要在开头插入新块，重写全部子块: {parent_id}")
+            await asyncio.gather(*(self.notion_helper.delete_block(block["id"]) for block in old_blocks))
+            await self.uploader.uploadBlocksAsync(self.notion_helper.client, parent_id, new_blocks)
+            stats["deleted"] += len(old_blocks)
+            stats["inserted"] += len(new_blocks)
+            return stats
+
+        anchor = None
+        pending = []
+
+        async def flush():
+            nonlocal anchor
+            if pending:
+                block_ids = await self.uploader.uploadBlocksAsync(
+                    self.notion_helper.client, parent_id, pending, after=anchor
+                )
+                anchor = block_ids[-1]
+                stats["inserted"] += len(pending)
+                pending.clear()
+
+        for step in plan:
+            action = step[0]
+            if action == "keep":
+                await flush()
+                anchor = step[1]["id"]
+                stats["kept"] += 1
+            elif action == "update":
+                await flush()
+                old, new = step[1], step[2]
+                await self._update(old, new, stats)
+                anchor = old["id"]
+            elif action == "delete":
+                await self.notion_helper.delete_block(step[1]["id"])
+                stats["deleted"] += 1
+            else:
+                pending.append(step[1])
+        await flush()
+        return stats
+
+    async def _update(self, old, new, stats):
+        """原地更新同类型块的内容，子块递归比较"""
+        block_type = block_type_of(new)
+        if block_content_key(old) != block_content_key(new):
+            body = {key: value for key, value in new[block_type].items() if key != "children"}
+            await self.notion_helper.update_block(old["id"], block_type, body)
+            stats["updated"] += 1
+        else:
+            stats["kept"] += 1
+
+        if not old.get("has_children"):
+            self._children_cache[old["id"]] = []
+        old_children = tuple(self._existing_key(child) for child in self._get_children(old["id"]))
+        new_children = tuple(self._new_key(child) for child in block_children_of(new))
+        if old_children != new_children:
+            child_stats = await self.sync(old["id"], block_children_of(new))
+            for key, value in child_stats.items():
+                stats[key] += value
@@ -0,0 +1,303 @@
+"""
+把 Flomo 记录的 HTML 直接转换为 Notion 块，一次遍历同时得到用于标题的纯文本
+
+替代 markdownify -> mistletoe -> NotionPyRenderer -> 正则解析 的转换链，输出的块格式与 Md2NotionUploader.renderContent 一致
+"""
+import re
+from html.parser import HTMLParser
+
+# 单个 rich_text 对象的文本长度上限
+MAX_TEXT_LENGTH = 2000
+
+# 转换器版本，转换结果发生变化时递增
+CONVERTER_VERSION = 1
+
+TEXT_BLOCK_TAGS = {
+    "p": "paragraph", "div": "paragraph",
+    "h1": "heading_1", "h2": "heading_2", "h3": "heading_3",
+    "h4": "heading_3", "h5": "heading_3", "h6": "heading_3",
+}
+LIST_TAGS = {"ul": "bulleted_list_item", "ol": "numbered_list_item"}
+# 行内样式标签对应的 annotations 字段
+STYLE_TAGS = {
+    "strong": ("bold", True), "b": ("bold", True),
+    "em": ("italic", True), "i": ("italic", True),
+    "u": ("underline", True), "ins": ("underline", True),
+    "s": ("strikethrough", True), "del": ("strikethrough", True), "strike": ("strikethrough", True),
+    "code": ("code", True),
+    "mark": ("color", "yellow_background"),
+}
+# 内容不需要转换的标签
+IGNORED_TAGS = {"script", "style", "head", "title"}
+
+ANNOTATION_FIELDS = ("bold", "italic", "strikethrough", "underline", "code", "color")
+DEFAULT_STYLE = (False, False, False, False, False, "default", None)
+
+_WHITESPACE = re.compile(r"\s+")
+_SPACES_AROUND_NEWLINE = re.compile(r" *\n *")
+
+
+def rich_text_item(content, style=DEFAULT_STYLE):
+    """
+    生成一个文本类型的 rich_text 对象
+
+    Args:
+        content (str): 文本内容
+        style (tuple): (bold, italic, strikethrough, underline, code, color, link)
+    """
+    link = style[6]
+    return {
+        "type": "text",
+        "text": {"content": content, "link": {"url": link} if link else None},
+        "annotations": dict(zip(ANNOTATION_FIELDS, style[:6])),
+        "plain_text": content,
+        "href": link,
+    }
+
+
+def rich_text(runs):
+    """把 [(style, text)] 转换为 rich_text 列表，超长的文本拆分为多个对象"""
+    items = []
+    for style, text in runs:
+        for start in range(0, len(text), MAX_TEXT_LENGTH):
+            items.append(rich_text_item(text[start:start + MAX_TEXT_LENGTH], style))
+    return items
+
+
+def text_block(block_type, text):
+    """生成只包含一段无样式文本的块，如标题"""
+    return {block_type: {"rich_text": rich_text([(DEFAULT_STYLE, text)])}}
+
+
+def external_image_block(url):
+    """生成外链图片块"""
+    return {"image": {"caption": [], "external": {"url": url}}}
+
+
+class _Block:
+    """转换过程中的块，结束后再生成 Notion 的块格式"""
+    __slots__ = ("type", "runs", "children", "language", "url")
+
+    def __init__(self, block_type):
+        self.type = block_type
+        self.runs = []
+        self.children = []
+        self.language = None
+        self.url = None
+
+    def add_text(self, text, style):
+        if self.runs and self.runs[-1][0] == style:
+            self.runs[-1][1] += text
+        else:
+            self.runs.append([style, text])
+
+    def has_content(self):
+        return bool(self.runs or self.children)
+
+    def trim(self):
+        """去掉首尾和换行两侧的空白（代码块保留原样）"""
+        if self.type == "code":
+            return
+        for run in self.runs:
+            run[1] = _SPACES_AROUND_NEWLINE.sub("\n", run[1])
+        if self.runs:
+            self.runs[0][1] = self.runs[0][1].lstrip()
+            self.runs[-1][1] = self.runs[-1][1].rstrip()
+        self.runs = [run for run in self.runs if run[1]]
+
+    def plain_text(self):
+        return "".join(text for _, text in self.runs)
+
+    def to_notion(self):
+        if self.type == "divider":
+            return {"divider": {}}
+        if self.type == "image":
+            return external_image_block(self.url)
+        body = {"rich_text": rich_text(self.runs)}
+        if self.type == "code":
+            body["language"] = self.language or "plain text"
+        children = [child.to_notion() for child in self.children if child.is_renderable()]
+        if children:
+            body["children"] = children
+        return {self.type: body}
+
+    def is_renderable(self):
+        """空段落不生成块，空列表项、分隔线等保留"""
+        return self.type != "paragraph" or self.has_content()
+
+
+class HtmlBlockConverter(HTMLParser):
+    """单次遍历 HTML，生成块树和纯文本"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = []
+        # 可以包含子块的容器（列表项、引用）
+        self._containers = []
+        # 当前接收行内文本的块
+        self._block = None
+        # 打开的行内样式：(标签, 字段, 值)
+        self._styles = []
+        self._lists = []
+        self._pre = 0
+        self._ignored = 0
+
+    def _parent(self):
+        return self._containers[-1].children if self._containers else self.root
+
+    def _new_block(self, block_type):
+        block = _Block(block_type)
+        self._parent().append(block)
+        return block
+
+    def _style(self):
+        if not self._styles:
+            return DEFAULT_STYLE
+        values = dict(zip(ANNOTATION_FIELDS, DEFAULT_STYLE[:6]))
+        link = None
+        for _, field, value in self._styles:
+            if field == "link":
+                link = value
+            else:
+                values[field] = value
+        return tuple(values[field] for field in ANNOTATION_FIELDS) + (link,)
+
+    def _text_target(self):
+        """
+        段落开始时决定文本写入哪个块：列表项的第一段和引用中的各段写入容器本身，其余新建块
+        """
+        container = self._containers[-1] if self._containers else None
+        if container is not None and container.type == "quote":
+            if container.runs:
+                container.add_text("\n", DEFAULT_STYLE)
+            return container
+        if container is not None and not container.has_content():
+            return container
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in IGNORED_TAGS:
+            self._ignored += 1
+            return
+        if self._pre:
+            if tag == "code":
+                for name, value in attrs:
+                    if name == "class" and value and value.startswith("language-"):
+                        self._block.language = value[len("language-"):].lower()
+            elif tag == "br":
+                self._block.add_text("\n", DEFAULT_STYLE)
+            return
+        if tag in TEXT_BLOCK_TAGS:
+            block_type = TEXT_BLOCK_TAGS[tag]
+            target = self._text_target() if block_type == "paragraph" else None
+            self._block = target if target is not None else self._new_block(block_type)
+        elif tag in LIST_TAGS:
+            self._lists.append(LIST_TAGS[tag])
+            self._block = None
+        elif tag == "li":
+            block = self._new_block(self._lists[-1] if self._lists else "bulleted_list_item")
+            self._containers.append(block)
+            self._block = block
+        elif tag == "blockquote":
+            block = self._new_block("quote")
+            self._containers.append(block)
+            self._block = block
+        elif tag == "pre":
+            self._block = self._new_block("code")
+            self._pre += 1
+        elif tag == "hr":
+            self._new_block("divider")
+            self._block = None
+        elif tag == "img":
+            src = dict(attrs).get("src")
+            if src:
+                self._new_block("image").url = src
+                self._block = None
+        elif tag == "br":
+            if self._block is not None:
+                self._block.add_text("\n", DEFAULT_STYLE)
+        elif tag == "a":
+            self._styles.append((tag, "link", dict(attrs).get("href")))
+        elif tag in STYLE_TAGS:
+            self._styles.append((tag,) + STYLE_TAGS[tag])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in ("br", "hr", "img"):
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in IGNORED_TAGS:
+            self._ignored = max(0, self._ignored - 1)
+            return
+        if tag == "pre":
+            self._pre = max(0, self._pre - 1)
+            if not self._pre:
+                self._block = None
+            return
+        if self._pre:
+            return
+        if tag in TEXT_BLOCK_TAGS:
+            self._block = None
+        elif tag in LIST_TAGS:
+            if self._lists:
+                self._lists.pop()
+            self._block = None
+        elif tag in ("li", "blockquote"):
+            if self._containers:
+                self._containers.pop()
+            self._block = None
+        elif tag == "a" or tag in STYLE_TAGS:
+            for index in range(len(self._styles) - 1, -1, -1):
+                if self._styles[index][0] == tag:
+                    del self._styles[index]
+                    break
+
+    def handle_data(self, data):
+        if self._ignored:
+            return
+        if self._pre:
+            self._block.add_text(data, DEFAULT_STYLE)
+            return
+        data = _WHITESPACE.sub(" ", data)
+        if self._block is None:
+            if not data.strip():
+                return
+            self._block = self._text_target() or self._new_block("paragraph")
+        if data == " " and not self._block.runs:
+            return
+        self._block.add_text(data, self._style())
+
+    def result(self):
+        """
+        Returns:
+            tuple: (Notion 块列表, 纯文本)
+        """
+        lines = []
+
+        def finish(blocks):
+            for block in blocks:
+                block.trim()
+                if block.runs:
+                    lines.append(block.plain_text())
+                finish(block.children)
+
+        finish(self.root)
+        blocks = [block.to_notion() for block in self.root if block.is_renderable()]
+        return blocks, "\n".join(lines)
+
+
+def html_to_blocks(html):
+    """
+    把 HTML 转换为 Notion 块列表和纯文本
+
+    Args:
+        html (str): Flomo 记录的 HTML 内容
+
+    Returns:
+        tuple: (Notion 块列表, 纯文本)
+    """
+    converter = HtmlBlockConverter()
+    converter.feed(html or "")
+    converter.close()
+    return converter.result()
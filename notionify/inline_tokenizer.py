@@ -0,0 +1,236 @@
+"""
+Markdown 行内标记的单遍分词：加粗、斜体、删除线、行内代码、链接和行内公式，直接生成 Notion 的 rich_text
+
+每种分隔符的闭合位置只向后查找并缓存，同一层内每个字符最多被扫描常数次；同一种样式不会嵌套，
+递归深度不超过样式的种类数，因此总耗时与输入长度成线性关系，不会像正则那样回溯。
+"""
+import re
+import string
+
+from notionify.html2block import DEFAULT_STYLE, rich_text
+
+# 行首位置的分隔符及其样式，双字符的分隔符优先
+DELIMITERS = {
+    "*": (("**", "bold"), ("*", "italic")),
+    "_": (("__", "bold"), ("_", "italic")),
+    "~": (("~~", "strikethrough"),),
+    "`": (("`", "code"),),
+}
+# 样式在 DEFAULT_STYLE 元组中的位置
+STYLE_FIELDS = {"bold": 0, "italic": 1, "strikethrough": 2, "code": 4}
+# 反斜杠可以转义的字符
+ESCAPABLE = frozenset(string.punctuation)
+# 可能开始行内标记的字符，其余字符整段跳过
+SPECIAL = re.compile(r"[*_~`$\[\\]")
+
+
+def _with(style, field, value=True):
+    """返回修改了一个字段的新样式元组"""
+    style = list(style)
+    style[field] = value
+    return tuple(style)
+
+
+class _Scanner:
+    """在 text[lo:hi] 中查找分隔符的下一个有效位置，结果按分隔符缓存，查找只向后推进"""
+
+    def __init__(self, text, hi):
+        self.text = text
+        self.hi = hi
+        self._cache = {}
+
+    def _valid_closer(self, token, pos):
+        if pos > 0 and self.text[pos - 1] == "\\" and token != "\n":
+            # 被转义的分隔符按原文处理
+            return False
+        if token[0] != "_":
+            return True
+        # 下划线紧跟字母数字时属于单词的一部分（如 snake_case），不能闭合
+        end = pos + len(token)
+        return end >= self.hi or not self.text[end].isalnum()
+
+    def find(self, token, start):
+        cached = self._cache.get(token)
+        if cached is not None and cached[0] <= start and (cached[1] == -1 or cached[1] >= start):
+            return cached[1]
+        pos = self.text.find(token, start, self.hi)
+        while pos != -1 and not self._valid_closer(token, pos):
+            pos = self.text.find(token, pos + 1, self.hi)
+        self._cache[token] = (start, pos)
+        return pos
+
+    def find_on_line(self, token, start):
+        """在当前行内查找，与正则中不跨行的 . 一致"""
+        pos = self.find(token, start)
+        if pos == -1:
+            return -1
+        newline = self.find("\n", start)
+        return pos if newline == -1 or pos < newline else -1
+
+
+class InlineTokenizer:
+    """把一行（或一段）Markdown 行内文本转换为 Notion rich_text 列表"""
+
+    def tokenize(self, text):
+        """
+        Args:
+            text (str): Markdown 行内文本
+
+        Returns:
+            list: rich_text 列表
+        """
+        items = []
+        self._tokenize(text, 0, len(text), DEFAULT_STYLE, frozenset(), items)
+        return items
+
+    def _tokenize(self, text, lo, hi, style, active, items):
+        """
+        分词 text[lo:hi]，active 为外层已经打开的样式/链接，内部不再重复识别
+        """
+        scanner = _Scanner(text, hi)
+        runs = []
+        literal_start = i = lo
+
+        def flush(end):
+            if end > literal_start:
+                runs.append((style, text[literal_start:end]))
+
+        def emit_runs():
+            if runs:
+                items.extend(rich_text(_merge(runs)))
+                runs.clear()
+
+        while i < hi:
+            match = SPECIAL.search(text, i, hi)
+            if match is None:
+                break
+            i = match.start()
+            c = text[i]
+
+            if c == "\\":
+                if i + 1 < hi and text[i + 1] in ESCAPABLE:
+                    flush(i)
+                    runs.append((style, text[i + 1]))
+                    i += 2
+                    literal_start = i
+                else:
+                    i += 1
+                continue
+
+            if c == "$":
+                end = scanner.find_on_line("$", i + 1)
+                if end > i + 1:
+                    flush(i)
+                    emit_runs()
+                    items.append({"type": "equation", "equation": {"expression": text[i + 1:end]}})
+                    i = literal_start = end + 1
+                else:
+                    i += 1
+                continue
+
+            if c == "[":
+                if "link" not in active:
+                    middle = scanner.find_on_line("](", i + 1)
+                    end = scanner.find_on_line(")", middle + 2) if middle != -1 else -1
+                    if end != -1:
+                        flush(i)
+                        emit_runs()
+                        link_style = style[:6] + (text[middle + 2:end],)
+                        self._tokenize(text, i + 1, middle, link_style, active | {"link"}, items)
+                        i = literal_start = end + 1
+                        continue
+                i += 1
+                continue
+
+            # 样式分隔符
+            if (c in "*_" and text.startswith(c * 3, i) and i + 3 < hi and text[i + 3] != c
+                    and not {"bold", "italic"} & active and not (c == "_" and i > lo and text[i - 1].isalnum())):
+                end, segments = self._triple(text, i, hi, c, scanner, style, active)
+                if segments:
+                    flush(i)
+                    emit_runs()
+                    for segment in segments:
+                        self._tokenize(text, *segment, items)
+                    literal_start = end
+                i = end
+                continue
+
+            matched = False
+            for token, kind in DELIMITERS[c]:
+                if not text.startswith(token, i) or i + len(token) > hi:
+                    continue
+                if kind in active or (c == "_" and i > lo and text[i - 1].isalnum()):
+                    break
+                end = scanner.find_on_line(token, i + len(token))
+                if end == -1:
+                    continue
+                start = i + len(token)
+                if end > start:
+                    flush(i)
+                    inner_style = _with(style, STYLE_FIELDS[kind])
+                    if kind == "code":
+                        runs.append((inner_style, text[start:end]))
+                    else:
+                        emit_runs()
+                        self._tokenize(text, start, end, inner_style, active | {kind}, items)
+                    i = literal_start = end + len(token)
+                    matched = True
+                break
+            if not matched:
+                # 没有闭合的分隔符按原文保留；连续的同一字符一起跳过，避免被拆成更短的分隔符
+                i += len(DELIMITERS[c][0][0]) if text.startswith(DELIMITERS[c][0][0], i) else 1
+
+        flush(hi)
+        emit_runs()
+
+    @staticmethod
+    def _triple(text, i, hi, c, scanner, style, active):
+        """
+        处理 ***/___ 开头的加粗斜体，按 CommonMark 的规则在第一个闭合处拆分：
+        ***x*** 同时加粗和斜体，***x** y* 为斜体中的加粗，***x* y** 为加粗中的斜体
+
+        Returns:
+            tuple: (结束位置, [(lo, hi, style, active)] 需要分词的片段)，片段为 None 时结束位置之前的字符按原文保留
+        """
+        start = i + 3
+        end = scanner.find_on_line(c, start)
+        if end == -1:
+            return start, None
+        run = 1
+        while run < 3 and end + run < hi and text[end + run] == c:
+            run += 1
+        bold = _with(style, STYLE_FIELDS["bold"])
+        italic = _with(style, STYLE_FIELDS["italic"])
+        both = _with(bold, STYLE_FIELDS["italic"])
+        nested = active | {"bold", "italic"}
+        if run == 3:
+            return end + 3, [(start, end, both, nested)]
+        # 内层先闭合，外层使用剩下的分隔符
+        outer_token, outer_style, outer_kind = (c, italic, "italic") if run == 2 else (c * 2, bold, "bold")
+        outer_end = scanner.find_on_line(outer_token, end + run)
+        if outer_end == -1:
+            # 外层没有闭合：多出的分隔符按原文保留，内层由后续的分词处理
+            return i + (1 if run == 2 else 2), None
+        return outer_end + len(outer_token), [
+            (start, end, both, nested),
+            (end + run, outer_end, outer_style, active | {outer_kind}),
+        ]
+
+
+def _merge(runs):
+    """合并样式相同的相邻文本"""
+    merged = []
+    for style, text in runs:
+        if merged and merged[-1][0] == style:
+            merged[-1] = (style, merged[-1][1] + text)
+        else:
+            merged.append((style, text))
+    return merged
+
+
+_tokenizer = InlineTokenizer()
+
+
+def tokenize_inline(text):
+    """把 Markdown 行内文本转换为 Notion rich_text 列表"""
+    return _tokenizer.tokenize(text)
@@ -1,11 +1,31 @@
-import re, os
+import re, os, json
 from dotenv import load_dotenv
 from notion_client import Client
 from notionify.Parser.md2block import read_file, read_file_content
+from notionify.inline_tokenizer import tokenize_inline
 from config import get_logger
 
 logger = get_logger(__name__)
 
+# Notion API limits, see https://developers.notion.com/reference/request-limits
+MAX_CHILDREN_PER_REQUEST = 100
+MAX_BLOCKS_PER_REQUEST = 1000
+MAX_NESTING_DEPTH = 3
+MAX_PAYLOAD_BYTES = 500 * 1000
+MAX_RICH_TEXT_LENGTH = 2000
+MAX_RICH_TEXT_ITEMS = 100
+
+# Version of the Markdown rendering, bump it when renderContent's output changes so cached renders are dropped
+RENDER_VERSION = 3
+
+# Precompiled patterns used by split_text/blockparser/parse_annotations
+HTML_IMAGE_PATTERN = re.compile(r'<img\s+src="(.*?)"\s+alt="(.*?)"\s+.*?/>')
+BLOCK_EQUATION_PATTERN = re.compile(r'(\$\$.*?\$\$)', flags=re.S)
+IMAGE_SPLIT_PATTERN = re.compile(r'(!\[.*?\]\(.*?\))')
+IMAGE_PATTERN = re.compile(r'!\[(.*?)\]\((.*?)\)')
+BOLD_MARKER_PATTERN = re.compile(r'\*\*|__')
+ITALIC_MARKER_PATTERN = re.compile(r'\*|_')
+
 class Md2NotionUploader:
     image_host_object = None
     local_root = "markdown_notebook"
@@ -38,9 +58,9 @@ class Md2NotionUploader:
 
     @staticmethod
     def split_text(text):
-        text = re.sub(r'<img\s+src="(.*?)"\s+alt="(.*?)"\s+.*?/>', r'![\2](\1)', text)
+        text = HTML_IMAGE_PATTERN.sub(r'![\2](\1)', text)
         out = []
-        double_dollar_parts = re.split(r'(\$\$.*?\$\$)', text, flags=re.S)
+        double_dollar_parts = BLOCK_EQUATION_PATTERN.split(text)
 
         for part in double_dollar_parts:
             if part.startswith('$$') and part.endswith('$$'):
@@ -48,7 +68,7 @@ class Md2NotionUploader:
                 part = part.replace('\\\n', '\\\\\n')
                 out.append(part)
             else:
-                image_parts = re.split(r'(!\[.*?\]\(.*?\))', part)
+                image_parts = IMAGE_SPLIT_PATTERN.split(part)
                 out.extend(image_parts)
         out = [t for t in out if t.strip() != '']
         return out
@@ -65,7 +85,7 @@ class Md2NotionUploader:
                     }
                 })
             elif part.startswith('![') and '](' in part:
-                caption, url = re.match(r'!\[(.*?)\]\((.*?)\)', part).groups()
+                caption, url = IMAGE_PATTERN.match(part).groups()
                 url = self.convert_to_oneline_url(url)
                 result.append({
                     "image": {
@@ -106,12 +126,12 @@ class Md2NotionUploader:
         # Add bold
         if '**' in text or '__' in text:
             annotations['bold'] = True
-            text = re.sub(r'\*\*|__', '', text)
+            text = BOLD_MARKER_PATTERN.sub('', text)
 
         # Add italic
         if '*' in text or '_' in text:
             annotations['italic'] = True
-            text = re.sub(r'\*|_', '', text)
+            text = ITALIC_MARKER_PATTERN.sub('', text)
 
         # Add strikethrough
         if '~~' in text:
@@ -172,71 +192,13 @@ class Md2NotionUploader:
         return smms.url
 
     def sentence_parser(self, s):
-        # if not self.is_balanced(s):
-        #     raise ValueError("Unbalanced math delimiters in the input string.")
-
-        # Split string by inline math and markdown links
-        parts = re.split(r'(\$.*?\$|\[.*?\]\(.*?\))', s)
-        result = []
-
-        for part in parts:
-            if part.startswith('$'):
-                expression = part.strip('$')
-                result.append({
-                    "type": "equation",
-                    "equation": {
-                        "expression": expression
-                    }
-                })
-            elif part.startswith('[') and '](' in part:
-                # Process style delimiters before processing link
-                style_parts = re.split(r'(\*\*.*?\*\*|__.*?__|\*.*?\*|_.*?_|~~.*?~~|`.*?`)', part)
-                for style_part in style_parts:
-                    annotations, clean_text = self.parse_annotations(style_part)
-                    if clean_text.startswith('[') and '](' in clean_text:
-                        link_text, url = re.match(r'\[(.*?)\]\((.*?)\)', clean_text).groups()
-
-                        result.append({
-                            "type": "text",
-                            "text": {
-                                "content": link_text,
-                                "link": {
-                                    "url": url
-                                }
-                            },
-                            "annotations": annotations,
-                            "plain_text": link_text,
-                            "href": url
-                        })
-                    elif clean_text:
-                        result.append({
-                            "type": "text",
-                            "text": {
-                                "content": clean_text,
-                                "link": None
-                            },
-                            "annotations": annotations,
-                            "plain_text": clean_text,
-                            "href": None
-                        })
-            else:
-                # Split text by style delimiters
-                style_parts = re.split(r'(\*\*.*?\*\*|__.*?__|\*.*?\*|_.*?_|~~.*?~~|`.*?`)', part)
-                for style_part in style_parts:
-                    annotations, clean_text = self.parse_annotations(style_part)
-                    if clean_text:
-                        result.append({
-                            "type": "text",
-                            "text": {
-                                "content": clean_text,
-                                "link": None
-                            },
-                            "annotations": annotations,
-                            "plain_text": clean_text,
-                            "href": None
-                        })
-
-        return result
+        """
+        Converts inline markdown (bold, italic, strikethrough, code, links, inline equations)
+        into Notion rich_text in a single linear-time pass
+        @param {str} s The inline markdown text
+        @returns {dict[]} The rich_text items
+        """
+        return tokenize_inline(s)
 
     def convert_to_raw_cell(self, line):
         children = {"table_row": {"cells": []}}
@@ -277,16 +239,12 @@ class Md2NotionUploader:
                            }
                  }]
 
-    def uploadBlock(self, blockDescriptor, notion, page_id, mdFilePath=None, imagePathFunc=None):
+    def renderBlock(self, blockDescriptor):
         """
-        Uploads a single blockDescriptor for NotionPyRenderer as the child of another block
-        and does any post processing for Markdown importing
+        Converts a single blockDescriptor from NotionPyRenderer into Notion API block dicts,
+        with nested blocks inlined under the "children" key of the last block
         @param {dict} blockDescriptor A block descriptor, output from NotionPyRenderer
-        @param {NotionBlock} blockParent The parent to add it as a child of
-        @param {string} mdFilePath The path to the markdown file to find images with
-        @param {callable|None) [imagePathFunc=None] See upload()
-
-        @todo Make mdFilePath optional and don't do searching if not provided
+        @returns {dict[]} The rendered blocks, empty if there is nothing to upload
         """
         new_name_map = {
             'text': 'paragraph',
@@ -296,7 +254,6 @@ class Md2NotionUploader:
             'sub_sub_header': 'heading_3',
             'numbered_list': 'numbered_list_item'
         }
-        blockClass = blockDescriptor["type"]
 
         old_name = blockDescriptor['type']._type
         new_name = new_name_map[old_name] if old_name in new_name_map else old_name
@@ -315,30 +272,340 @@ class Md2NotionUploader:
             content = blockDescriptor['title_plaintext']
             content_block = self.blockparser(content, new_name)
             if not content_block:
-                return
+                return []
             content_block[0]['code']['language'] = language.lower()
         else:
             content_block = [{new_name: {}}]
-        response = notion.blocks.children.append(block_id=page_id, children=content_block)
 
-        blockChildren = None
-        if "children" in blockDescriptor:
-            blockChildren = blockDescriptor["children"]
-        if blockChildren:
-            child_id = response['results'][-1]['id']
+        blockChildren = blockDescriptor.get("children")
+        if blockChildren and content_block:
+            children = []
             for childBlock in blockChildren:
-                ### firstly create one than
-                self.uploadBlock(childBlock, notion, child_id, mdFilePath, imagePathFunc)
+                children.extend(self.renderBlock(childBlock))
+            if children:
+                last_block = content_block[-1]
+                last_block[next(iter(last_block))]['children'] = children
+        return content_block
+
+    def renderContent(self, content):
+        """
+        Renders markdown content into a list of Notion API block dicts
+        @param {str} content The markdown content
+        @returns {dict[]}
+        """
+        blocks = []
+        for blockDescriptor in read_file_content(content):
+            blocks.extend(self.renderBlock(blockDescriptor))
+        return self.splitLongBlocks(blocks)
+
+    @staticmethod
+    def _splitRichTextItem(item):
+        """Splits a text item longer than MAX_RICH_TEXT_LENGTH into consecutive items with the same style"""
+        if item.get('type') != 'text':
+            return [item]
+        content = item['text']['content']
+        if len(content) <= MAX_RICH_TEXT_LENGTH:
+            return [item]
+        items = []
+        for start in range(0, len(content), MAX_RICH_TEXT_LENGTH):
+            chunk = content[start:start + MAX_RICH_TEXT_LENGTH]
+            items.append(dict(item, text=dict(item['text'], content=chunk), plain_text=chunk))
+        return items
+
+    def splitLongBlocks(self, blocks):
+        """
+        Makes rendered blocks fit the rich_text limits: runs over MAX_RICH_TEXT_LENGTH characters are cut
+        into runs with the same style, and a block with more than MAX_RICH_TEXT_ITEMS runs is split at run
+        boundaries into consecutive blocks of the same type, the nested children staying with the last one
+        @param {dict[]} blocks Rendered blocks, see renderBlock()
+        @returns {dict[]} The blocks, the same list when nothing had to be split
+        """
+        result = []
+        changed = False
+        for block in blocks:
+            block_type = next(iter(block))
+            body = block[block_type]
+            children = body.get('children')
+            new_children = self.splitLongBlocks(children) if children else children
+            rich_text = body.get('rich_text')
+            items = rich_text
+            if rich_text:
+                split = [part for item in rich_text for part in self._splitRichTextItem(item)]
+                if len(split) != len(rich_text):
+                    items = split
+            if items is rich_text and new_children is children and len(items or ()) <= MAX_RICH_TEXT_ITEMS:
+                result.append(block)
+                continue
+            changed = True
+            if not items or len(items) <= MAX_RICH_TEXT_ITEMS:
+                new_body = dict(body)
+                if items is not None:
+                    new_body['rich_text'] = items
+                if children:
+                    new_body['children'] = new_children
+                result.append({block_type: new_body})
+                continue
+            for start in range(0, len(items), MAX_RICH_TEXT_ITEMS):
+                new_body = {key: value for key, value in body.items() if key != 'children'}
+                new_body['rich_text'] = items[start:start + MAX_RICH_TEXT_ITEMS]
+                result.append({block_type: new_body})
+            if children:
+                result[-1][block_type]['children'] = new_children
+        return result if changed else blocks
+
+    @staticmethod
+    def _countBlocks(block):
+        block_type = next(iter(block))
+        return 1 + sum(Md2NotionUploader._countBlocks(child) for child in block[block_type].get('children') or [])
+
+    def _prepareBlock(self, block, depth, path, deferred):
+        """
+        Copies a rendered block for an append request, keeping nested children up to MAX_NESTING_DEPTH
+        levels and at most MAX_CHILDREN_PER_REQUEST children per block
+        @param {list} deferred Collects (path, children) for children that have to be appended afterwards
+        """
+        block_type = next(iter(block))
+        body = block[block_type]
+        children = body.get('children')
+        if not children:
+            return block
+        body = {key: value for key, value in body.items() if key != 'children'}
+        # a table must be created together with its rows, so a table child needs one more level
+        limit = MAX_NESTING_DEPTH - 1 if any(next(iter(child)) == 'table' for child in children) else MAX_NESTING_DEPTH
+        if depth >= limit:
+            deferred.append((path, children))
+            return {block_type: body}
+        body['children'] = [
+            self._prepareBlock(child, depth + 1, path + (index,), deferred)
+            for index, child in enumerate(children[:MAX_CHILDREN_PER_REQUEST])
+        ]
+        if len(children) > MAX_CHILDREN_PER_REQUEST:
+            deferred.append((path, children[MAX_CHILDREN_PER_REQUEST:]))
+        return {block_type: body}
+
+    def _batchBlocks(self, blocks):
+        """
+        Packs consecutive top-level blocks into as few append requests as the API limits allow,
+        counting both the nested blocks and the JSON payload size of each request
+        """
+        batch = []
+        batch_size = 0
+        batch_bytes = 0
+        for block in blocks:
+            size = self._countBlocks(block)
+            payload = len(json.dumps(block, ensure_ascii=False).encode('utf-8'))
+            if batch and (len(batch) >= MAX_CHILDREN_PER_REQUEST or batch_size + size > MAX_BLOCKS_PER_REQUEST
+                          or batch_bytes + payload > MAX_PAYLOAD_BYTES):
+                yield batch
+                batch = []
+                batch_size = 0
+                batch_bytes = 0
+            batch.append(block)
+            batch_size += size
+            batch_bytes += payload
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _listChildIds(notion, block_id):
+        child_ids = []
+        start_cursor = None
+        while True:
+            kwargs = {"block_id": block_id, "page_size": 100}
+            if start_cursor:
+                kwargs["start_cursor"] = start_cursor
+            response = notion.blocks.children.list(**kwargs)
+            child_ids.extend(result['id'] for result in response['results'])
+            if not response.get('has_more'):
+                return child_ids
+            start_cursor = response.get('next_cursor')
+
+    def uploadBlocks(self, notion, page_id, blocks, after=None):
+        """
+        Appends rendered blocks as children of page_id in as few requests as possible. Consecutive blocks
+        are packed into one request together with their nested children, follow-up appends are only
+        issued for nesting deeper than the API allows in a single request
+        @param {dict[]} blocks Rendered blocks, see renderBlock()
+        @param {string|None} [after=None] Insert after this child block instead of at the end
+        @returns {string[]} The ids of the appended top-level blocks
+        """
+        block_ids = []
+        for batch in self._batchBlocks(blocks):
+            deferred = []
+            children = [self._prepareBlock(block, 1, (index,), deferred) for index, block in enumerate(batch)]
+            if after:
+                response = notion.blocks.children.append(block_id=page_id, children=children, after=after)
+            else:
+                response = notion.blocks.children.append(block_id=page_id, children=children)
+            batch_ids = [result['id'] for result in response['results'][:len(children)]]
+            block_ids.extend(batch_ids)
+            if after:
+                # the next batch goes right after this one
+                after = batch_ids[-1]
+
+            self._uploadDeferred(notion, batch_ids, deferred)
+        return block_ids
+
+    def _uploadDeferred(self, notion, batch_ids, deferred):
+        """Appends the children left out by _prepareBlock, locating their parents by path"""
+        child_ids = {}
+        for path, nested_children in deferred:
+            block_id = batch_ids[path[0]]
+            for index in path[1:]:
+                if block_id not in child_ids:
+                    child_ids[block_id] = self._listChildIds(notion, block_id)
+                block_id = child_ids[block_id][index]
+            self.uploadBlocks(notion, block_id, nested_children)
+
+    def createPage(self, notion, blocks, **kwargs):
+        """
+        Creates a page with its rendered blocks in the same request, so a typical page costs one call.
+        Blocks beyond what a single request allows are appended afterwards
+        @param {dict[]} blocks Rendered blocks, see renderBlock()
+        @param kwargs Passed to pages.create (parent, properties, icon, cover...)
+        @returns {dict} The created page
+        """
+        batches = self._batchBlocks(blocks)
+        first_batch = next(batches, [])
+        deferred = []
+        children = [self._prepareBlock(block, 1, (index,), deferred) for index, block in enumerate(first_batch)]
+        if children:
+            page = notion.pages.create(children=children, **kwargs)
+        else:
+            page = notion.pages.create(**kwargs)
+        if deferred:
+            # pages.create does not return the ids of the created children
+            batch_ids = self._listChildIds(notion, page['id'])[:len(children)]
+            self._uploadDeferred(notion, batch_ids, deferred)
+        rest = [block for batch in batches for block in batch]
+        if rest:
+            self.uploadBlocks(notion, page['id'], rest)
+        return page
+
+    def countBlocks(self, blocks):
+        """
+        Counts rendered blocks including all nested children
+        @param {dict[]} blocks Rendered blocks, see renderBlock()
+        @returns {int}
+        """
+        return sum(self._countBlocks(block) for block in blocks)
+
+    def estimateRequests(self, blocks, create=False):
+        """
+        Estimates how many requests uploadBlocks() or createPage() need for the rendered blocks,
+        including the listing and appends for children nested deeper than a single request allows.
+        Listings are counted once per block within a batch, as _uploadDeferred() caches them
+        @param {dict[]} blocks Rendered blocks, see renderBlock()
+        @param {bool} [create=False] Estimate for createPage() instead of uploadBlocks()
+        @returns {int}
+        """
+        requests = 0
+        for batch_index, batch in enumerate(self._batchBlocks(blocks)):
+            deferred = []
+            for index, block in enumerate(batch):
+                self._prepareBlock(block, 1, (index,), deferred)
+            requests += 1
+            if create and batch_index == 0 and deferred:
+                # pages.create does not return the ids of the created children
+                requests += 1
+            listed = set()
+            for path, nested_children in deferred:
+                # the parent is located through the listings of the blocks above it, then the appends themselves
+                listed.update(path[:depth] for depth in range(1, len(path)))
+                requests += self.estimateRequests(nested_children)
+            requests += len(listed)
+        return requests
+
+    @staticmethod
+    async def _listChildIdsAsync(notion, block_id):
+        child_ids = []
+        start_cursor = None
+        while True:
+            kwargs = {"block_id": block_id, "page_size": 100}
+            if start_cursor:
+                kwargs["start_cursor"] = start_cursor
+            response = await notion.blocks.children.list(**kwargs)
+            child_ids.extend(result['id'] for result in response['results'])
+            if not response.get('has_more'):
+                return child_ids
+            start_cursor = response.get('next_cursor')
+
+    async def uploadBlocksAsync(self, notion, page_id, blocks, after=None):
+        """
+        Same as uploadBlocks() for a notion_client.AsyncClient
+        @returns {string[]} The ids of the appended top-level blocks
+        """
+        block_ids = []
+        for batch in self._batchBlocks(blocks):
+            deferred = []
+            children = [self._prepareBlock(block, 1, (index,), deferred) for index, block in enumerate(batch)]
+            if after:
+                response = await notion.blocks.children.append(block_id=page_id, children=children, after=after)
+            else:
+                response = await notion.blocks.children.append(block_id=page_id, children=children)
+            batch_ids = [result['id'] for result in response['results'][:len(children)]]
+            block_ids.extend(batch_ids)
+            if after:
+                after = batch_ids[-1]
+
+            await self._uploadDeferredAsync(notion, batch_ids, deferred)
+        return block_ids
+
+    async def _uploadDeferredAsync(self, notion, batch_ids, deferred):
+        child_ids = {}
+        for path, nested_children in deferred:
+            block_id = batch_ids[path[0]]
+            for index in path[1:]:
+                if block_id not in child_ids:
+                    child_ids[block_id] = await self._listChildIdsAsync(notion, block_id)
+                block_id = child_ids[block_id][index]
+            await self.uploadBlocksAsync(notion, block_id, nested_children)
+
+    async def createPageAsync(self, notion, blocks, **kwargs):
+        """
+        Same as createPage() for a notion_client.AsyncClient
+        @returns {dict} The created page
+        """
+        batches = self._batchBlocks(blocks)
+        first_batch = next(batches, [])
+        deferred = []
+        children = [self._prepareBlock(block, 1, (index,), deferred) for index, block in enumerate(first_batch)]
+        if children:
+            page = await notion.pages.create(children=children, **kwargs)
+        else:
+            page = await notion.pages.create(**kwargs)
+        if deferred:
+            batch_ids = (await self._listChildIdsAsync(notion, page['id']))[:len(children)]
+            await self._uploadDeferredAsync(notion, batch_ids, deferred)
+        rest = [block for batch in batches for block in batch]
+        if rest:
+            await self.uploadBlocksAsync(notion, page['id'], rest)
+        return page
+
+    def uploadBlock(self, blockDescriptor, notion, page_id, mdFilePath=None, imagePathFunc=None):
+        """
+        Uploads a single blockDescriptor for NotionPyRenderer as the child of another block
+        and does any post processing for Markdown importing
+        @param {dict} blockDescriptor A block descriptor, output from NotionPyRenderer
+        @param {NotionBlock} blockParent The parent to add it as a child of
+        @param {string} mdFilePath The path to the markdown file to find images with
+        @param {callable|None) [imagePathFunc=None] See upload()
+
+        @todo Make mdFilePath optional and don't do searching if not provided
+        """
+        self.uploadBlocks(notion, page_id, self.renderBlock(blockDescriptor))
 
     def uploadSingleFile(self, notion, filepath, page_id="",start_line = 0):
         if os.path.exists(filepath):
             # get the notionify style block information
             notion_blocks = read_file(filepath)
-            for i,content in enumerate(notion_blocks):
-                if i < start_line:continue
-                logger.info(f"uploading line {i},............\n", end = '')
-                self.uploadBlock(content, notion, page_id)
-                logger.info('done!')
+            blocks = []
+            for blockDescriptor in notion_blocks[start_line:]:
+                blocks.extend(self.renderBlock(blockDescriptor))
+            blocks = self.splitLongBlocks(blocks)
+            logger.info(f"uploading {len(blocks)} blocks,............")
+            self.uploadBlocks(notion, page_id, blocks)
+            logger.info('done!')
         else:
             logger.info(f"file {filepath} not found")
 
@@ -346,12 +613,13 @@ class Md2NotionUploader:
         if content is not None:
             # get the notionify style block information
             notion_blocks = read_file_content(content)
-            for i,content in enumerate(notion_blocks):
-                if i < start_line:continue
-                logger.info(f"uploading line {i},.............")
-                # q:'uploader' is not defined in the function?  a: uploader is the instance of the class
-                self.uploadBlock(content, notion, page_id)
-                logger.info('done!')
+            blocks = []
+            for blockDescriptor in notion_blocks[start_line:]:
+                blocks.extend(self.renderBlock(blockDescriptor))
+            blocks = self.splitLongBlocks(blocks)
+            logger.info(f"uploading {len(blocks)} blocks,.............")
+            self.uploadBlocks(notion, page_id, blocks)
+            logger.info('done!')
         else:
             logger.info(f"content is None")
 
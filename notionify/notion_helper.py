@@ -2,9 +2,9 @@ import logging
 import os
 
 from dotenv import load_dotenv
-from notion_client import Client
-from retrying import retry
+from notion_client import AsyncClient, Client
 
+from notionify.notion_http import create_async_http_client, create_http_client
 from notionify.notion_utils import extract_page_id
 
 load_dotenv()
@@ -15,11 +15,13 @@ class NotionHelper:
     heatmap_block_id = None
 
     def __init__(self):
-        self.client = Client(auth=os.getenv("NOTION_TOKEN"), log_level=logging.ERROR)
+        # 所有请求经过统一的限流与重试（见 notion_http）
+        self.client = Client(
+            auth=os.getenv("NOTION_TOKEN"), log_level=logging.ERROR, client=create_http_client()
+        )
         self.page_id = extract_page_id(os.getenv("NOTION_PAGE"))
         self.__cache = {}
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def clear_page_content(self, page_id):
         # 获取页面的块内容
         result = self.client.blocks.children.list(page_id)
@@ -33,62 +35,120 @@ class NotionHelper:
             # 删除每个块
             self.client.blocks.delete(block_id)
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def update_book_page(self, page_id, properties):
         return self.client.pages.update(page_id=page_id, properties=properties)
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def update_page(self, page_id, properties, cover):
         return self.client.pages.update(
             page_id=page_id, properties=properties, cover=cover
         )
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def create_page(self, parent, properties, icon):
         return self.client.pages.create(parent=parent, properties=properties, icon=icon)
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def create_book_page(self, parent, properties, icon):
         return self.client.pages.create(
             parent=parent, properties=properties, icon=icon, cover=icon
         )
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def query(self, **kwargs):
         kwargs = {k: v for k, v in kwargs.items() if v}
         return self.client.databases.query(**kwargs)
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def get_block_children(self, id):
         response = self.client.blocks.children.list(id)
         return response.get("results")
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
+    def get_all_block_children(self, block_id):
+        """获取块的所有子块（自动翻页）"""
+        results = []
+        has_more = True
+        start_cursor = None
+        while has_more:
+            kwargs = {"block_id": block_id, "page_size": 100}
+            if start_cursor:
+                kwargs["start_cursor"] = start_cursor
+            response = self.client.blocks.children.list(**kwargs)
+            start_cursor = response.get("next_cursor")
+            has_more = response.get("has_more")
+            results.extend(response.get("results"))
+        return results
+
+    def update_block(self, block_id, block_type, body):
+        return self.client.blocks.update(block_id=block_id, **{block_type: body})
+
     def append_blocks(self, block_id, children):
         return self.client.blocks.children.append(block_id=block_id, children=children)
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def append_blocks_after(self, block_id, children, after):
         return self.client.blocks.children.append(
             block_id=block_id, children=children, after=after
         )
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
     def delete_block(self, block_id):
         return self.client.blocks.delete(block_id=block_id)
 
-    @retry(stop_max_attempt_number=3, wait_fixed=5000)
-    def query_all(self, database_id):
-        """获取database中所有的数据"""
+    def query_all(self, database_id, filter=None):
+        """获取database中所有的数据，可选按 filter 过滤"""
+        results = []
+        has_more = True
+        start_cursor = None
+        while has_more:
+            kwargs = {"database_id": database_id, "start_cursor": start_cursor, "page_size": 100}
+            if filter:
+                kwargs["filter"] = filter
+            response = self.client.databases.query(**kwargs)
+            start_cursor = response.get("next_cursor")
+            has_more = response.get("has_more")
+            results.extend(response.get("results"))
+        return results
+
+
+class AsyncNotionHelper:
+    """NotionHelper 的异步版本，只包含同步引擎用到的操作"""
+
+    def __init__(self):
+        # SDK 请求和文件上传共用一个 httpx 客户端，经过统一的限流与重试
+        self.http_client = create_async_http_client()
+        self.client = AsyncClient(
+            auth=os.getenv("NOTION_TOKEN"), log_level=logging.ERROR, client=self.http_client
+        )
+        self.page_id = extract_page_id(os.getenv("NOTION_PAGE"))
+
+    async def aclose(self):
+        await self.http_client.aclose()
+
+    async def get_all_block_children(self, block_id):
+        """获取块的所有子块（自动翻页）"""
+        results = []
+        has_more = True
+        start_cursor = None
+        while has_more:
+            kwargs = {"block_id": block_id, "page_size": 100}
+            if start_cursor:
+                kwargs["start_cursor"] = start_cursor
+            response = await self.client.blocks.children.list(**kwargs)
+            start_cursor = response.get("next_cursor")
+            has_more = response.get("has_more")
+            results.extend(response.get("results"))
+        return results
+
+    async def update_block(self, block_id, block_type, body):
+        return await self.client.blocks.update(block_id=block_id, **{block_type: body})
+
+    async def delete_block(self, block_id):
+        return await self.client.blocks.delete(block_id=block_id)
+
+    async def query_all(self, database_id, filter=None):
+        """获取database中所有的数据，可选按 filter 过滤"""
         results = []
         has_more = True
         start_cursor = None
         while has_more:
-            response = self.client.databases.query(
-                database_id=database_id,
-                start_cursor=start_cursor,
-                page_size=100,
-            )
+            kwargs = {"database_id": database_id, "start_cursor": start_cursor, "page_size": 100}
+            if filter:
+                kwargs["filter"] = filter
+            response = await self.client.databases.query(**kwargs)
             start_cursor = response.get("next_cursor")
             has_more = response.get("has_more")
             results.extend(response.get("results"))
@@ -0,0 +1,207 @@
+"""
+Notion 请求的统一限流与重试
+
+SDK 客户端、文件上传和块操作的所有请求共享一个进程内的令牌桶；
+429 按 Retry-After 等待并暂停所有线程，5xx 指数退避并加随机抖动，其余错误直接返回给调用方。
+"""
+import asyncio
+import os
+import random
+import time
+
+import httpx
+import requests
+
+from config import (
+    get_logger, NOTION_VERSION, NOTION_RATE_LIMIT, NOTION_RATE_BURST,
+    NOTION_MAX_RETRIES, NOTION_RETRY_BASE_DELAY, NOTION_RETRY_MAX_DELAY,
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+)
+from http_client import get_session
+from rate_limiter import RateLimiter
+
+logger = get_logger(__name__)
+
+NOTION_API_URL = "https://api.notion.com/v1"
+
+# 进程内所有 Notion 请求共享的限流器
+rate_limiter = RateLimiter(NOTION_RATE_LIMIT, NOTION_RATE_BURST)
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（秒数），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt):
+    """第 attempt 次重试的指数退避时间，带全抖动"""
+    delay = min(NOTION_RETRY_MAX_DELAY, NOTION_RETRY_BASE_DELAY * (2 ** attempt))
+    return random.uniform(delay / 2, delay)
+
+
+def retry_delay(response, attempt):
+    """
+    判断响应是否需要重试
+
+    Returns:
+        float: 需要等待的秒数，不需要重试时返回 None
+    """
+    if attempt >= NOTION_MAX_RETRIES:
+        return None
+    if response.status_code == 429:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        delay = retry_after if retry_after is not None else backoff_delay(attempt)
+        # 被限流时让所有线程一起等待，而不是各自继续撞限流
+        rate_limiter.pause(delay)
+        return delay
+    if response.status_code >= 500:
+        return backoff_delay(attempt)
+    return None
+
+
+def send_with_retry(send, connect_errors=()):
+    """
+    限流后发送请求，并按统一的策略重试
+
+    Args:
+        send (callable): 发送一次请求并返回响应
+        connect_errors (tuple): 请求尚未发出时的连接异常，可以安全重试
+
+    Returns:
+        响应对象（最后一次尝试的结果）
+    """
+    attempt = 0
+    while True:
+        rate_limiter.acquire()
+        try:
+            response = send()
+        except connect_errors as e:
+            if attempt >= NOTION_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"⚠️ Notion 连接失败，{delay:.1f} 秒后重试: {str(e)}")
+        else:
+            delay = retry_delay(response, attempt)
+            if delay is None:
+                return response
+            logger.warning(f"⚠️ Notion 返回 {response.status_code}，{delay:.1f} 秒后重试")
+            response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+class RateLimitedTransport(httpx.HTTPTransport):
+    """供 notion_client 使用的 httpx 传输层，所有 SDK 请求都经过统一的限流与重试"""
+
+    def handle_request(self, request):
+        return send_with_retry(
+            lambda: super(RateLimitedTransport, self).handle_request(request),
+            connect_errors=(httpx.ConnectError, httpx.ConnectTimeout),
+        )
+
+
+def create_http_client():
+    """创建 notion_client.Client 使用的 httpx 客户端"""
+    return httpx.Client(
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        transport=RateLimitedTransport(),
+    )
+
+
+async def send_with_retry_async(send, connect_errors=()):
+    """send_with_retry 的协程版本，限流与退避等待都不阻塞事件循环"""
+    attempt = 0
+    while True:
+        await rate_limiter.acquire_async()
+        try:
+            response = await send()
+        except connect_errors as e:
+            if attempt >= NOTION_MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"⚠️ Notion 连接失败，{delay:.1f} 秒后重试: {str(e)}")
+        else:
+            delay = retry_delay(response, attempt)
+            if delay is None:
+                return response
+            logger.warning(f"⚠️ Notion 返回 {response.status_code}，{delay:.1f} 秒后重试")
+            await response.aclose()
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+class AsyncRateLimitedTransport(httpx.AsyncHTTPTransport):
+    """供 notion_client.AsyncClient 和异步文件上传使用的传输层，与同步请求共享限流器"""
+
+    async def handle_async_request(self, request):
+        return await send_with_retry_async(
+            lambda: super(AsyncRateLimitedTransport, self).handle_async_request(request),
+            connect_errors=(httpx.ConnectError, httpx.ConnectTimeout),
+        )
+
+
+def create_async_http_client():
+    """创建 notion_client.AsyncClient 使用的 httpx 客户端"""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        transport=AsyncRateLimitedTransport(),
+    )
+
+
+def notion_request(method, path, **kwargs):
+    """
+    通过共享 HTTP 会话直接调用 Notion 接口（如文件上传），与 SDK 请求共享限流与重试
+
+    Args:
+        method (str): HTTP 方法
+        path (str): 接口路径，如 "/file_uploads"
+        **kwargs: 传给 requests 的其他参数
+
+    Returns:
+        requests.Response: 响应
+    """
+    headers = {
+        "Authorization": f"Bearer {os.getenv('NOTION_TOKEN')}",
+        "Notion-Version": NOTION_VERSION,
+    }
+    headers.update(kwargs.pop("headers", {}))
+    url = f"{NOTION_API_URL}{path}"
+
+    def send():
+        # 重试时请求体需要从头发送
+        data = kwargs.get("data")
+        if hasattr(data, "seek"):
+            data.seek(0)
+        for value in (kwargs.get("files") or {}).values():
+            if isinstance(value, tuple) and hasattr(value[1], "seek"):
+                value[1].seek(0)
+        return get_session().request(method, url, headers=headers, **kwargs)
+
+    # ConnectionError 包括连接超时、连接被拒绝和 DNS 解析失败，与 httpx 的 ConnectError 对应
+    return send_with_retry(send, connect_errors=(requests.exceptions.ConnectionError,))
+
+
+async def notion_request_async(http_client, method, path, **kwargs):
+    """
+    notion_request 的协程版本
+
+    Args:
+        http_client (httpx.AsyncClient): create_async_http_client() 创建的客户端，限流与重试由传输层完成
+        method (str): HTTP 方法
+        path (str): 接口路径，如 "/file_uploads"
+        **kwargs: 传给 httpx 的其他参数
+
+    Returns:
+        httpx.Response: 响应
+    """
+    headers = {
+        "Authorization": f"Bearer {os.getenv('NOTION_TOKEN')}",
+        "Notion-Version": NOTION_VERSION,
+    }
+    headers.update(kwargs.pop("headers", {}))
+    return await http_client.request(method, f"{NOTION_API_URL}{path}", headers=headers, **kwargs)
@@ -4,8 +4,8 @@ import re
 
 
 import pendulum
-import requests
 
+from http_client import get_session
 from utils import str_to_timestamp
 from config import get_logger
 
@@ -217,7 +217,7 @@ def download_image(url, save_dir="cover"):
         logger.info(f"File {file_name} already exists. Skipping download.")
         return save_path
 
-    response = requests.get(url, stream=True)
+    response = get_session().get(url, stream=True)
     if response.status_code == 200:
         with open(save_path, "wb") as file:
             for chunk in response.iter_content(chunk_size=128):
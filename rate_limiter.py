@@ -0,0 +1,67 @@
+"""
+线程安全的令牌桶限流器
+"""
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    令牌桶限流器，平均每秒最多放行 rate 个请求，允许 capacity 个请求的突发
+
+    rate 小于等于 0 时不限流
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self):
+        """
+        尝试获取一个令牌，不阻塞
+
+        Returns:
+            float: 0 表示已获取，否则为需要等待后再重试的秒数
+        """
+        if self.rate <= 0:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """阻塞直到获取到一个令牌"""
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """在事件循环中等待直到获取到一个令牌，等待期间不阻塞其他协程"""
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """在接下来的 seconds 秒内暂停放行（如服务端返回 429 时），对所有线程生效"""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
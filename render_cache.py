@@ -0,0 +1,168 @@
+"""
+记录内容的转换缓存，内容没有变化时跳过 HTML/Markdown 的解析和块渲染
+
+以转换方式、转换器版本和内容计算 SHA-256 作为键，保存渲染好的 Notion 块列表。内存中按最近使用保留一定条数，
+可选的磁盘缓存每个条目一个文件，总大小超出上限时按最近使用时间淘汰。转换逻辑变化时递增对应模块的版本号，旧条目自然失效。
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from config import get_logger, RENDER_CACHE_DIR, RENDER_CACHE_MAX_ENTRIES, RENDER_CACHE_MAX_BYTES
+
+logger = get_logger(__name__)
+
+
+def render_key(converter, version, source):
+    """
+    计算缓存键
+
+    Args:
+        converter (str): 转换方式，如 html、markdown
+        version (int): 转换器版本
+        source (str): 转换前的内容
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256(f"{converter}:{version}\0".encode("utf-8"))
+    digest.update(source.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """两级转换缓存，读写加锁，可在多个工作线程间共享；条目以 JSON 文本保存，每次读取得到新的对象"""
+
+    def __init__(self, directory=RENDER_CACHE_DIR, max_entries=RENDER_CACHE_MAX_ENTRIES, max_bytes=RENDER_CACHE_MAX_BYTES):
+        """
+        Args:
+            directory (str): 磁盘缓存目录，为空时只使用内存缓存
+            max_entries (int): 内存中保留的最大条目数
+            max_bytes (int): 磁盘缓存的总大小上限（字节）
+        """
+        self.directory = directory if directory and max_bytes > 0 else None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = f.read()
+            # 更新访问时间，淘汰时按最近使用排序
+            os.utime(path)
+            return payload
+        except OSError:
+            return None
+
+    def _write_disk(self, key, payload):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"⚠️ 写入转换缓存失败: {str(e)}")
+
+    def get(self, key):
+        """
+        获取缓存的转换结果
+
+        Returns:
+            缓存的值（新的对象，可以直接修改），没有时返回 None
+        """
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(payload)
+        payload = self._read_disk(key)
+        if payload is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            value = json.loads(payload)
+        except ValueError:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(key, payload)
+        with self._lock:
+            self.disk_hits += 1
+        return value
+
+    def put(self, key, value):
+        """保存转换结果，value 需要可以序列化为 JSON"""
+        payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+        self._remember(key, payload)
+        self._write_disk(key, payload)
+
+    def get_or_render(self, key, render):
+        """
+        命中缓存时直接返回，否则调用 render() 转换并保存结果
+
+        Args:
+            key (str): render_key 计算的缓存键
+            render (callable): 无参数的转换函数
+
+        Returns:
+            转换结果
+        """
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def save(self):
+        """淘汰超出大小上限的磁盘条目（按最近使用时间），并记录命中统计"""
+        logger.debug(f"💾 转换缓存命中 {self.hits}，磁盘命中 {self.disk_hits}，未命中 {self.misses}")
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        logger.debug(f"🗑️ 转换缓存淘汰 {removed} 个条目，剩余 {total} 字节")
@@ -0,0 +1,95 @@
+"""
+只追加的同步日志，记录本次运行中每条记录的处理结果
+
+运行正常结束并保存同步状态后删除日志；如果运行被取消或超时，日志会保留下来，
+下次运行先把其中已提交的结果合并到同步状态，再跳过这些记录。
+"""
+import json
+import os
+import threading
+import time
+
+from config import get_logger, SYNC_JOURNAL_FILE
+
+logger = get_logger(__name__)
+
+
+class SyncJournal:
+    """基于 JSON Lines 文件的同步日志，写入加锁，可在多个工作线程间共享"""
+
+    def __init__(self, path=SYNC_JOURNAL_FILE):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def recover(self):
+        """
+        读取上次未正常结束的运行留下的日志
+
+        Returns:
+            tuple: (slug -> 最后一条处理结果的字典, 最后提交的水位线对应的更新时间，没有时为 None)
+        """
+        entries = {}
+        committed_updated_at = None
+        if not os.path.exists(self.path):
+            return entries, committed_updated_at
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 进程被终止时最后一行可能只写了一半
+                        continue
+                    action = entry.get("action")
+                    if action == "watermark":
+                        committed_updated_at = entry.get("updated_at")
+                    elif action != "run_start" and entry.get("slug"):
+                        entries[entry["slug"]] = entry
+        except OSError as e:
+            logger.error(f"❌ 读取同步日志失败: {str(e)}")
+        return entries, committed_updated_at
+
+    def start(self):
+        """开始新的运行：清空旧日志并写入运行标记"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._file = open(self.path, "w", encoding="utf-8")
+        self._append({"action": "run_start"})
+
+    def _append(self, entry):
+        entry["ts"] = int(time.time())
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            # 每条结果立即写出，进程被终止时也不会丢失
+            self._file.flush()
+
+    def record(self, slug, action, page_id=None, fingerprint=None):
+        """
+        记录一条已提交到 Notion 的结果
+
+        Args:
+            slug (str): flomo 记录的 slug
+            action (str): create / update / archive / seed（只记录指纹，未写入 Notion）
+            page_id (str): Notion 页面ID
+            fingerprint (str): 记录的内容指纹
+        """
+        self._append({"slug": slug, "action": action, "page_id": page_id, "fingerprint": fingerprint})
+
+    def record_watermark(self, updated_at):
+        """记录按拉取顺序连续成功的最后一条记录的更新时间"""
+        self._append({"action": "watermark", "updated_at": updated_at})
+
+    def finish(self):
+        """运行正常结束且同步状态已保存，删除日志"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,156 @@
+"""
+同步状态存储，用于在多次运行之间持久化增量同步所需的信息
+"""
+import json
+import os
+import threading
+import time
+
+from config import get_logger, SYNC_STATE_FILE
+
+logger = get_logger(__name__)
+
+
+class SyncState:
+    """基于本地 JSON 文件的同步状态存储，读写加锁，可在多个工作线程间共享"""
+
+    def __init__(self, path=SYNC_STATE_FILE):
+        self.path = path
+        self.data = self._load()
+        self._lock = threading.RLock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            logger.debug(f"📂 同步状态文件不存在，使用空状态: {self.path}")
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            # 状态文件损坏时退化为全量同步，而不是中断整个运行
+            logger.error(f"❌ 读取同步状态失败，将使用空状态: {str(e)}")
+            return {}
+
+    def save(self):
+        """原子写入状态文件，避免运行中断时留下半截文件"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock, open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        logger.debug(f"💾 同步状态已保存: {self.path}")
+
+    def get_watermark(self):
+        """
+        获取上次成功提交的水位线
+
+        Returns:
+            str: flomo 的 latest_updated_at 参数（秒级时间戳），没有记录时返回 "0"
+        """
+        return str(self.data.get("watermark", "0"))
+
+    def set_watermark(self, watermark):
+        with self._lock:
+            self.data["watermark"] = str(watermark)
+            self.data["watermark_saved_at"] = int(time.time())
+
+    def get_slug_map(self):
+        """
+        获取本地保存的 slug 到 Notion 页面ID 的索引
+
+        Returns:
+            dict: slug -> page_id
+        """
+        with self._lock:
+            return {slug: entry["page_id"] for slug, entry in self.data.get("memos", {}).items() if entry.get("page_id")}
+
+    def get_page_id(self, slug):
+        """获取 slug 对应的 Notion 页面ID，不存在时返回 None"""
+        return self.data.get("memos", {}).get(slug, {}).get("page_id")
+
+    def set_page(self, slug, page_id, last_edited_time=None):
+        with self._lock:
+            entry = self.data.setdefault("memos", {}).setdefault(slug, {})
+            entry["page_id"] = page_id
+            if last_edited_time:
+                entry["last_edited_time"] = last_edited_time
+
+    def get_index_cursor(self):
+        """获取 slug 索引的增量游标（已索引页面中最大的 last_edited_time），没有时返回 None"""
+        return self.data.get("index_cursor")
+
+    def get_index_reconciled_at(self):
+        """获取 slug 索引上次全量核对的时间戳，没有时返回 0"""
+        return self.data.get("index_reconciled_at", 0)
+
+    def update_index(self, pages, full=False):
+        """
+        用 Notion 数据库的查询结果更新 slug 索引
+
+        Args:
+            pages (list): (slug, page_id, last_edited_time) 列表
+            full (bool): 是否为全量结果，全量时移除数据库中已不存在的页面
+        """
+        with self._lock:
+            memos = self.data.setdefault("memos", {})
+            if full:
+                present = {slug for slug, _, _ in pages}
+                for slug in list(memos):
+                    if slug not in present:
+                        memos[slug].pop("page_id", None)
+                        memos[slug].pop("last_edited_time", None)
+                self.data["index_reconciled_at"] = int(time.time())
+            cursor = self.get_index_cursor()
+            for slug, page_id, last_edited_time in pages:
+                self.set_page(slug, page_id, last_edited_time)
+                if last_edited_time and (cursor is None or last_edited_time > cursor):
+                    cursor = last_edited_time
+            if cursor:
+                self.data["index_cursor"] = cursor
+
+    def get_fingerprint(self, slug):
+        """获取记录上次成功写入 Notion 时的内容指纹，没有记录时返回 None"""
+        return self.data.get("memos", {}).get(slug, {}).get("fingerprint")
+
+    def set_fingerprint(self, slug, fingerprint):
+        with self._lock:
+            self.data.setdefault("memos", {}).setdefault(slug, {})["fingerprint"] = fingerprint
+
+    def remove_memo(self, slug):
+        with self._lock:
+            self.data.get("memos", {}).pop(slug, None)
+
+
+class CommitTracker:
+    """
+    跟踪并发处理时可以提交的水位线
+
+    记录按拉取顺序编号，完成顺序可能不同；只有前面的记录都成功后，水位线才推进到该记录的更新时间，
+    遇到第一条失败记录后不再推进
+    """
+
+    def __init__(self):
+        self.committed_updated_at = None
+        self._finished = {}
+        self._next_index = 0
+        self._has_failed = False
+
+    def finish(self, index, ok, updated_at):
+        """
+        记录第 index 条记录处理完成
+
+        Args:
+            index (int): 拉取顺序的序号，从 0 开始
+            ok (bool): 是否处理成功
+            updated_at (str): 记录的更新时间
+        """
+        self._finished[index] = (ok, updated_at)
+        while self._next_index in self._finished:
+            ok, updated_at = self._finished.pop(self._next_index)
+            if not ok:
+                self._has_failed = True
+            elif not self._has_failed:
+                self.committed_updated_at = updated_at
+            self._next_index += 1
@@ -0,0 +1,55 @@
+"""
+测试公共配置：把仓库根目录加入 sys.path，并在导入 config 之前设置所需的环境变量
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault("NOTION_TOKEN", "test-token")
+os.environ.setdefault("NOTION_PAGE", "0123456789abcdef0123456789abcdef")
+os.environ.setdefault("UPDATE_INTERVAL_HOUR", "2")
+# 默认路径的状态、日志和缓存文件写到临时目录，不影响仓库中的 .sync_state
+os.environ["SYNC_STATE_DIR"] = tempfile.mkdtemp(prefix="flomo2notion-test-")
+
+
+@pytest.fixture
+def make_engine(tmp_path, monkeypatch):
+    """
+    创建状态、日志和缓存都保存在 tmp_path 下的 Flomo2Notion，不发送 Telegram 通知；
+    多次调用得到的引擎共享同一份状态文件，用于模拟多次运行
+    """
+    import flomo2notion
+    from fakes import FakeNotion
+    from image_cache import ImageCache
+    from render_cache import RenderCache
+    from sync_journal import SyncJournal
+    from sync_state import SyncState
+
+    monkeypatch.setattr(flomo2notion, "send_telegram_notification", lambda message: None)
+    monkeypatch.setenv("FLOMO_TOKEN", "flomo-token")
+
+    def make(notion=None):
+        """notion 为 None 时使用新的 FakeNotion"""
+        engine = flomo2notion.Flomo2Notion()
+        engine.notion_helper.client = notion or FakeNotion()
+        engine.sync_state = SyncState(path=str(tmp_path / "state.json"))
+        engine.journal = SyncJournal(path=str(tmp_path / "journal.jsonl"))
+        engine.image_cache = ImageCache(path=str(tmp_path / "image_cache.json"))
+        engine.image_processor.image_cache = engine.image_cache
+        engine.render_cache = RenderCache(directory=None)
+        engine.content_processor.render_cache = engine.render_cache
+        return engine
+
+    return make
+
+
+@pytest.fixture
+def engine(make_engine):
+    """写入 FakeNotion 的 Flomo2Notion，见 make_engine"""
+    return make_engine()
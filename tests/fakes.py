@@ -0,0 +1,251 @@
+"""
+测试使用的 Flomo 接口替身，不发出网络请求
+"""
+from datetime import datetime, timedelta, timezone
+
+from flomo.flomo_api import FlomoApi, FlomoApiError
+from utils import beijing_time_to_timestamp
+
+BEIJING = timezone(timedelta(hours=8))
+
+
+def beijing_time(timestamp):
+    """秒级时间戳转换为 flomo 使用的东八区时间字符串"""
+    return datetime.fromtimestamp(timestamp, BEIJING).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def make_memo(slug, timestamp, content="<p>memo</p>", **fields):
+    """构造一条 flomo 记录"""
+    memo = {
+        "slug": slug,
+        "content": content,
+        "created_at": beijing_time(timestamp),
+        "updated_at": beijing_time(timestamp),
+        "deleted_at": None,
+        "tags": [],
+        "pin": 0,
+        "linked_count": 0,
+        "source": "web",
+        "files": [],
+    }
+    memo.update(fields)
+    return memo
+
+
+class FakeFlomoApi(FlomoApi):
+    """
+    按 latest_updated_at 游标分页返回内存中的记录，与 flomo 接口一样返回更新时间大于游标的记录
+
+    Args:
+        memos (list): 按更新时间升序排列的记录
+        page_size (int): 每页的记录数
+        fail_slugs (set): 页中包含这些 slug 时该次请求失败
+    """
+
+    def __init__(self, memos, page_size=50, fail_slugs=()):
+        super().__init__()
+        self.memos = memos
+        self.page_size = page_size
+        self.fail_slugs = set(fail_slugs)
+        self.requests = 0
+
+    def get_memo_list(self, user_authorization, latest_updated_at="0"):
+        self.requests += 1
+        after = int(latest_updated_at) + 1
+        page = [memo for memo in self.memos if beijing_time_to_timestamp(memo["updated_at"]) >= after]
+        page = page[:self.page_size]
+        if any(memo["slug"] in self.fail_slugs for memo in page):
+            raise FlomoApiError("get_memo_list http error: 502 Bad Gateway")
+        return page
+
+
+class FakeNotionError(Exception):
+    """请求超出 Notion API 限制时抛出，对应接口返回的 400 validation_error"""
+
+
+class _Namespace:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+def _block_type(block):
+    block_type = block.get("type")
+    if block_type and block_type in block:
+        return block_type
+    return next(key for key in block if key not in ("object", "type"))
+
+
+class FakeNotion:
+    """
+    内存中的 Notion 客户端，提供同步引擎用到的 pages / databases / blocks 接口（与 notion_client.Client 一致），
+    按 API 的限制拒绝超出的请求：每个 children 最多 100 个，每次请求最多 1000 个块，请求中最多嵌套 3 层
+
+    calls 按顺序记录每次请求的名称，如 "blocks.children.append"
+    """
+
+    MAX_CHILDREN = 100
+    MAX_BLOCKS = 1000
+    MAX_DEPTH = 3
+
+    def __init__(self):
+        self.calls = []
+        self.pages_data = {}
+        self.blocks_data = {}
+        self._ids = 0
+        self.pages = _Namespace(create=self._create_page, update=self._update_page)
+        self.databases = _Namespace(query=self._query)
+        self.blocks = _Namespace(
+            children=_Namespace(append=self._append, list=self._list),
+            update=self._update_block,
+            delete=self._delete_block,
+        )
+
+    def _next_id(self, prefix):
+        self._ids += 1
+        return f"{prefix}{self._ids}"
+
+    def _children_of(self, parent_id):
+        if parent_id in self.pages_data:
+            return self.pages_data[parent_id]["children"]
+        return self.blocks_data[parent_id]["children"]
+
+    def _check(self, children, depth=1):
+        """返回请求中的块数，超出限制时抛出 FakeNotionError"""
+        if len(children) > self.MAX_CHILDREN:
+            raise FakeNotionError(f"body.children.length should be ≤ {self.MAX_CHILDREN}")
+        if depth > self.MAX_DEPTH:
+            raise FakeNotionError(f"children nested deeper than {self.MAX_DEPTH} levels")
+        count = 0
+        for block in children:
+            nested = block[_block_type(block)].get("children") or []
+            count += 1 + (self._check(nested, depth + 1) if nested else 0)
+        return count
+
+    def _create_blocks(self, parent_id, children):
+        if self._check(children) > self.MAX_BLOCKS:
+            raise FakeNotionError(f"more than {self.MAX_BLOCKS} blocks in one request")
+        return [self._create_block(parent_id, block) for block in children]
+
+    def _create_block(self, parent_id, block):
+        block_type = _block_type(block)
+        body = dict(block[block_type])
+        nested = body.pop("children", None) or []
+        block_id = self._next_id("block-")
+        self.blocks_data[block_id] = {"id": block_id, "type": block_type, "body": body, "children": [], "parent": parent_id}
+        self._children_of(parent_id).append(block_id)
+        for child in nested:
+            self._create_block(block_id, child)
+        return block_id
+
+    def _create_page(self, parent=None, properties=None, children=None, **kwargs):
+        self.calls.append("pages.create")
+        page_id = self._next_id("page-")
+        self.pages_data[page_id] = {"id": page_id, "properties": dict(properties or {}), "children": [], "archived": False}
+        if children:
+            try:
+                self._create_blocks(page_id, children)
+            except FakeNotionError:
+                del self.pages_data[page_id]
+                raise
+        return {"id": page_id}
+
+    def _update_page(self, page_id=None, properties=None, archived=None, **kwargs):
+        self.calls.append("pages.update")
+        page = self.pages_data[page_id]
+        if properties:
+            page["properties"].update(properties)
+        if archived is not None:
+            page["archived"] = archived
+        return {"id": page_id}
+
+    def _query(self, database_id=None, filter=None, start_cursor=None, page_size=100, **kwargs):
+        self.calls.append("databases.query")
+        results = []
+        for page in self.pages_data.values():
+            slug = page["properties"].get("slug")
+            if page["archived"] or not slug:
+                continue
+            text = slug["rich_text"][0]["text"]["content"]
+            results.append({
+                "id": page["id"],
+                "last_edited_time": "2024-01-01T00:00:00.000Z",
+                "properties": {"slug": {"rich_text": [{"plain_text": text}]}},
+            })
+        return {"results": results, "has_more": False, "next_cursor": None}
+
+    def _append(self, block_id=None, children=None, after=None, **kwargs):
+        self.calls.append("blocks.children.append")
+        siblings = self._children_of(block_id)
+        before = list(siblings)
+        created = self._create_blocks(block_id, children)
+        if after is not None:
+            position = before.index(after) + 1
+            siblings[:] = before[:position] + created + before[position:]
+        return {"results": [self._result(child_id) for child_id in created]}
+
+    def _result(self, block_id):
+        block = self.blocks_data[block_id]
+        return {
+            "object": "block",
+            "id": block_id,
+            "type": block["type"],
+            block["type"]: dict(block["body"]),
+            "has_children": bool(block["children"]),
+        }
+
+    def _list(self, block_id=None, start_cursor=None, page_size=100, **kwargs):
+        self.calls.append("blocks.children.list")
+        children = self._children_of(block_id)
+        start = int(start_cursor or 0)
+        end = start + page_size
+        return {
+            "results": [self._result(child_id) for child_id in children[start:end]],
+            "has_more": end < len(children),
+            "next_cursor": str(end) if end < len(children) else None,
+        }
+
+    def _update_block(self, block_id=None, **kwargs):
+        self.calls.append("blocks.update")
+        block = self.blocks_data[block_id]
+        block["body"].update(kwargs[block["type"]])
+        return self._result(block_id)
+
+    def _delete_block(self, block_id=None, **kwargs):
+        self.calls.append("blocks.delete")
+        block = self.blocks_data.pop(block_id)
+        self._children_of(block["parent"]).remove(block_id)
+        return {"id": block_id, "archived": True}
+
+    def tree(self, parent_id):
+        """以 (类型, 纯文本, 子块) 的嵌套元组返回子块树，便于断言页面内容"""
+        def node(block_id):
+            block = self.blocks_data[block_id]
+            return block["type"], block_text(block["body"]), tuple(node(child_id) for child_id in block["children"])
+        return [node(block_id) for block_id in self._children_of(parent_id)]
+
+
+def block_text(body):
+    """块的纯文本，表格行的单元格以 | 分隔"""
+    def plain(rich_text):
+        return "".join(item.get("text", {}).get("content", "") for item in rich_text or [])
+    if "cells" in body:
+        return "|".join(plain(cell) for cell in body["cells"])
+    return plain(body.get("rich_text"))
+
+
+def rendered_tree(blocks):
+    """渲染的块列表（请求格式）转换为与 FakeNotion.tree() 相同的结构"""
+    tree = []
+    for block in blocks:
+        block_type = _block_type(block)
+        body = block[block_type]
+        tree.append((block_type, block_text(body), tuple(rendered_tree(body.get("children") or []))))
+    return tree
+
+
+def block(block_type, content, *children):
+    """构造请求格式的文本块"""
+    body = {"rich_text": [{"type": "text", "text": {"content": content}}]}
+    if children:
+        body["children"] = list(children)
+    return {block_type: body}
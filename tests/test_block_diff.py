@@ -0,0 +1,116 @@
+import pytest
+
+from fakes import FakeNotion, block, rendered_tree
+from notionify.block_diff import BlockDiffer
+from notionify.md2notion import Md2NotionUploader
+from notionify.notion_helper import NotionHelper
+
+WRITES = ("blocks.update", "blocks.children.append", "blocks.delete")
+
+
+def p(content, *children):
+    return block("paragraph", content, *children)
+
+
+def li(content, *children):
+    return block("bulleted_list_item", content, *children)
+
+
+class Page:
+    """FakeNotion 中内容为 blocks 的页面"""
+
+    def __init__(self, blocks):
+        self.notion = FakeNotion()
+        self.helper = NotionHelper()
+        self.helper.client = self.notion
+        self.uploader = Md2NotionUploader()
+        self.id = self.notion.pages.create(parent={"database_id": "db"})["id"]
+        self.uploader.uploadBlocks(self.notion, self.id, blocks)
+        self.block_ids = list(self.notion.pages_data[self.id]["children"])
+        self.notion.calls.clear()
+
+    def sync(self, blocks):
+        return BlockDiffer(self.helper, self.uploader).sync(self.id, blocks)
+
+    def writes(self):
+        return [call for call in self.notion.calls if call in WRITES]
+
+
+def test_unchanged_page_sends_no_writes():
+    blocks = [p("a"), li("b", li("c")), p("d")]
+    page = Page(blocks)
+
+    stats = page.sync(blocks)
+
+    assert page.writes() == []
+    assert stats == {"kept": 3, "updated": 0, "inserted": 0, "deleted": 0}
+
+
+@pytest.mark.parametrize("new, writes", [
+    ([p("a"), p("B"), p("c")], ["blocks.update"]),
+    ([p("a"), p("b"), p("x"), p("c")], ["blocks.children.append"]),
+    ([p("a"), p("c")], ["blocks.delete"]),
+    ([p("a"), p("b"), p("c"), p("d")], ["blocks.children.append"]),
+    ([p("a"), block("heading_1", "b"), p("c")], ["blocks.delete", "blocks.children.append"]),
+])
+def test_minimal_writes(new, writes):
+    page = Page([p("a"), p("b"), p("c")])
+
+    page.sync(new)
+
+    assert page.writes() == writes
+    assert page.notion.tree(page.id) == rendered_tree(new)
+
+
+def test_kept_blocks_keep_their_ids():
+    page = Page([p("a"), p("b"), p("c")])
+
+    page.sync([p("a"), p("x"), p("b"), p("c")])
+
+    children = page.notion.pages_data[page.id]["children"]
+    assert [children[0]] + children[2:] == page.block_ids
+
+
+def test_nested_children_are_diffed_in_place():
+    page = Page([li("a", li("a1"), li("a2")), p("b")])
+    new = [li("a", li("a1"), li("a2 edited"), li("a3")), p("b")]
+
+    stats = page.sync(new)
+
+    assert page.writes() == ["blocks.update", "blocks.children.append"]
+    assert stats["updated"] == 1 and stats["inserted"] == 1
+    assert page.notion.tree(page.id) == rendered_tree(new)
+
+
+def test_head_insert_rewrites_first_block_in_place():
+    page = Page([p("a"), p("b")])
+    new = [p("x"), p("a"), p("b")]
+
+    stats = page.sync(new)
+
+    # 没有可以插在前面的锚点：把第一个块改写为新块，原来的内容插到它后面
+    assert page.writes() == ["blocks.update", "blocks.children.append"]
+    assert stats == {"kept": 1, "updated": 1, "inserted": 1, "deleted": 0}
+    assert page.notion.tree(page.id) == rendered_tree(new)
+
+
+def test_head_insert_of_other_type_rewrites_all_children():
+    page = Page([p("a"), p("b")])
+    new = [block("heading_1", "title"), p("a"), p("b")]
+
+    stats = page.sync(new)
+
+    assert page.writes() == ["blocks.delete", "blocks.delete", "blocks.children.append"]
+    assert stats == {"kept": 0, "updated": 0, "inserted": 3, "deleted": 2}
+    assert page.notion.tree(page.id) == rendered_tree(new)
+
+
+def test_build_plan():
+    page = Page([p("a"), p("b"), p("c")])
+    differ = BlockDiffer(page.helper, page.uploader)
+    old = differ._get_children(page.id)
+
+    plan = differ._build_plan(old, [p("a"), p("B"), p("x"), p("c")])
+
+    assert [step[0] for step in plan] == ["keep", "update", "insert", "keep"]
+    assert differ._build_plan(old, [block("heading_1", "x")] + [p("a"), p("b"), p("c")]) is None
@@ -0,0 +1,59 @@
+import random
+import threading
+import time
+
+import flomo2notion
+from fakes import make_memo
+from sync_state import CommitTracker
+
+NOW = int(time.time())
+
+
+def test_watermark_waits_for_earlier_memos():
+    tracker = CommitTracker()
+    tracker.finish(1, True, "t1")
+    tracker.finish(2, True, "t2")
+    assert tracker.committed_updated_at is None
+    tracker.finish(0, True, "t0")
+    assert tracker.committed_updated_at == "t2"
+
+
+def test_watermark_stops_at_first_failure():
+    tracker = CommitTracker()
+    for index, ok in [(0, True), (3, True), (1, False), (2, True), (4, True)]:
+        tracker.finish(index, ok, f"t{index}")
+    assert tracker.committed_updated_at == "t0"
+
+
+def test_concurrent_processing_commits_contiguous_prefix(engine, monkeypatch):
+    monkeypatch.setattr(flomo2notion, "SYNC_CONCURRENCY", 4)
+    memos = [make_memo(f"s{index}", NOW - 1000 + index) for index in range(40)]
+    memos.insert(25, make_memo("s5", NOW - 1000 + 25, content="<p>again</p>"))
+    rng = random.Random(0)
+    running = set()
+    processed = []
+    overlaps = []
+    lock = threading.Lock()
+
+    def process_memo(memo, page_id=None):
+        with lock:
+            if memo["slug"] in running:
+                overlaps.append(memo["slug"])
+            running.add(memo["slug"])
+        time.sleep(rng.random() * 0.01)
+        with lock:
+            running.discard(memo["slug"])
+            processed.append(memo["slug"])
+        if memo["slug"] == "s30":
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(engine, "process_memo", process_memo)
+    summary = engine._process_memos(iter(memos), False, False, 2)
+
+    assert summary["total"] == len(processed) == 41
+    assert engine.error_count == 1
+    # 失败之后的记录照常处理，但水位线停在失败记录之前
+    failed = next(index for index, memo in enumerate(memos) if memo["slug"] == "s30")
+    assert summary["committed_updated_at"] == memos[failed - 1]["updated_at"]
+    # 同一 slug 不会被并行处理
+    assert overlaps == []
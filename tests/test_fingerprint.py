@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import flomo2notion
+from fakes import FakeFlomoApi, make_memo
+from utils import memo_fingerprint
+
+NOW = int(time.time())
+WRITES = {"pages.create", "pages.update", "blocks.children.append", "blocks.update", "blocks.delete"}
+
+
+def test_fingerprint_ignores_url_signature_and_update_time():
+    memo = make_memo("a", NOW, files=[{"id": 1, "name": "a.png", "size": 10, "url": "https://f/a.png?sign=1"}])
+    same = dict(memo, updated_at="2020-01-01 00:00:00",
+                files=[{"id": 1, "name": "a.png", "size": 10, "url": "https://f/a.png?sign=2"}])
+    assert memo_fingerprint(memo) == memo_fingerprint(same)
+    assert memo_fingerprint(dict(memo, tags=["x", "y"])) == memo_fingerprint(dict(memo, tags=["y", "x"]))
+
+
+@pytest.mark.parametrize("change", [
+    {"content": "<p>edited</p>"},
+    {"tags": ["new"]},
+    {"pin": 1},
+    {"linked_count": 3},
+    {"files": [{"id": 2, "name": "b.png", "size": 10, "url": "https://f/b.png"}]},
+])
+def test_fingerprint_changes_with_content(change):
+    memo = make_memo("a", NOW)
+    assert memo_fingerprint(memo) != memo_fingerprint(dict(memo, **change))
+
+
+def test_skip_reason(engine):
+    memo = make_memo("a", NOW)
+    old_memo = make_memo("b", NOW - 24 * 3600)
+    engine.sync_state.set_page("a", "page-a")
+    engine.sync_state.set_fingerprint("a", memo_fingerprint(memo))
+    engine.sync_state.set_page("b", "page-b")
+
+    assert engine._skip_reason(memo, "page-a", False, True, 2) == "内容未变化"
+    assert engine._skip_reason(dict(memo, content="<p>edited</p>"), "page-a", False, True, 2) is None
+    assert engine._skip_reason(memo, "page-a", True, True, 2) is None
+    assert engine._skip_reason(make_memo("c", NOW), None, False, True, 2) is None
+    assert engine._skip_reason(make_memo("d", NOW, deleted_at="2024-01-01 00:00:00"), None, False, True, 2) == "已删除"
+    # 没有指纹记录时按时间窗口判断，并记录当前指纹，之后按指纹判断
+    assert engine._skip_reason(old_memo, "page-b", False, True, 2) == "更新时间超过 2 小时"
+    assert engine.sync_state.get_fingerprint("b") == memo_fingerprint(old_memo)
+    assert engine._skip_reason(dict(old_memo, content="<p>edited</p>"), "page-b", False, True, 2) is None
+
+
+def test_unchanged_memos_are_not_rewritten(engine, monkeypatch):
+    monkeypatch.setattr(flomo2notion, "FULL_RESCAN", True)
+    memos = [make_memo(f"s{index}", NOW - 3600 + index, content=f"<p>memo {index}</p>") for index in range(5)]
+    notion = engine.notion_helper.client
+    engine.flomo_api = FakeFlomoApi(memos)
+    engine.sync_to_notion()
+    assert notion.calls.count("pages.create") == 5
+
+    notion.calls.clear()
+    engine.sync_to_notion()
+    assert not WRITES & set(notion.calls)
+
+    memos[2] = dict(memos[2], content="<p>memo 2 edited</p>")
+    notion.calls.clear()
+    engine.sync_to_notion()
+    assert notion.calls.count("pages.update") == 1
+    page_id = engine.sync_state.get_page_id("s2")
+    assert notion.tree(page_id) == [("paragraph", "memo 2 edited", ())]
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+from fakes import FakeFlomoApi, make_memo
+from flomo.flomo_api import FlomoApiError, parse_memo_list_response
+from flomo.flomo_backfill import FlomoBackfill
+from utils import memo_fingerprint
+
+START = int(time.time()) - 900 * 3600
+
+
+def memos(count=900):
+    return [make_memo(f"s{i}", START + i * 3600) for i in range(count)]
+
+
+class Response:
+    def __init__(self, status_code, body=None, text=""):
+        self.status_code = status_code
+        self.body = body
+        self.text = text
+
+    def json(self):
+        return self.body
+
+
+def test_parse_memo_list_response_raises_on_errors():
+    assert parse_memo_list_response(Response(200, {"code": 0, "data": [{"slug": "a"}]})) == [{"slug": "a"}]
+    assert parse_memo_list_response(Response(200, {"code": 0, "data": []})) == []
+    with pytest.raises(FlomoApiError):
+        parse_memo_list_response(Response(502, text="Bad Gateway"))
+    with pytest.raises(FlomoApiError):
+        parse_memo_list_response(Response(200, {"code": -10, "message": "token expired"}))
+
+
+def test_iter_memo_pages_raises_instead_of_ending():
+    api = FakeFlomoApi(memos(120), fail_slugs={"s60"})
+    pages = api.iter_memo_pages("token")
+    assert len(next(pages)) == 50
+    with pytest.raises(FlomoApiError):
+        next(pages)
+
+
+def test_backfill_yields_every_memo_in_order():
+    source = memos()
+    result = list(FlomoBackfill(FakeFlomoApi(source), workers=4, windows=16).iter_memos("token"))
+    assert [memo["slug"] for memo in result] == [memo["slug"] for memo in source]
+
+
+def test_backfill_keeps_latest_version_of_duplicate_slug():
+    source = memos(100)
+    source.append(make_memo("s10", START + 100 * 3600, content="<p>edited</p>"))
+    result = list(FlomoBackfill(FakeFlomoApi(source), workers=2, windows=8).iter_memos("token"))
+    assert [memo["content"] for memo in result if memo["slug"] == "s10"][-1] == "<p>edited</p>"
+    assert len({memo["slug"] for memo in result}) == 100
+
+
+def test_backfill_stops_at_failed_window():
+    api = FakeFlomoApi(memos(), fail_slugs={"s251"})
+    yielded = []
+    with pytest.raises(FlomoApiError):
+        for memo in FlomoBackfill(api, workers=4, windows=16).iter_memos("token"):
+            yielded.append(memo["slug"])
+    # 失败窗口之前的记录全部产出且连续，之后的窗口一条都不产出
+    assert yielded == [f"s{i}" for i in range(len(yielded))]
+    assert "s251" not in yielded
+
+
+def test_backfill_bounds_windows_in_flight():
+    started = []
+
+    class Backfill(FlomoBackfill):
+        def _fetch_window(self, user_authorization, start, end, stopped):
+            started.append(start)
+            return super()._fetch_window(user_authorization, start, end, stopped)
+
+    memo_iter = Backfill(FakeFlomoApi(memos()), workers=2, windows=16).iter_memos("token")
+    next(memo_iter)
+    time.sleep(0.2)
+    # 正在产出的窗口之外，最多 workers 个窗口在拉取或等待产出
+    assert len(started) <= 3
+    memo_iter.close()
+
+
+def test_failed_window_does_not_advance_watermark(engine):
+    source = memos(300)
+    for memo in source:
+        engine.sync_state.set_page(memo["slug"], f"page-{memo['slug']}")
+        engine.sync_state.set_fingerprint(memo["slug"], memo_fingerprint(memo))
+    backfill = FlomoBackfill(FakeFlomoApi(source, fail_slugs={"s251"}), workers=4, windows=16)
+
+    summary = engine._process_memos(backfill.iter_memos("token"), False, False, 2)
+
+    assert summary["committed_updated_at"] is not None
+    assert summary["committed_updated_at"] < source[251]["updated_at"]
+    assert engine.error_count == 0
@@ -0,0 +1,87 @@
+import pytest
+
+from fakes import rendered_tree
+from notionify.html2block import MAX_TEXT_LENGTH, html_to_blocks
+
+
+def annotations(block):
+    """块中每段文本的 (文本, 生效的样式, 链接)"""
+    body = next(iter(block.values()))
+    return [
+        (item["text"]["content"], {name for name, value in item["annotations"].items() if value not in (False, "default")},
+         item["href"])
+        for item in body["rich_text"]
+    ]
+
+
+def test_inline_styles_and_links():
+    blocks, text = html_to_blocks(
+        '<p>a <strong>b <em>c</em></strong> <s>d</s> <code>e</code> <mark>f</mark> <a href="https://x.com">g</a></p>'
+    )
+    assert annotations(blocks[0]) == [
+        ("a ", set(), None),
+        ("b ", {"bold"}, None),
+        ("c", {"bold", "italic"}, None),
+        (" ", set(), None),
+        ("d", {"strikethrough"}, None),
+        (" ", set(), None),
+        ("e", {"code"}, None),
+        (" ", set(), None),
+        ("f", {"color"}, None),
+        (" ", set(), None),
+        ("g", set(), "https://x.com"),
+    ]
+    assert text == "a b c d e f g"
+
+
+def test_nested_lists():
+    blocks, text = html_to_blocks(
+        "<ul><li><p>one</p><ol><li><p>two</p></li></ol></li><li>three</li></ul><ol><li>four</li></ol>"
+    )
+    assert rendered_tree(blocks) == [
+        ("bulleted_list_item", "one", (("numbered_list_item", "two", ()),)),
+        ("bulleted_list_item", "three", ()),
+        ("numbered_list_item", "four", ()),
+    ]
+    assert text == "one\ntwo\nthree\nfour"
+
+
+def test_block_types():
+    blocks, text = html_to_blocks(
+        '<h1>T</h1><h4>S</h4><blockquote><p>q1</p><p>q2</p></blockquote>'
+        '<pre><code class="language-Python">x = 1\n  y</code></pre><hr><img src="https://i.com/a.png"><p>a<br>b</p>'
+    )
+    assert rendered_tree(blocks) == [
+        ("heading_1", "T", ()),
+        ("heading_3", "S", ()),
+        ("quote", "q1\nq2", ()),
+        ("code", "x = 1\n  y", ()),
+        ("divider", "", ()),
+        ("image", "", ()),
+        ("paragraph", "a\nb", ()),
+    ]
+    assert blocks[3]["code"]["language"] == "python"
+    assert blocks[5] == {"image": {"caption": [], "external": {"url": "https://i.com/a.png"}}}
+    assert text == "T\nS\nq1\nq2\nx = 1\n  y\na\nb"
+
+
+def test_whitespace_entities_and_ignored_tags():
+    blocks, text = html_to_blocks("<p>  a   \n b  </p><p></p><p>&lt;tag&gt; &amp;</p><script>alert(1)</script>")
+    assert rendered_tree(blocks) == [("paragraph", "a b", ()), ("paragraph", "<tag> &", ())]
+    assert text == "a b\n<tag> &"
+
+
+def test_bare_text_becomes_paragraph():
+    assert rendered_tree(html_to_blocks("hello #tag")[0]) == [("paragraph", "hello #tag", ())]
+
+
+@pytest.mark.parametrize("html", ["", None, "<p> </p>"])
+def test_empty_content(html):
+    assert html_to_blocks(html) == ([], "")
+
+
+def test_long_text_is_split_into_items():
+    blocks, text = html_to_blocks("<p>" + "x" * (MAX_TEXT_LENGTH * 2 + 10) + "</p>")
+    lengths = [len(item["text"]["content"]) for item in blocks[0]["paragraph"]["rich_text"]]
+    assert lengths == [MAX_TEXT_LENGTH, MAX_TEXT_LENGTH, 10]
+    assert len(text) == MAX_TEXT_LENGTH * 2 + 10
@@ -0,0 +1,55 @@
+import io
+
+import pytest
+
+from image_optimizer import ImageOptimizer, optimize_image_bytes
+
+
+def test_images_above_max_bytes_are_uploaded_unchanged():
+    optimizer = ImageOptimizer(max_bytes=10)
+    fileobj = io.BytesIO(b"x" * 11)
+
+    assert optimizer.optimize(fileobj, "image/png", "a.png") == (fileobj, "image/png", "a.png")
+    assert optimizer.count == 0
+    assert fileobj.tell() == 0
+
+
+def source_png(**params):
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.effect_noise((600, 400), 60).convert("RGB")
+    output = io.BytesIO()
+    image.save(output, "PNG", **params)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize("image_format", ["PNG", "WEBP", "JPEG"])
+def test_reencoded_image_has_no_metadata(image_format):
+    Image = pytest.importorskip("PIL.Image")
+    ImageCms = pytest.importorskip("PIL.ImageCms")
+    PngImagePlugin = pytest.importorskip("PIL.PngImagePlugin")
+    exif = Image.Exif()
+    exif[0x010F] = "Camera"
+    pnginfo = PngImagePlugin.PngInfo()
+    pnginfo.add_text("Comment", "private")
+    icc_profile = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    data = source_png(icc_profile=icc_profile, exif=exif.tobytes(), pnginfo=pnginfo)
+
+    optimized, _, _ = optimize_image_bytes(data, 300, image_format, 80)
+
+    with Image.open(io.BytesIO(optimized)) as image:
+        assert "icc_profile" not in image.info
+        assert "exif" not in image.info
+        assert "Comment" not in image.info
+        assert not image.getexif()
+
+
+def test_png_keeps_transparency():
+    Image = pytest.importorskip("PIL.Image")
+    image = Image.effect_noise((600, 400), 60).convert("P")
+    output = io.BytesIO()
+    image.save(output, "PNG", transparency=0)
+
+    optimized, _, _ = optimize_image_bytes(output.getvalue(), 300, "PNG", 80)
+
+    with Image.open(io.BytesIO(optimized)) as result:
+        assert result.info.get("transparency") == 0
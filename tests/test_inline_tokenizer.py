@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from notionify.inline_tokenizer import tokenize_inline
+
+
+def spans(text):
+    """把 rich_text 列表简化为 (文本, 生效的样式, 链接)，公式为 ("$...$", {"equation"}, None)"""
+    result = []
+    for item in tokenize_inline(text):
+        if item["type"] == "equation":
+            result.append((f"${item['equation']['expression']}$", {"equation"}, None))
+            continue
+        styles = {name for name, value in item["annotations"].items() if value is True}
+        result.append((item["text"]["content"], styles, item["href"]))
+    return result
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("a **b** c", [("a ", set(), None), ("b", {"bold"}, None), (" c", set(), None)]),
+    ("__b__", [("b", {"bold"}, None)]),
+    ("*i* and _j_", [("i", {"italic"}, None), (" and ", set(), None), ("j", {"italic"}, None)]),
+    ("~~s~~", [("s", {"strikethrough"}, None)]),
+    ("**b *bi* b**", [("b ", {"bold"}, None), ("bi", {"bold", "italic"}, None), (" b", {"bold"}, None)]),
+])
+def test_styles(text, expected):
+    assert spans(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("***x***", [("x", {"bold", "italic"}, None)]),
+    ("___x___", [("x", {"bold", "italic"}, None)]),
+    ("***x** y*", [("x", {"bold", "italic"}, None), (" y", {"italic"}, None)]),
+    ("***x* y**", [("x", {"bold", "italic"}, None), (" y", {"bold"}, None)]),
+])
+def test_triple_delimiters(text, expected):
+    assert spans(text) == expected
+
+
+def test_code_keeps_markers_inside():
+    assert spans("run `a*b*c` now") == [
+        ("run ", set(), None), ("a*b*c", {"code"}, None), (" now", set(), None),
+    ]
+
+
+def test_link_and_styled_link_text():
+    assert spans("see [**doc**](https://example.com) here") == [
+        ("see ", set(), None),
+        ("doc", {"bold"}, "https://example.com"),
+        (" here", set(), None),
+    ]
+
+
+def test_equation():
+    assert spans("energy $E=mc^2$ done") == [
+        ("energy ", set(), None), ("$E=mc^2$", {"equation"}, None), (" done", set(), None),
+    ]
+
+
+def test_escaped_markers_are_literal():
+    assert spans(r"\*not italic\* \[x\](y) \$1") == [("*not italic* [x](y) $1", set(), None)]
+
+
+def test_underscores_inside_words_are_literal():
+    assert spans("snake_case_name and __init__") == [("snake_case_name and ", set(), None), ("init", {"bold"}, None)]
+
+
+@pytest.mark.parametrize("text", ["**open", "*a", "~~s", "`code", "[text](url", "$x", "***x"])
+def test_unclosed_markers_are_literal(text):
+    assert spans(text) == [(text, set(), None)]
+
+
+def test_markers_do_not_cross_lines():
+    assert spans("*a\nb*") == [("*a\nb*", set(), None)]
+
+
+def test_long_text_is_split_into_2000_character_items():
+    items = tokenize_inline("**" + "x" * 4500 + "**")
+    assert [len(item["text"]["content"]) for item in items] == [2000, 2000, 500]
+    assert all(item["annotations"]["bold"] for item in items)
+
+
+@pytest.mark.parametrize("unit", ["*a", "**a_", "[a](", "***a", "_", "$a", "`", "\\*"])
+def test_pathological_input_is_linear(unit):
+    text = unit * (100000 // len(unit))
+    start = time.perf_counter()
+    items = tokenize_inline(text)
+    # 回溯或重复扫描时这些输入需要数十秒以上
+    assert time.perf_counter() - start < 2
+    assert items
@@ -0,0 +1,143 @@
+import pytest
+
+from fakes import FakeNotion, block, rendered_tree
+from notionify.md2notion import Md2NotionUploader
+
+
+def text(content):
+    return [{"type": "text", "text": {"content": content}}]
+
+
+def item(content, children=()):
+    return block("bulleted_list_item", content, *children)
+
+
+def deep_list(depth, width):
+    """depth 层、每层 width 个子项的嵌套列表"""
+    if depth == 1:
+        return [item(f"leaf {index}") for index in range(width)]
+    return [item(f"level {depth} {index}", deep_list(depth - 1, width)) for index in range(width)]
+
+
+@pytest.mark.parametrize("blocks", [
+    deep_list(4, 2),
+    deep_list(5, 3),
+    deep_list(4, 6),
+    [item("wide", [item(f"child {index}") for index in range(250)])],
+])
+@pytest.mark.parametrize("create", [False, True])
+def test_estimate_requests_matches_upload(blocks, create):
+    uploader = Md2NotionUploader()
+    notion = FakeNotion()
+    parent = notion.pages.create(parent={"database_id": "db"})["id"]
+    notion.calls.clear()
+
+    if create:
+        page_id = uploader.createPage(notion, blocks, parent={"database_id": "db"})["id"]
+    else:
+        page_id = parent
+        uploader.uploadBlocks(notion, page_id, blocks)
+
+    assert len(notion.calls) == uploader.estimateRequests(blocks, create=create)
+    assert notion.tree(page_id) == rendered_tree(blocks)
+
+
+def table(rows):
+    return {"table": {
+        "table_width": 2,
+        "has_column_header": False,
+        "has_row_header": False,
+        "children": [{"table_row": {"cells": [text(f"r{index}c0"), text(f"r{index}c1")]}} for index in range(rows)],
+    }}
+
+
+@pytest.mark.parametrize("blocks", [
+    [item("level 1", [table(3)])],
+    [item("level 1", [item("level 2", [table(3)])])],
+    [item("level 1", [item("level 2", [item("level 3", [table(3)])])])],
+    [item("level 1", [item("level 2", [item("before"), table(120), item("after")])])],
+])
+@pytest.mark.parametrize("create", [False, True])
+def test_nested_table_is_created_with_its_rows(blocks, create):
+    uploader = Md2NotionUploader()
+    notion = FakeNotion()
+    parent = notion.pages.create(parent={"database_id": "db"})["id"]
+    notion.calls.clear()
+
+    if create:
+        page_id = uploader.createPage(notion, blocks, parent={"database_id": "db"})["id"]
+    else:
+        page_id = parent
+        uploader.uploadBlocks(notion, page_id, blocks)
+
+    # FakeNotion 拒绝嵌套超过 3 层的请求，表格和它的行必须在同一个请求中创建
+    assert notion.tree(page_id) == rendered_tree(blocks)
+    assert len(notion.calls) == uploader.estimateRequests(blocks, create=create)
+
+
+def paragraphs(count, length=1):
+    return [block("paragraph", "x" * length) for _ in range(count)]
+
+
+@pytest.mark.parametrize("blocks, sizes", [
+    (paragraphs(250), [100, 100, 50]),
+    # 每个顶层块连同子块共 300 个，一个请求最多 3 个
+    ([item(f"top {index}", [item(f"child {child}") for child in range(299)]) for index in range(7)], [3, 3, 1]),
+    # 每个块约 150KB，一个请求最多 3 个
+    (paragraphs(7, 150 * 1000), [3, 3, 1]),
+])
+def test_batch_blocks_limits(blocks, sizes):
+    batches = list(Md2NotionUploader()._batchBlocks(blocks))
+    assert [len(batch) for batch in batches] == sizes
+    assert [block for batch in batches for block in batch] == blocks
+
+
+def test_batch_blocks_keeps_oversized_block_alone():
+    big = item("big", [item(f"child {index}") for index in range(1200)])
+    batches = list(Md2NotionUploader()._batchBlocks([block("paragraph", "a"), big, block("paragraph", "b")]))
+    assert [len(batch) for batch in batches] == [1, 1, 1]
+
+
+def test_upload_many_blocks_within_limits():
+    notion = FakeNotion()
+    blocks = paragraphs(120, 10 * 1000) + [item(f"top {index}", [item("child")] * 150) for index in range(10)]
+    page_id = notion.pages.create(parent={"database_id": "db"})["id"]
+    Md2NotionUploader().uploadBlocks(notion, page_id, blocks)
+    # FakeNotion 拒绝超过 100 个子块或 1000 个块的请求
+    assert notion.tree(page_id) == rendered_tree(blocks)
+
+
+def test_split_long_blocks_cuts_long_runs_and_many_items():
+    bold = {"type": "text", "text": {"content": "b" * 4500}, "annotations": {"bold": True}, "plain_text": "b" * 4500}
+    many = [{"type": "text", "text": {"content": str(index)}} for index in range(250)]
+    blocks = [
+        {"paragraph": {"rich_text": [bold]}},
+        {"bulleted_list_item": {"rich_text": many, "children": [block("paragraph", "child")]}},
+    ]
+
+    result = Md2NotionUploader().splitLongBlocks(blocks)
+
+    first = result[0]["paragraph"]["rich_text"]
+    assert [len(run["text"]["content"]) for run in first] == [2000, 2000, 500]
+    assert all(run["annotations"] == {"bold": True} for run in first)
+    # 超过 100 段文本的块拆成同类型的连续块，子块跟随最后一个
+    assert [len(next(iter(part.values()))["rich_text"]) for part in result[1:]] == [100, 100, 50]
+    assert rendered_tree(result[1:]) == [
+        ("bulleted_list_item", "".join(map(str, range(100))), ()),
+        ("bulleted_list_item", "".join(map(str, range(100, 200))), ()),
+        ("bulleted_list_item", "".join(map(str, range(200, 250))), (("paragraph", "child", ()),)),
+    ]
+
+
+def test_split_long_blocks_returns_same_list_when_nothing_changes():
+    blocks = [block("paragraph", "a"), item("b", [item("c")])]
+    assert Md2NotionUploader().splitLongBlocks(blocks) is blocks
+
+
+def test_split_long_blocks_in_nested_children():
+    blocks = [item("top", [block("paragraph", "x" * 2500)])]
+    result = Md2NotionUploader().splitLongBlocks(blocks)
+    child = result[0]["bulleted_list_item"]["children"][0]["paragraph"]["rich_text"]
+    assert [len(run["text"]["content"]) for run in child] == [2000, 500]
+    # 原块不被修改
+    assert len(blocks[0]["bulleted_list_item"]["children"][0]["paragraph"]["rich_text"]) == 1
@@ -0,0 +1,74 @@
+import httpx
+import pytest
+import requests
+
+from notionify import notion_http
+from rate_limiter import RateLimiter
+
+
+class Response:
+    status_code = 200
+
+    def close(self):
+        pass
+
+
+class Session:
+    """前 failures 次请求抛出 error，之后返回 200"""
+
+    def __init__(self, error, failures):
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return Response()
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(notion_http, "backoff_delay", lambda attempt: 0)
+    monkeypatch.setattr(notion_http, "rate_limiter", RateLimiter(0))
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ConnectTimeout("connect timeout"),
+    requests.exceptions.ConnectionError("[Errno 111] Connection refused"),
+    requests.exceptions.ConnectionError("Failed to resolve 'api.notion.com'"),
+])
+def test_notion_request_retries_connection_errors(monkeypatch, error):
+    session = Session(error, failures=2)
+    monkeypatch.setattr(notion_http, "get_session", lambda: session)
+
+    response = notion_http.notion_request("POST", "/file_uploads", json={})
+
+    assert response.status_code == 200
+    assert session.calls == 3
+
+
+def test_notion_request_gives_up_after_max_retries(monkeypatch):
+    session = Session(requests.exceptions.ConnectionError("refused"), failures=notion_http.NOTION_MAX_RETRIES + 1)
+    monkeypatch.setattr(notion_http, "get_session", lambda: session)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        notion_http.notion_request("POST", "/file_uploads", json={})
+    assert session.calls == notion_http.NOTION_MAX_RETRIES + 1
+
+
+def test_notion_request_does_not_retry_read_timeout(monkeypatch):
+    session = Session(requests.exceptions.ReadTimeout("read timeout"), failures=1)
+    monkeypatch.setattr(notion_http, "get_session", lambda: session)
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        notion_http.notion_request("POST", "/file_uploads", json={})
+    assert session.calls == 1
+
+
+def test_http_clients_use_configured_timeout():
+    expected = httpx.Timeout(notion_http.HTTP_READ_TIMEOUT, connect=notion_http.HTTP_CONNECT_TIMEOUT)
+    with notion_http.create_http_client() as client:
+        assert client.timeout == expected
+    assert notion_http.create_async_http_client().timeout == expected
@@ -0,0 +1,111 @@
+import os
+import time
+
+import tools
+from notionify.md2notion import Md2NotionUploader
+from render_cache import RenderCache, render_key
+
+
+def test_render_key_covers_converter_version_and_source():
+    key = render_key("html", 1, "<p>a</p>")
+    assert key == render_key("html", 1, "<p>a</p>")
+    assert len({
+        key,
+        render_key("markdown", 1, "<p>a</p>"),
+        render_key("html", 2, "<p>a</p>"),
+        render_key("html", 1, "<p>b</p>"),
+        # 转换方式与内容的边界不会混淆
+        render_key("html:1", 1, "<p>a</p>"),
+    }) == 5
+
+
+def test_values_are_fresh_copies():
+    cache = RenderCache(directory=None)
+    value = [{"paragraph": {"rich_text": []}}]
+    cache.put("k", value)
+    value.append("changed after put")
+    first = cache.get("k")
+    first.append("changed after get")
+    assert cache.get("k") == [{"paragraph": {"rich_text": []}}]
+
+
+def test_memory_tier_keeps_recently_used_entries():
+    cache = RenderCache(directory=None, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_get_or_render_renders_once():
+    cache = RenderCache(directory=None)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return {"blocks": [1, 2]}
+
+    assert cache.get_or_render("k", render) == {"blocks": [1, 2]}
+    assert cache.get_or_render("k", render) == {"blocks": [1, 2]}
+    assert len(calls) == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    RenderCache(directory=str(tmp_path)).put("k", ["block"])
+    cache = RenderCache(directory=str(tmp_path))
+    assert cache.get("k") == ["block"]
+    assert cache.get("k") == ["block"]
+    assert (cache.disk_hits, cache.hits) == (1, 1)
+
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    (tmp_path / "k.json").write_text('["trunc', encoding="utf-8")
+    cache = RenderCache(directory=str(tmp_path))
+    assert cache.get("k") is None
+    assert cache.misses == 1
+
+
+def test_save_evicts_least_recently_used_entries(tmp_path):
+    cache = RenderCache(directory=str(tmp_path), max_bytes=250)
+    for index, key in enumerate("abcd"):
+        cache.put(key, "x" * 95)
+        os.utime(tmp_path / f"{key}.json", (time.time() - 100 + index, time.time() - 100 + index))
+    # 读取 a 更新其访问时间，淘汰时保留
+    assert RenderCache(directory=str(tmp_path)).get("a")
+
+    cache.save()
+
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "d.json"]
+
+
+def test_save_keeps_entries_under_limit(tmp_path):
+    cache = RenderCache(directory=str(tmp_path))
+    cache.put("a", "x")
+    cache.save()
+    assert os.listdir(tmp_path) == ["a.json"]
+
+
+def test_content_processor_converts_unchanged_content_once(monkeypatch):
+    calls = []
+    html_to_blocks = tools.html_to_blocks
+
+    def counting(html):
+        calls.append(html)
+        return html_to_blocks(html)
+
+    monkeypatch.setattr(tools, "html_to_blocks", counting)
+    processor = tools.ContentProcessor(None, Md2NotionUploader(), converter="html", render_cache=RenderCache(directory=None))
+    memo = {"slug": "a", "content": "<p>hello</p>", "files": [{"url": "https://i.com/a.png"}]}
+    images = [(None, "https://i.com/a.png", "a.png")]
+
+    first = processor.build_content(memo, images)
+    second = processor.build_content(memo, images)
+
+    assert len(calls) == 1
+    # 追加的图片块不会写进缓存
+    assert first == second
+    processor.build_content(dict(memo, content="<p>edited</p>"), images)
+    assert len(calls) == 2
@@ -0,0 +1,130 @@
+import os
+import time
+
+import pytest
+
+import flomo2notion
+from fakes import FakeFlomoApi, FakeNotion, make_memo
+from sync_journal import SyncJournal
+from utils import beijing_time_to_timestamp
+
+NOW = int(time.time())
+
+
+class Crash(BaseException):
+    """模拟进程在运行中途被终止"""
+
+
+class CrashingNotion(FakeNotion):
+    """创建指定 slug 的页面时中断运行"""
+
+    def __init__(self, crash_slugs=()):
+        super().__init__()
+        self.crash_slugs = set(crash_slugs)
+
+    def _create_page(self, parent=None, properties=None, children=None, **kwargs):
+        slug = properties["slug"]["rich_text"][0]["text"]["content"]
+        if slug in self.crash_slugs:
+            raise Crash()
+        return super()._create_page(parent=parent, properties=properties, children=children, **kwargs)
+
+
+def test_recover_without_journal(tmp_path):
+    assert SyncJournal(str(tmp_path / "journal.jsonl")).recover() == ({}, None)
+
+
+def test_recover_keeps_last_entry_and_watermark(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = SyncJournal(str(path))
+    journal.start()
+    journal.record("a", "create", "page-a", "fp-a1")
+    journal.record_watermark("2024-01-01 10:00:00")
+    journal.record("a", "update", "page-a", "fp-a2")
+    journal.record("b", "archive", "page-b")
+    journal.record_watermark("2024-01-01 10:05:00")
+    # 进程被终止时最后一行只写了一半
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"slug": "c", "action": "cre')
+
+    entries, committed_updated_at = SyncJournal(str(path)).recover()
+
+    assert committed_updated_at == "2024-01-01 10:05:00"
+    assert set(entries) == {"a", "b"}
+    assert entries["a"]["action"] == "update"
+    assert entries["a"]["fingerprint"] == "fp-a2"
+    assert entries["b"]["action"] == "archive"
+
+
+def test_start_clears_old_journal_and_finish_removes_it(tmp_path):
+    path = tmp_path / "state" / "journal.jsonl"
+    journal = SyncJournal(str(path))
+    journal.start()
+    journal.record("a", "create", "page-a", "fp-a")
+    journal.start()
+    assert journal.recover() == ({}, None)
+    journal.finish()
+    assert not os.path.exists(path)
+    # 结束后的写入被忽略
+    journal.record("b", "create", "page-b", "fp-b")
+    assert not os.path.exists(path)
+
+
+def test_resume_merges_entries_into_state(engine):
+    engine.sync_state.set_page("gone", "page-gone")
+    engine.journal.start()
+    engine.journal.record("a", "create", "page-a", "fp-a")
+    engine.journal.record("gone", "archive", "page-gone")
+    engine.journal.record("seeded", "seed", "page-s", "fp-s")
+    engine.journal.record_watermark("2024-01-01 10:00:00")
+
+    assert engine._resume_from_journal()
+
+    assert engine.sync_state.get_page_id("a") == "page-a"
+    assert engine.sync_state.get_fingerprint("a") == "fp-a"
+    assert engine.sync_state.get_page_id("gone") is None
+    assert engine.sync_state.get_fingerprint("seeded") == "fp-s"
+    assert engine.resumed == {"a": "fp-a"}
+
+
+def test_resume_keeps_journal_when_save_fails(engine, monkeypatch):
+    engine.journal.start()
+    engine.journal.record("a", "create", "page-a", "fp-a")
+    engine.journal.record_watermark("2024-01-01 10:00:00")
+    before = open(engine.journal.path, encoding="utf-8").read()
+
+    def fail():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(engine.sync_state, "save", fail)
+    engine.flomo_api = FakeFlomoApi([make_memo("b", NOW)])
+    engine.sync_to_notion()
+
+    # 没有开始新的运行，日志仍是上次运行结果的唯一记录
+    assert open(engine.journal.path, encoding="utf-8").read() == before
+    assert engine.notion_helper.client.calls == []
+
+
+def test_interrupted_run_resumes_without_duplicates(make_engine, monkeypatch):
+    monkeypatch.setattr(flomo2notion, "SYNC_CONCURRENCY", 4)
+    memos = [make_memo(f"s{index:03d}", NOW - 3600 + index) for index in range(120)]
+    notion = CrashingNotion(crash_slugs={"s060"})
+
+    engine = make_engine(notion)
+    engine.flomo_api = FakeFlomoApi(memos)
+    with pytest.raises(Crash):
+        engine.sync_to_notion()
+    assert os.path.exists(engine.journal.path)
+    created = len(notion.pages_data)
+    assert 0 < created < len(memos)
+
+    notion.crash_slugs.clear()
+    engine = make_engine(notion)
+    engine.flomo_api = FakeFlomoApi(memos)
+    engine.sync_to_notion()
+
+    # 中断前已创建的页面不会重复创建
+    assert not os.path.exists(engine.journal.path)
+    assert len(notion.pages_data) == len(memos)
+    assert notion.calls.count("pages.create") == len(memos)
+    assert engine.success_count == len(memos) - created
+    assert engine.sync_state.get_watermark() == str(beijing_time_to_timestamp(memos[-1]["updated_at"]) - 1)
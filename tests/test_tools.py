@@ -0,0 +1,94 @@
+import asyncio
+import threading
+
+import pytest
+
+from notionify.md2notion import Md2NotionUploader
+from tools import AsyncSingleFlight, ContentProcessor
+
+
+def test_single_flight_shares_result():
+    async def run():
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "upload-id"
+
+        results = await asyncio.gather(*(flight.do("url", fetch) for _ in range(5)))
+        return results, calls
+
+    results, calls = asyncio.run(run())
+    assert results == ["upload-id"] * 5
+    assert len(calls) == 1
+
+
+def test_single_flight_waiter_retries_when_owner_cancelled():
+    async def run():
+        flight = AsyncSingleFlight()
+        started = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            started.set()
+            await asyncio.sleep(0.05)
+            return "upload-id"
+
+        owner = asyncio.create_task(flight.do("url", fetch))
+        await started.wait()
+        waiter = asyncio.create_task(flight.do("url", fetch))
+        await asyncio.sleep(0)
+        owner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        # 等待方不受执行方取消的影响，自己重新执行
+        return await waiter, calls
+
+    result, calls = asyncio.run(run())
+    assert result == "upload-id"
+    assert len(calls) == 2
+
+
+def test_single_flight_cancelled_waiter_leaves_owner_running():
+    async def run():
+        flight = AsyncSingleFlight()
+        started = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await asyncio.sleep(0.05)
+            return "upload-id"
+
+        owner = asyncio.create_task(flight.do("url", fetch))
+        await started.wait()
+        waiter = asyncio.create_task(flight.do("url", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await owner
+
+    assert asyncio.run(run()) == "upload-id"
+
+
+def test_process_content_async_builds_content_off_the_event_loop():
+    class Images:
+        async def process_images(self, files):
+            return []
+
+    class Processor(ContentProcessor):
+        def build_content(self, memo, images):
+            self.thread = threading.current_thread()
+            return super().build_content(memo, images)
+
+    processor = Processor(None, Md2NotionUploader(), converter="html")
+    memo = {"slug": "a", "content": "<p>hello <strong>world</strong></p>", "files": []}
+    blocks, content_text, image_files = asyncio.run(processor.process_content_async(memo, Images()))
+
+    assert processor.thread is not threading.main_thread()
+    assert "paragraph" in blocks[0]
+    assert "hello" in content_text
+    assert image_files == []
@@ -1,54 +1,26 @@
-import requests
-import json
+import asyncio
 import os
 import mimetypes
 import time
 import html2text
-from config import get_logger, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+import tempfile
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, Future
+from config import (
+    get_logger, TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, IMAGE_SPOOL_MAX_MEMORY, IMAGE_CONCURRENCY, CONTENT_CONVERTER,
+    NOTION_MULTIPART_THRESHOLD, NOTION_UPLOAD_PART_SIZE, NOTION_UPLOAD_PART_CONCURRENCY, NOTION_UPLOAD_PART_RETRIES
+)
+from http_client import get_session, MultipartFile, FileSlice
+from notionify.notion_http import notion_request, notion_request_async
+from notionify.html2block import html_to_blocks, text_block, external_image_block, CONVERTER_VERSION
+from notionify.md2notion import RENDER_VERSION
+from render_cache import render_key
 from markdownify import markdownify
+from utils import iso_to_timestamp, strip_url_query
 
 logger = get_logger(__name__)
 
-def split_long_text(text, max_length=1900):
-    """
-    将长文本分割成多个小块，每个块不超过指定的最大长度
-    
-    Args:
-        text (str): 要分割的文本
-        max_length (int): 每个块的最大长度，默认为1900（留出一些余量）
-        
-    Returns:
-        list: 分割后的文本块列表
-    """
-    if not text or len(text) <= max_length:
-        return [text]
-        
-    chunks = []
-    current_pos = 0
-    text_length = len(text)
-    
-    while current_pos < text_length:
-        # 如果剩余文本长度小于等于最大长度，直接添加
-        if current_pos + max_length >= text_length:
-            chunks.append(text[current_pos:])
-            break
-            
-        # 尝试在最大长度位置附近找到一个合适的分割点（如句号、换行符等）
-        end_pos = current_pos + max_length
-        
-        # 优先在句号、问号、感叹号、换行符处分割
-        for char in ['\n', '。', '！', '？', '.', '!', '?']:
-            last_char_pos = text.rfind(char, current_pos, end_pos)
-            if last_char_pos != -1 and last_char_pos > current_pos:
-                end_pos = last_char_pos + 1
-                break
-                
-        # 如果没找到合适的分割点，就在最大长度处直接分割
-        chunks.append(text[current_pos:end_pos])
-        current_pos = end_pos
-        
-    return chunks
-
 def clean_backticks(text):
     """彻底清理字符串中的所有反引号和多余空格"""
     if not text:
@@ -97,7 +69,7 @@ def send_telegram_notification(message):
         }
         
         # 发送请求
-        response = requests.post(url, data=data)
+        response = get_session().post(url, data=data)
         
         # 检查响应
         if response.status_code == 200:
@@ -107,17 +79,192 @@ def send_telegram_notification(message):
     except Exception as e:
         logger.error(f"❌ Telegram 通知发送异常: {str(e)}", exc_info=True)
 
-def is_valid_url(url):
-    """检查URL是否有效"""
-    try:
-        response = requests.head(url, allow_redirects=True)
-        return response.status_code == 200
-    except requests.RequestException:
+# 下载图片时每次读取的字节数
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+def is_image_response(status_code, headers):
+    """根据下载请求的状态码和响应头判断是否拿到了图片（而不是错误页面）"""
+    if status_code != 200:
         return False
+    content_type = headers.get('Content-Type') or ''
+    return not content_type.startswith('text/')
+
+def image_content_type(content_type, image_url):
+    """确定图片的内容类型：优先使用响应头，其次从 URL 猜测，默认为 PNG"""
+    if not content_type or content_type == 'application/octet-stream':
+        # 尝试从 URL 猜测内容类型
+        content_type, _ = mimetypes.guess_type(image_url)
+        if not content_type:
+            # 默认为 PNG
+            content_type = 'image/png'
+    return content_type
+
+# 所有记录共享的线程池，按需创建
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_shared_executor(name, max_workers):
+    """获取指定名称的共享线程池，同名的调用方共用同一组线程"""
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        return _executors[name]
+
+def get_image_executor():
+    """获取处理图片的共享线程池，同时处理的图片数不超过 IMAGE_CONCURRENCY"""
+    return get_shared_executor("image", IMAGE_CONCURRENCY)
+
+def get_upload_part_executor():
+    """
+    获取上传分片的共享线程池；与图片线程池分开，图片线程等待分片完成时不会占满自己的线程池
+    """
+    return get_shared_executor("upload-part", NOTION_UPLOAD_PART_CONCURRENCY)
+
+def file_size(fileobj):
+    """获取可 seek 的文件对象的大小，并回到开头"""
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+def split_upload_parts(size, part_size=NOTION_UPLOAD_PART_SIZE):
+    """
+    把文件切分为分片
+
+    Returns:
+        list: (part_number, offset, length) 列表，part_number 从 1 开始
+    """
+    return [
+        (index + 1, offset, min(part_size, size - offset))
+        for index, offset in enumerate(range(0, size, part_size))
+    ]
+
+class SingleFlight:
+    """同一个键同时只执行一次，执行期间其他线程的调用等待并复用同一个结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        执行 fn 并返回结果；同一个键已有线程在执行时，等待其完成并返回相同的结果（或异常）
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            owner = future is None
+            if owner:
+                future = self._calls[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+class AsyncSingleFlight:
+    """SingleFlight 的协程版本"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """
+        执行协程函数 fn 并返回结果；同一个键已在执行时等待其完成并返回相同的结果
+
+        执行的协程被取消时，等待方不会跟着被取消，而是由其中一个重新执行 fn
+        """
+        future = self._calls.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # 等待方自己被取消
+                    raise
+            future = self._calls.get(key)
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await fn()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有其他调用方等待时避免 "exception was never retrieved" 警告
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+def _write_chunk(spool, digest, chunk):
+    """把下载的一块内容写入临时文件并更新摘要"""
+    spool.write(chunk)
+    digest.update(chunk)
+
+
+def memo_image_files(memo):
+    """记录中带 URL 的图片文件，保持原有顺序"""
+    return [file for file in memo.get('files') or [] if file.get('url')]
 
 class ImageProcessor:
-    def __init__(self, notion_helper):
+    def __init__(self, notion_helper, image_cache=None, image_optimizer=None):
         self.notion_helper = notion_helper
+        self.image_cache = image_cache
+        # 可选的图片优化器（ImageOptimizer），上传前缩小并重新编码图片
+        self.image_optimizer = image_optimizer
+        # 同一个 URL 或同一份内容同时只处理一次，其他记录等待并复用结果
+        self._inflight = SingleFlight()
+
+    def _cached_upload(self, clean_url):
+        """命中图片缓存时返回可复用的 file_upload ID"""
+        if self.image_cache is None:
+            return None
+        file_upload_id = self.image_cache.get(clean_url)
+        if file_upload_id:
+            logger.debug(f"♻️ 复用已上传的图片: {file_upload_id}")
+        return file_upload_id
+
+    def _cached_content(self, digest):
+        """已上传过相同内容的图片时返回可复用的 {"id", "expiry_time"}"""
+        if self.image_cache is None:
+            return None
+        upload = self.image_cache.get_by_digest(digest)
+        if upload:
+            logger.debug(f"♻️ 复用相同内容的图片: {upload['id']}")
+        return upload
+
+    def _remember_upload(self, image_url, upload, digest=None):
+        """把上传完成（或按内容复用）的文件写入图片缓存"""
+        if self.image_cache is not None:
+            self.image_cache.put(image_url, upload['id'], upload.get('expiry_time'), digest)
+
+    def process_images(self, files):
+        """
+        并发处理一条记录的所有图片，下载和上传在共享线程池中进行
+
+        Args:
+            files (list): 图片文件列表，每项包含 url 和 name
+
+        Returns:
+            list: 与 files 顺序一致的 (file_upload_id, clean_url, clean_name) 列表
+        """
+        if len(files) <= 1 or IMAGE_CONCURRENCY <= 1:
+            return [self.process_image(file['url'], file.get('name', '图片')) for file in files]
+        executor = get_image_executor()
+        futures = [executor.submit(self.process_image, file['url'], file.get('name', '图片')) for file in files]
+        return [future.result() for future in futures]
         
     def process_image(self, image_url, image_name="图片"):
         """
@@ -133,12 +280,12 @@ class ImageProcessor:
         try:
             clean_url = clean_backticks(image_url)
             clean_name = clean_backticks(image_name)
-            
-            if not is_valid_url(clean_url):
-                logger.debug(f"⚠️ 图片链接无效: {clean_url}")
-                return None, clean_url, clean_name
-                
-            file_upload_id = self.upload_image_to_notion(clean_url, clean_name)
+
+            # 命中缓存时跳过下载和上传；链接是否有效由下载请求的响应判断，无效时退化为外链图片
+            file_upload_id = self._inflight.do(
+                ("url", strip_url_query(clean_url)),
+                lambda: self._cached_upload(clean_url) or self.upload_image_to_notion(clean_url, clean_name)
+            )
             if file_upload_id:
                 logger.debug(f"✅ 图片上传成功，ID: {file_upload_id}")
                 return file_upload_id, clean_url, clean_name
@@ -150,9 +297,185 @@ class ImageProcessor:
             logger.error(f"❌ 图片处理失败: {str(e)}", exc_info=True)
             return None, clean_url, clean_name
             
+    def download_image(self, image_url):
+        """
+        下载图片到临时文件，只发一次 GET 请求，根据响应的状态码和响应头判断链接是否有效；
+        内存中最多缓存 IMAGE_SPOOL_MAX_MEMORY 字节，更大的图片写入磁盘，下载的同时计算内容摘要
+
+        Args:
+            image_url (str): 图片的 URL
+
+        Returns:
+            tuple: (临时文件, 内容类型, SHA-256 摘要)，链接无效时返回 (None, None, None)
+        """
+        logger.debug(f"🔄 开始从 URL 下载图片: {image_url}")
+        response = get_session().get(image_url, stream=True)
+        try:
+            if not is_image_response(response.status_code, response.headers):
+                logger.debug(f"⚠️ 图片链接无效: {image_url} ({response.status_code})")
+                return None, None, None
+            # 尝试从 URL 或响应头获取内容类型
+            content_type = image_content_type(response.headers.get('Content-Type'), image_url)
+            spool = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_MEMORY)
+            digest = hashlib.sha256()
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                spool.write(chunk)
+                digest.update(chunk)
+            spool.seek(0)
+            return spool, content_type, digest.hexdigest()
+        finally:
+            response.close()
+
+    def upload_file(self, fileobj, filename, content_type):
+        """
+        使用 Notion 的文件上传 API 上传文件，请求体从文件对象中按块读取；
+        超过 NOTION_MULTIPART_THRESHOLD 的文件使用分片上传
+
+        Args:
+            fileobj: 可 seek 的文件对象
+            filename (str): 文件名
+            content_type (str): 内容类型
+
+        Returns:
+            dict: 上传完成的文件上传对象，失败则返回 None
+        """
+        size = file_size(fileobj)
+        if size > NOTION_MULTIPART_THRESHOLD:
+            return self.upload_file_multi_part(fileobj, size, filename, content_type)
+
+        # 1. 创建文件上传对象
+        file_upload_id = self.create_file_upload(filename, content_type)
+        if file_upload_id is None:
+            return None
+
+        # 2. 上传文件内容
+        logger.debug(f"📤 开始上传文件内容")
+        upload_response = self.send_file_content(file_upload_id, fileobj, filename, content_type)
+        if upload_response.status_code != 200:
+            logger.error(f"❌ 上传文件内容失败: {upload_response.status_code} - {upload_response.text}")
+            return None
+        logger.debug(f"✅ 文件内容上传成功")
+        return upload_response.json()
+
+    def create_file_upload(self, filename, content_type, number_of_parts=None):
+        """
+        创建文件上传对象
+
+        Args:
+            filename (str): 文件名
+            content_type (str): 内容类型
+            number_of_parts (int): 分片数量，为 None 时创建单次上传
+
+        Returns:
+            str: 文件上传对象的 ID，失败则返回 None
+        """
+        logger.debug(f"📤 创建 Notion 文件上传对象")
+        payload = {
+            "filename": filename,
+            "content_type": content_type
+        }
+        if number_of_parts:
+            payload.update(mode="multi_part", number_of_parts=number_of_parts)
+        file_create_response = notion_request("POST", "/file_uploads", json=payload)
+        if file_create_response.status_code != 200:
+            logger.error(f"❌ 创建文件上传对象失败: {file_create_response.status_code} - {file_create_response.text}")
+            return None
+        file_upload_id = file_create_response.json()['id']
+        logger.debug(f"✅ 文件上传对象创建成功，ID: {file_upload_id}")
+        return file_upload_id
+
+    def send_file_content(self, file_upload_id, fileobj, filename, content_type, part_number=None):
+        """
+        发送文件内容（或其中一个分片）
+
+        Returns:
+            requests.Response: 响应
+        """
+        fields = {"part_number": part_number} if part_number else None
+        body = MultipartFile("file", filename, fileobj, content_type, fields=fields)
+        return notion_request(
+            "POST", f"/file_uploads/{file_upload_id}/send",
+            data=body, headers={"Content-Type": body.content_type},
+        )
+
+    def _send_part(self, file_upload_id, part, filename, content_type):
+        """发送一个分片，返回是否成功；失败时不抛出异常，由调用方重新上传"""
+        part_number = part[0]
+        try:
+            response = self.send_file_content(file_upload_id, part[3], filename, content_type, part_number)
+        except Exception as e:
+            logger.warning(f"⚠️ 分片 {part_number} 上传失败: {str(e)}")
+            return False
+        if response.status_code != 200:
+            logger.warning(f"⚠️ 分片 {part_number} 上传失败: {response.status_code} - {response.text}")
+            return False
+        return True
+
+    def _file_parts(self, fileobj, size):
+        """把文件切分为 (part_number, offset, length, FileSlice) 列表，各分片共享一把读取锁"""
+        lock = threading.Lock()
+        return [
+            (part_number, offset, length, FileSlice(fileobj, offset, length, lock))
+            for part_number, offset, length in split_upload_parts(size)
+        ]
+
+    def upload_file_multi_part(self, fileobj, size, filename, content_type):
+        """
+        分片上传大文件：分片在共享线程池中并发发送，失败的分片单独重新上传，全部成功后完成上传
+
+        Returns:
+            dict: 上传完成的文件上传对象，失败则返回 None
+        """
+        parts = self._file_parts(fileobj, size)
+        logger.debug(f"📤 文件大小 {size} 字节，分 {len(parts)} 片上传")
+        file_upload_id = self.create_file_upload(filename, content_type, number_of_parts=len(parts))
+        if file_upload_id is None:
+            return None
+
+        executor = get_upload_part_executor()
+        pending = parts
+        for attempt in range(NOTION_UPLOAD_PART_RETRIES + 1):
+            if attempt:
+                logger.warning(f"⚠️ 重新上传 {len(pending)} 个失败的分片（第 {attempt} 轮）")
+            futures = [
+                (part, executor.submit(self._send_part, file_upload_id, part, filename, content_type))
+                for part in pending
+            ]
+            pending = [part for part, future in futures if not future.result()]
+            if not pending:
+                break
+        if pending:
+            logger.error(f"❌ 分片上传失败: {[part[0] for part in pending]}")
+            return None
+
+        complete_response = notion_request("POST", f"/file_uploads/{file_upload_id}/complete")
+        if complete_response.status_code != 200:
+            logger.error(f"❌ 完成分片上传失败: {complete_response.status_code} - {complete_response.text}")
+            return None
+        logger.debug(f"✅ 分片上传完成，ID: {file_upload_id}")
+        return complete_response.json()
+
+    def upload_content(self, spool, content_type, image_name, digest):
+        """
+        上传下载好的图片内容；已上传过相同内容时直接复用
+
+        Returns:
+            dict: {"id": file_upload ID, "expiry_time": 过期时间戳}，失败则返回 None
+        """
+        upload = self._cached_content(digest)
+        if upload:
+            return upload
+        fileobj, content_type, filename = spool, content_type, image_name
+        if self.image_optimizer is not None:
+            fileobj, content_type, filename = self.image_optimizer.optimize(spool, content_type, image_name)
+        file_upload = self.upload_file(fileobj, filename, content_type)
+        if file_upload is None:
+            return None
+        return {"id": file_upload['id'], "expiry_time": iso_to_timestamp(file_upload.get('expiry_time'))}
+
     def upload_image_to_notion(self, image_url, image_name="image"):
         """
-        使用 Notion 的新文件上传 API 上传图片
+        使用 Notion 的新文件上传 API 上传图片，内容相同的图片只上传一次
         
         Args:
             image_url (str): 图片的 URL
@@ -162,69 +485,18 @@ class ImageProcessor:
             str: 上传成功后的文件 ID，失败则返回 None
         """
         try:
-            logger.debug(f"🔄 开始从 URL 下载图片: {image_url}")
-            # 1. 下载图片
-            response = requests.get(image_url, stream=True)
-            if response.status_code != 200:
-                logger.error(f"❌ 下载图片失败: {response.status_code}")
-                return None
-                
-            # 尝试从 URL 或响应头获取内容类型
-            content_type = response.headers.get('Content-Type')
-            if not content_type or content_type == 'application/octet-stream':
-                # 尝试从 URL 猜测内容类型
-                content_type, _ = mimetypes.guess_type(image_url)
-                if not content_type:
-                    # 默认为 PNG
-                    content_type = 'image/png'
-            
-            # 2. 创建文件上传对象
-            logger.debug(f"📤 创建 Notion 文件上传对象")
-            payload = {
-                "filename": image_name,
-                "content_type": content_type
-            }
-            
-            file_create_response = requests.post(
-                "https://api.notion.com/v1/file_uploads", 
-                json=payload, 
-                headers={
-                    "Authorization": f"Bearer {os.getenv('NOTION_TOKEN')}",
-                    "accept": "application/json",
-                    "content-type": "application/json",
-                    "Notion-Version": "2022-06-28"
-                }
-            )
-            
-            if file_create_response.status_code != 200:
-                logger.error(f"❌ 创建文件上传对象失败: {file_create_response.status_code} - {file_create_response.text}")
+            spool, content_type, digest = self.download_image(image_url)
+            if spool is None:
                 return None
-                
-            file_upload_data = json.loads(file_create_response.text)
-            file_upload_id = file_upload_data['id']
-            logger.debug(f"✅ 文件上传对象创建成功，ID: {file_upload_id}")
-            
-            # 3. 上传文件内容
-            logger.debug(f"📤 开始上传文件内容")
-            files = {
-                "file": (image_name, response.content, content_type)
-            }
-            
-            upload_response = requests.post(
-                f"https://api.notion.com/v1/file_uploads/{file_upload_id}/send",
-                headers={
-                    "Authorization": f"Bearer {os.getenv('NOTION_TOKEN')}",
-                    "Notion-Version": "2022-06-28"
-                },
-                files=files
-            )
-            
-            if upload_response.status_code != 200:
-                logger.error(f"❌ 上传文件内容失败: {upload_response.status_code} - {upload_response.text}")
+            with spool:
+                upload = self._inflight.do(
+                    ("digest", digest),
+                    lambda: self.upload_content(spool, content_type, image_name, digest)
+                )
+            if upload is None:
                 return None
-                
-            logger.debug(f"✅ 文件内容上传成功")
-            return file_upload_id
+            self._remember_upload(image_url, upload, digest)
+            return upload['id']
             
         except Exception as e:
             logger.error(f"❌ 上传图片到 Notion 失败: {str(e)}", exc_info=True)
@@ -262,135 +534,362 @@ class ImageProcessor:
                 }
             }]
 
+class AsyncImageProcessor(ImageProcessor):
+    """ImageProcessor 的异步版本，图片下载和上传都在事件循环中进行"""
+
+    def __init__(self, notion_helper, http_client, image_cache=None, image_optimizer=None):
+        """
+        Args:
+            notion_helper (AsyncNotionHelper): 异步 Notion 客户端
+            http_client (httpx.AsyncClient): 下载图片使用的客户端
+            image_cache (ImageCache): 图片上传缓存
+            image_optimizer (ImageOptimizer): 可选的图片优化器
+        """
+        super().__init__(notion_helper, image_cache, image_optimizer)
+        self.http_client = http_client
+        self._inflight = AsyncSingleFlight()
+        # 与同步版本的共享线程池一样，限制所有记录同时处理的图片数
+        self._semaphore = asyncio.Semaphore(IMAGE_CONCURRENCY)
+
+    async def process_images(self, files):
+        """
+        process_images 的异步版本，并发处理一条记录的所有图片
+
+        Returns:
+            list: 与 files 顺序一致的 (file_upload_id, clean_url, clean_name) 列表
+        """
+        async def process(file):
+            async with self._semaphore:
+                return await self.process_image(file['url'], file.get('name', '图片'))
+
+        return list(await asyncio.gather(*(process(file) for file in files)))
+
+    async def process_image(self, image_url, image_name="图片"):
+        """
+        处理单个图片，链接无效或上传失败时返回 None 作为 file_upload_id，由调用方退化为外链图片
+
+        Returns:
+            tuple: (file_upload_id, clean_url, clean_name)
+        """
+        clean_url = clean_backticks(image_url)
+        clean_name = clean_backticks(image_name)
+
+        async def fetch():
+            return self._cached_upload(clean_url) or await self.upload_image_to_notion(clean_url, clean_name)
+
+        try:
+            file_upload_id = await self._inflight.do(("url", strip_url_query(clean_url)), fetch)
+            if file_upload_id:
+                logger.debug(f"✅ 图片上传成功，ID: {file_upload_id}")
+            else:
+                logger.debug(f"⚠️ 图片上传失败，使用原始URL")
+            return file_upload_id, clean_url, clean_name
+        except Exception as e:
+            logger.error(f"❌ 图片处理失败: {str(e)}", exc_info=True)
+            return None, clean_url, clean_name
+
+    async def download_image(self, image_url):
+        """
+        download_image 的异步版本
+
+        Returns:
+            tuple: (临时文件, 内容类型, SHA-256 摘要)，链接无效时返回 (None, None, None)
+        """
+        logger.debug(f"🔄 开始从 URL 下载图片: {image_url}")
+        async with self.http_client.stream("GET", image_url, follow_redirects=True) as response:
+            if not is_image_response(response.status_code, response.headers):
+                logger.debug(f"⚠️ 图片链接无效: {image_url} ({response.status_code})")
+                return None, None, None
+            content_type = image_content_type(response.headers.get('Content-Type'), image_url)
+            spool = tempfile.SpooledTemporaryFile(max_size=IMAGE_SPOOL_MAX_MEMORY)
+            digest = hashlib.sha256()
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                # 超出内存上限后写入的是磁盘文件，写入和摘要计算放到线程中执行
+                await asyncio.to_thread(_write_chunk, spool, digest, chunk)
+            spool.seek(0)
+            return spool, content_type, digest.hexdigest()
+
+    async def upload_file(self, fileobj, filename, content_type):
+        """
+        upload_file 的异步版本，httpx 按块读取文件对象发送；超过 NOTION_MULTIPART_THRESHOLD 的文件使用分片上传
+
+        Returns:
+            dict: 上传完成的文件上传对象，失败则返回 None
+        """
+        size = file_size(fileobj)
+        if size > NOTION_MULTIPART_THRESHOLD:
+            return await self.upload_file_multi_part(fileobj, size, filename, content_type)
+
+        file_upload_id = await self.create_file_upload(filename, content_type)
+        if file_upload_id is None:
+            return None
+        upload_response = await self.send_file_content(file_upload_id, fileobj, filename, content_type)
+        if upload_response.status_code != 200:
+            logger.error(f"❌ 上传文件内容失败: {upload_response.status_code} - {upload_response.text}")
+            return None
+        return upload_response.json()
+
+    async def create_file_upload(self, filename, content_type, number_of_parts=None):
+        """create_file_upload 的异步版本，返回文件上传对象的 ID，失败则返回 None"""
+        payload = {"filename": filename, "content_type": content_type}
+        if number_of_parts:
+            payload.update(mode="multi_part", number_of_parts=number_of_parts)
+        file_create_response = await notion_request_async(
+            self.notion_helper.http_client, "POST", "/file_uploads", json=payload
+        )
+        if file_create_response.status_code != 200:
+            logger.error(f"❌ 创建文件上传对象失败: {file_create_response.status_code} - {file_create_response.text}")
+            return None
+        return file_create_response.json()['id']
+
+    async def send_file_content(self, file_upload_id, fileobj, filename, content_type, part_number=None):
+        """send_file_content 的异步版本"""
+        data = {"part_number": str(part_number)} if part_number else None
+        return await notion_request_async(
+            self.notion_helper.http_client, "POST", f"/file_uploads/{file_upload_id}/send",
+            data=data, files={"file": (filename, fileobj, content_type)},
+        )
+
+    async def _send_part(self, file_upload_id, part, filename, content_type):
+        """发送一个分片，返回是否成功"""
+        part_number = part[0]
+        try:
+            response = await self.send_file_content(file_upload_id, part[3], filename, content_type, part_number)
+        except Exception as e:
+            logger.warning(f"⚠️ 分片 {part_number} 上传失败: {str(e)}")
+            return False
+        if response.status_code != 200:
+            logger.warning(f"⚠️ 分片 {part_number} 上传失败: {response.status_code} - {response.text}")
+            return False
+        return True
+
+    async def upload_file_multi_part(self, fileobj, size, filename, content_type):
+        """
+        upload_file_multi_part 的异步版本，同时发送的分片数不超过 NOTION_UPLOAD_PART_CONCURRENCY
+
+        Returns:
+            dict: 上传完成的文件上传对象，失败则返回 None
+        """
+        parts = self._file_parts(fileobj, size)
+        logger.debug(f"📤 文件大小 {size} 字节，分 {len(parts)} 片上传")
+        file_upload_id = await self.create_file_upload(filename, content_type, number_of_parts=len(parts))
+        if file_upload_id is None:
+            return None
+
+        semaphore = asyncio.Semaphore(NOTION_UPLOAD_PART_CONCURRENCY)
+
+        async def send(part):
+            async with semaphore:
+                return await self._send_part(file_upload_id, part, filename, content_type)
+
+        pending = parts
+        for attempt in range(NOTION_UPLOAD_PART_RETRIES + 1):
+            if attempt:
+                logger.warning(f"⚠️ 重新上传 {len(pending)} 个失败的分片（第 {attempt} 轮）")
+            results = await asyncio.gather(*(send(part) for part in pending))
+            pending = [part for part, ok in zip(pending, results) if not ok]
+            if not pending:
+                break
+        if pending:
+            logger.error(f"❌ 分片上传失败: {[part[0] for part in pending]}")
+            return None
+
+        complete_response = await notion_request_async(
+            self.notion_helper.http_client, "POST", f"/file_uploads/{file_upload_id}/complete"
+        )
+        if complete_response.status_code != 200:
+            logger.error(f"❌ 完成分片上传失败: {complete_response.status_code} - {complete_response.text}")
+            return None
+        return complete_response.json()
+
+    async def upload_image_to_notion(self, image_url, image_name="image"):
+        """
+        下载图片并通过文件上传 API 上传到 Notion，下载的响应同时用于判断链接是否有效；内容相同的图片只上传一次
+
+        Returns:
+            str: 上传成功后的文件 ID，失败则返回 None
+        """
+        spool, content_type, digest = await self.download_image(image_url)
+        if spool is None:
+            return None
+        with spool:
+            upload = await self._inflight.do(
+                ("digest", digest), lambda: self.upload_content(spool, content_type, image_name, digest)
+            )
+        if upload is None:
+            return None
+        self._remember_upload(image_url, upload, digest)
+        return upload['id']
+
+    async def upload_content(self, spool, content_type, image_name, digest):
+        """upload_content 的异步版本"""
+        upload = self._cached_content(digest)
+        if upload:
+            return upload
+        fileobj, content_type, filename = spool, content_type, image_name
+        if self.image_optimizer is not None:
+            fileobj, content_type, filename = await self.image_optimizer.optimize_async(
+                spool, content_type, image_name
+            )
+        file_upload = await self.upload_file(fileobj, filename, content_type)
+        if file_upload is None:
+            return None
+        return {"id": file_upload['id'], "expiry_time": iso_to_timestamp(file_upload.get('expiry_time'))}
+
 class ContentProcessor:
-    def __init__(self, notion_helper, uploader):
+    def __init__(self, notion_helper, uploader, converter=CONTENT_CONVERTER, render_cache=None):
+        """
+        Args:
+            notion_helper: Notion 客户端
+            uploader (Md2NotionUploader): 块渲染和上传
+            converter (str): 内容转换方式，html 直接转换为 Notion 块，markdown 经 Markdown 中转
+            render_cache (RenderCache): 转换缓存，为 None 时每次都重新转换
+        """
         self.notion_helper = notion_helper
         self.uploader = uploader
+        self.converter = converter
+        self.render_cache = render_cache
+
+    def _render(self, converter, version, source, render):
+        """转换内容，有转换缓存时相同的内容只转换一次"""
+        if self.render_cache is None:
+            return render()
+        return self.render_cache.get_or_render(render_key(converter, version, source), render)
         
     def process_content(self, memo, image_processor):
         """
-        处理备忘录内容，包括文本和图片
+        处理备忘录内容，包括文本和图片，同一条记录的图片并发下载和上传
         
         Args:
             memo (dict): 备忘录数据
             image_processor (ImageProcessor): 图片处理器实例
             
         Returns:
-            tuple: (content_md, content_text, image_files)
+            tuple: (content, content_text, image_files)，content 为 Markdown（markdown 转换）或 Notion 块列表（html 转换）
         """
+        images = image_processor.process_images(memo_image_files(memo))
+        return self.build_content(memo, images)
+
+    async def process_content_async(self, memo, image_processor):
+        """
+        process_content 的异步版本，同一条记录的图片并发处理
+
+        Args:
+            memo (dict): 备忘录数据
+            image_processor (AsyncImageProcessor): 异步图片处理器实例
+
+        Returns:
+            tuple: (content, content_text, image_files)
+        """
+        images = await image_processor.process_images(memo_image_files(memo))
+        # HTML/Markdown 的解析和转换缓存的磁盘读取都是阻塞操作，放到线程中执行
+        return await asyncio.to_thread(self.build_content, memo, images)
+
+    def build_content(self, memo, images):
+        """
+        根据备忘录和已处理的图片生成内容
+
+        Args:
+            memo (dict): 备忘录数据
+            images (list): 按附件顺序排列的 (file_upload_id, clean_url, clean_name)
+
+        Returns:
+            tuple: (content, content_text, image_files)
+        """
+        if self.converter == "html":
+            return self._process_html_content(memo, images)
         # 处理 None 内容
         if memo['content'] is None:
-            return self._process_empty_content(memo, image_processor)
+            return self._process_empty_content(memo, images)
         else:
-            return self._process_text_content(memo, image_processor)
+            return self._process_text_content(memo, images)
+
+    @staticmethod
+    def _collect_images(images, content_md):
+        """上传成功的图片作为图片块，失败的退化为 Markdown 外链"""
+        image_files = []
+        for file_upload_id, clean_url, clean_name in images:
+            if file_upload_id:
+                image_files.append({
+                    "url": clean_url,
+                    "name": clean_name,
+                    "file_upload_id": file_upload_id
+                })
+            else:
+                content_md += f"![{clean_name}]({clean_url})\n\n"
+        return content_md, image_files
             
-    def _process_empty_content(self, memo, image_processor):
+    def _process_empty_content(self, memo, images):
         """处理空内容的情况"""
         if memo.get('files') and len(memo['files']) > 0:
             content_md = "# 图片备忘录\n\n"
-            image_files = []
             logger.debug(f"📷 发现 {len(memo['files'])} 个图片文件")
-            
-            for i, file in enumerate(memo['files']):
-                if file.get('url'):
-                    file_upload_id, clean_url, clean_name = image_processor.process_image(
-                        file['url'], 
-                        file.get('name', '图片')
-                    )
-                    if file_upload_id:
-                        image_files.append({
-                            "url": clean_url,
-                            "name": clean_name,
-                            "file_upload_id": file_upload_id
-                        })
-                    else:
-                        content_md += f"![{clean_name}]({clean_url})\n\n"
-                        
+            content_md, image_files = self._collect_images(images, content_md)
             return content_md, content_md, image_files
         else:
             return "", "", []
             
-    def _process_text_content(self, memo, image_processor):
+    def _process_text_content(self, memo, images):
         """处理文本内容的情况"""
-        content_md = markdownify(memo['content'])
-        content_text = html2text.html2text(memo['content'])
+        content_md, content_text = self._render(
+            "markdownify", RENDER_VERSION, memo['content'],
+            lambda: [markdownify(memo['content']), html2text.html2text(memo['content'])]
+        )
         image_files = []
         
         if memo.get('files') and len(memo['files']) > 0:
             content_md += "\n\n# 附带图片\n\n"
             logger.debug(f"📷 发现文本+图片混合内容，图片数量: {len(memo['files'])}")
-            
-            for i, file in enumerate(memo['files']):
-                if file.get('url'):
-                    file_upload_id, clean_url, clean_name = image_processor.process_image(
-                        file['url'], 
-                        file.get('name', '图片')
-                    )
-                    if file_upload_id:
-                        image_files.append({
-                            "url": clean_url,
-                            "name": clean_name,
-                            "file_upload_id": file_upload_id
-                        })
-                    else:
-                        content_md += f"![{clean_name}]({clean_url})\n\n"
+            content_md, image_files = self._collect_images(images, content_md)
                         
         return content_md, content_text, image_files
-        
-    def upload_content(self, content_md, page_id):
-        """
-        上传内容到Notion页面
-        
-        Args:
-            content_md (str): Markdown格式的内容
-            page_id (str): Notion页面ID
-        """
-        if len(content_md) > 2000:
-            logger.debug(f"📏 内容超过2000字符，需要分割")
-            content_chunks = split_long_text(content_md)
-            logger.debug(f"📏 内容已分割为 {len(content_chunks)} 块")
-            
-            for i, chunk in enumerate(content_chunks):
-                logger.debug(f"📤 上传内容块 {i+1}/{len(content_chunks)} 预览: {chunk[:10]}...")
-                try:
-                    self.uploader.uploadSingleFileContent(self.notion_helper.client, chunk, page_id)
-                    logger.debug(f"✅ 内容块 {i+1} 上传成功")
-                except Exception as e:
-                    logger.error(f"❌ 内容块 {i+1} 上传失败: {str(e)}", exc_info=True)
+
+    def _process_html_content(self, memo, images):
+        """把 HTML 直接转换为 Notion 块，图片的处理方式与 Markdown 转换相同"""
+        if memo['content'] is None:
+            if not memo.get('files'):
+                return [], "", []
+            # 标题与 Markdown 转换保持一致
+            content_md, image_files = self._collect_images(images, "# 图片备忘录\n\n")
+            blocks = [text_block("heading_1", "图片备忘录")]
+            content_text = content_md
         else:
-            logger.debug(f"📤 上传完整内容预览: {content_md[:10]}...")
-            try:
-                self.uploader.uploadSingleFileContent(self.notion_helper.client, content_md, page_id)
-                logger.debug("✅ 内容上传成功")
-            except Exception as e:
-                logger.error(f"❌ 内容上传失败: {str(e)}", exc_info=True)
-                
-    def upload_images(self, image_files, page_id, image_processor):
-        """
-        上传图片到Notion页面
+            blocks, content_text = self._render(
+                "html", CONVERTER_VERSION, memo['content'], lambda: html_to_blocks(memo['content'])
+            )
+            if not memo.get('files'):
+                return blocks, content_text, []
+            logger.debug(f"📷 发现文本+图片混合内容，图片数量: {len(memo['files'])}")
+            _, image_files = self._collect_images(images, "")
+            blocks.append(text_block("heading_1", "附带图片"))
+        # 上传失败的图片退化为外链图片块
+        blocks.extend(
+            external_image_block(clean_url) for file_upload_id, clean_url, _ in images if not file_upload_id
+        )
+        return blocks, content_text, image_files
         
+    def render_blocks(self, content_md, image_files, image_processor):
+        """
+        将内容和图片渲染为 Notion 块列表，不发出任何请求
+
         Args:
-            image_files (list): 图片文件列表
-            page_id (str): Notion页面ID
+            content_md (str|list): Markdown格式的内容，或 html 转换已经生成的块列表
+            image_files (list): 已上传的图片文件列表
             image_processor (ImageProcessor): 图片处理器实例
+
+        Returns:
+            list: Notion 块列表
         """
-        if not image_files:
-            return
-            
-        logger.debug(f"📤 开始添加 {len(image_files)} 个图片块")
-        for i, img in enumerate(image_files):
-            try:
-                image_block = image_processor.create_image_block(
-                    img.get('file_upload_id'),
-                    img['url']
-                )
-                self.notion_helper.client.blocks.children.append(
-                    block_id=page_id, 
-                    children=image_block
-                )
-                logger.debug(f"✅ 图片块 {i+1} 添加成功")
-            except Exception as e:
-                logger.error(f"❌ 图片块 {i+1} 添加失败: {str(e)}", exc_info=True)
+        if isinstance(content_md, list):
+            blocks = list(self.uploader.splitLongBlocks(content_md))
+        elif content_md:
+            blocks = self._render("markdown", RENDER_VERSION, content_md, lambda: self.uploader.renderContent(content_md))
+        else:
+            blocks = []
+        for img in image_files or []:
+            blocks.extend(image_processor.create_image_block(img.get('file_upload_id'), img['url']))
+        return blocks
+
 
 class NotificationProcessor:
     @staticmethod
@@ -438,9 +937,11 @@ class NotificationProcessor:
         )
         
     @staticmethod
-    def format_completion_notification(total, success_count, skip_count, error_count, duration, time_range):
-        """格式化完成同步的通知消息"""
+    def format_completion_notification(total, success_count, skip_count, error_count, duration, time_range,
+                                       image_optimization=None):
+        """格式化完成同步的通知消息，image_optimization 为图片优化的统计说明（未启用时为 None）"""
         beijing_time = NotificationProcessor.get_beijing_time()
+        optimization_line = f"\n  - 图片优化: {image_optimization}" if image_optimization else ""
         
         return f"""
 <b>Flomo 到 Notion 同步完成</b>
@@ -451,7 +952,7 @@ class NotificationProcessor:
   - 跳过记录: {skip_count}
   - 失败记录: {error_count}
   - 耗时: {duration:.2f} 秒
-  - {time_range}
+  - {time_range}{optimization_line}
 
 ✅ 同步完成于 {time.strftime('%Y-%m-%d %H:%M:%S', beijing_time)}
 """
\ No newline at end of file
@@ -1,4 +1,6 @@
 import calendar
+import hashlib
+import json
 import re
 from datetime import datetime, timedelta, timezone
 
@@ -111,4 +113,64 @@ def is_within_n_hours(date_str, n_hours):
     delta = now - date
     
     # 判断是否在n天内（转换为秒进行比较）
-    return delta.total_seconds() <= n_hours * 3600
\ No newline at end of file
+    return delta.total_seconds() <= n_hours * 3600
+
+def beijing_time_to_timestamp(date_str):
+    """
+    将东八区时间字符串转换为秒级时间戳
+
+    Args:
+        date_str (str): 日期字符串，格式为 "YYYY-MM-DD HH:MM:SS"，东八区时间
+
+    Returns:
+        int: 秒级时间戳
+    """
+    date = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+    date = date.replace(tzinfo=timezone(timedelta(hours=8)))
+    return int(date.timestamp())
+
+
+def strip_url_query(url):
+    """去掉 URL 的查询参数（flomo 附件链接带有会过期的签名参数）"""
+    return (url or '').split('?')[0]
+
+
+def iso_to_timestamp(value):
+    """
+    将 Notion 返回的 ISO 8601 时间（如 2025-06-09T20:00:00.000Z）转换为秒级时间戳
+
+    Returns:
+        int: 时间戳，无法解析时返回 None
+    """
+    if not value:
+        return None
+    try:
+        return pendulum.parse(value).int_timestamp
+    except Exception:
+        return None
+
+
+def memo_fingerprint(memo):
+    """
+    计算记录内容的指纹，内容、附件、标签、置顶状态或链接数量任一变化时指纹随之变化
+
+    Args:
+        memo (dict): flomo 记录
+
+    Returns:
+        str: 十六进制的 sha1 摘要
+    """
+    files = []
+    for file in memo.get('files') or []:
+        # 附件 URL 可能带有会过期的签名参数，只取路径部分
+        url = strip_url_query(file.get('url'))
+        files.append([file.get('id'), file.get('name'), file.get('size'), url])
+    payload = {
+        'content': memo.get('content'),
+        'files': files,
+        'tags': sorted(memo.get('tags') or []),
+        'pin': memo.get('pin'),
+        'linked_count': memo.get('linked_count'),
+    }
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()